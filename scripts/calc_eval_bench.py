@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Calculator evaluator microbenchmark across nesting depth and expression length:
+
+  walk      the old recursive AST walk           vs  postfix: compile the AST + run
+  run       re-running an already compiled postfix program
+  miss      a whole cache miss from text: ast.parse + walk  vs  calculator._compile
+
+    python scripts/calc_eval_bench.py [--seconds 0.2] [--json]
+"""
+import argparse, ast, json, operator as _op, os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+os.environ.pop("AGENT_DEBUG", None)
+
+from agent.tools import calculator as calc  # noqa: E402
+from agent.tools.calculator import MAX_ABS, MAX_EXP  # noqa: E402
+
+
+# -----------------------------
+# The evaluator as it was before the postfix compiler (kept for comparison)
+# -----------------------------
+def legacy_safe_eval(node):
+    if isinstance(node, ast.Constant):
+        if isinstance(node.value, (int, float)):
+            return node.value
+        raise ValueError("invalid constant")
+    if isinstance(node, ast.Expression):
+        return legacy_safe_eval(node.body)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in calc._ALLOWED_UNARYOPS:
+        return calc._ALLOWED_UNARYOPS[type(node.op)](legacy_safe_eval(node.operand))
+    if isinstance(node, ast.BinOp):
+        if isinstance(node.op, ast.Pow):
+            base = legacy_safe_eval(node.left)
+            exp = legacy_safe_eval(node.right)
+            if not isinstance(base, (int, float)) or not isinstance(exp, (int, float)):
+                raise ValueError("invalid power")
+            if abs(exp) > MAX_EXP or abs(base) > MAX_ABS:
+                raise ValueError("expression too large")
+            return _op.pow(base, exp)
+        op_type = type(node.op)
+        if op_type in calc._ALLOWED_BINOPS:
+            left = legacy_safe_eval(node.left)
+            right = legacy_safe_eval(node.right)
+            return calc._ALLOWED_BINOPS[op_type](left, right)
+        raise ValueError("operator not allowed")
+    raise ValueError("invalid expression")
+
+
+def postfix_compile_run(node):
+    return calc._run(calc._to_postfix(node))
+
+
+def legacy_miss(text):
+    return legacy_safe_eval(ast.parse(text, mode="eval").body)
+
+
+# name -> builder(size) -> expression text
+CASES = {
+    "short":  lambda n: "23*17+88",
+    "length": lambda n: "+".join(f"{i % 9 + 1}*{i % 7 + 2}" for i in range(n)),  # flat chain
+    "depth":  lambda n: "1+(" * n + "1" + ")" * n,                            # right-nested
+    "unary":  lambda n: "-" * n + "1",
+}
+SIZES = {"short": [1], "length": [4, 16, 64, 256], "depth": [4, 16, 64, 180],
+         "unary": [16, 128, 511, 5000]}
+
+
+def per_call_us(fn, arg, seconds: float) -> float:
+    try:
+        fn(arg)
+    except RecursionError:
+        return float("nan")
+    n, t0 = 0, time.perf_counter()
+    while True:
+        for _ in range(50):
+            fn(arg)
+        n += 50
+        dt = time.perf_counter() - t0
+        if dt >= seconds:
+            return dt / n * 1e6
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=0.2, help="Timing budget per cell")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 6000))  # let deep unary chains parse
+
+    rows = []
+    for name, build in CASES.items():
+        for n in SIZES[name]:
+            text = build(n)
+            tree = ast.parse(text, mode="eval").body
+            program = calc._to_postfix(tree)
+            sys.setrecursionlimit(1000)  # the default, as the CLI runs
+            try:
+                rows.append({
+                    "case": name, "n": n, "chars": len(text), "nodes": len(program),
+                    "legacy_us": per_call_us(legacy_safe_eval, tree, args.seconds),
+                    "compile_run_us": per_call_us(postfix_compile_run, tree, args.seconds),
+                    "run_us": per_call_us(calc._run, program, args.seconds),
+                    "legacy_miss_us": per_call_us(legacy_miss, text, args.seconds),
+                    "miss_us": per_call_us(calc._compile, text, args.seconds),
+                })
+            finally:
+                sys.setrecursionlimit(6000)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+    print(f"{'case':<8}{'n':>6}{'chars':>7}{'nodes':>7}{'walk us':>10}{'postfix':>10}{'run us':>9}"
+          f"{'miss: old':>12}{'new':>10}{'speedup':>9}")
+    for r in rows:
+        speed = r["legacy_miss_us"] / r["miss_us"]
+        print(f"{r['case']:<8}{r['n']:>6}{r['chars']:>7}{r['nodes']:>7}{r['legacy_us']:>10.2f}"
+              f"{r['compile_run_us']:>10.2f}{r['run_us']:>9.2f}{r['legacy_miss_us']:>12.2f}"
+              f"{r['miss_us']:>10.2f}{speed:>8.2f}x")
+    print("\n(nan = RecursionError at the default recursion limit; unary 5000 is past MAX_EXPR_LEN,\n"
+          " so ast.parse gives up too: it is there for the evaluators alone)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
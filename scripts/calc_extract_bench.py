@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+calculator.extract_expr on adversarial inputs: the old regex extractor vs the
+current single-pass tokenizer, across input sizes. The old one is quadratic on
+long blank runs; the current one should stay flat in us per KiB.
+
+    python scripts/calc_extract_bench.py [--max 1000000] [--budget 1.0] [--json]
+"""
+import argparse, json, os, re, sys, time
+from typing import Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+os.environ.pop("AGENT_DEBUG", None)
+
+from agent.tools import calculator  # noqa: E402
+
+# -----------------------------
+# The extractor as it was before the tokenizer (kept verbatim for comparison)
+# -----------------------------
+_OLD_TRIGGERS = [
+    re.compile(r"\[\[\s*calc\s*:\s*([0-9.,+\-*/() \t^×÷]+)\]\]", re.I),
+    re.compile(r"\bcalc\s*\(\s*([0-9.,+\-*/() \t^×÷]+)\s*\)", re.I),
+    re.compile(r"\bcalculate\s*:\s*([0-9.,+\-*/() \t^×÷]+)", re.I),
+]
+_OLD_GENERIC = re.compile(
+    r"(?P<expr>(?:\s*(?:\d[\d,]*\.?\d*|\.\d+|\(|\)|\*{1,2}|\/|\+|\-)\s*)+)", re.U)
+
+
+def legacy_extract_expr(text: str) -> Optional[str]:
+    norm = calculator._normalize
+    for pat in _OLD_TRIGGERS:
+        m = pat.search(text) or pat.search(norm(text))
+        if m:
+            expr = norm(m.group(1)).strip()
+            if len(expr) > calculator.MAX_EXPR_LEN:
+                raise ValueError("expression too long")
+            return expr
+    cand = norm(text)
+    spans = [m.group("expr") for m in _OLD_GENERIC.finditer(cand)]
+    if not spans:
+        return None
+    expr = max(spans, key=len).strip()
+    if not any(ch.isdigit() for ch in expr) or not any(op in expr for op in "+-*/()"):
+        return None
+    if len(expr) > calculator.MAX_EXPR_LEN:
+        raise ValueError("expression too long")
+    return re.sub(r"[\+\-\*/\*]{1,2}\s*$", "", expr).strip() or None
+
+
+CASES = {
+    "blank-run":   lambda n: "x" + " " * n + "x",
+    "calc(+blanks": lambda n: "calc(1" + " " * n + "x",
+    "[[calc:+blanks": lambda n: "[[calc: " + " " * n + "x",
+    "digits+blanks": lambda n: "1 " * (n // 2) + "x",
+    "prose":       lambda n: ("the 3 cats ate 4 fish. " * (n // 23 + 1))[:n],
+}
+
+
+def timed(fn, text: str, budget: float) -> float:
+    """Best-of-a-few seconds per call (one call if a single call blows the budget)."""
+    best, spent = float("inf"), 0.0
+    for _ in range(5):
+        t0 = time.perf_counter()
+        try:
+            fn(text)
+        except ValueError:
+            pass
+        dt = time.perf_counter() - t0
+        best, spent = min(best, dt), spent + dt
+        if spent > budget / 4:
+            break
+    return best
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--max", type=int, default=1_000_000, help="Largest input size in chars")
+    ap.add_argument("--budget", type=float, default=1.0,
+                    help="Stop timing the legacy extractor once a call exceeds this many seconds")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args()
+
+    sizes, n = [], 1000
+    while n <= args.max:
+        sizes.append(n)
+        n *= 4
+    rows = []
+    for name, make in CASES.items():
+        legacy_alive = True
+        for n in sizes:
+            text = make(n)
+            new = timed(calculator.extract_expr, text, args.budget)
+            old = timed(legacy_extract_expr, text, args.budget) if legacy_alive else None
+            legacy_alive = old is not None and old < args.budget
+            rows.append({"case": name, "n": n, "new_ms": new * 1e3,
+                         "legacy_ms": None if old is None else old * 1e3,
+                         "new_us_per_kib": new * 1e6 / (n / 1024)})
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+    print(f"{'case':<16}{'n':>9}{'new ms':>11}{'us/KiB':>9}{'legacy ms':>12}")
+    for r in rows:
+        old = "skipped" if r["legacy_ms"] is None else f"{r['legacy_ms']:.3f}"
+        print(f"{r['case']:<16}{r['n']:>9}{r['new_ms']:>11.3f}{r['new_us_per_kib']:>9.2f}{old:>12}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
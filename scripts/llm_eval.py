@@ -1,7 +1,8 @@
-import os, time, requests
+import os, sys, time
 
-BASE  = os.environ.get("OPENAI_BASE",  "http://127.0.0.1:8000/v1")
-MODEL = os.environ.get("OPENAI_MODEL", "Qwen/Qwen2.5-7B-Instruct")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from agent.runtime.llm_client import chat  # noqa: E402
 
 SESSION_SYSTEM = (
     "You are an expert on THIS repository:\n"
@@ -13,24 +14,13 @@ SESSION_SYSTEM = (
 )
 
 def ask(prompt, max_tokens=128):
-    payload = {
-        "model": MODEL,
-        "messages": [
-            {"role": "system", "content": SESSION_SYSTEM},
-            {"role": "user",   "content": prompt}
-        ],
-        "temperature": 0,
-        "top_p": 1,
-        "seed": 1,
-        "max_tokens": max_tokens
-    }
+    # temperature 0 + seed makes reruns byte-identical requests, so with
+    # AGENT_LLM_CACHE=rw (or ro) repeated evals are served from the cache.
+    # (top_p is left at the server default of 1, which is what this sent.)
     t0 = time.time()
-    r = requests.post(f"{BASE}/chat/completions", json=payload, timeout=120)
-    r.raise_for_status()
-    data = r.json()
+    content, usage = chat(prompt, system=SESSION_SYSTEM, temperature=0, seed=1,
+                          max_tokens=max_tokens, timeout=120)
     dt = time.time() - t0
-    content = data["choices"][0]["message"]["content"]
-    usage = data.get("usage", {})
     return dt, usage, content
 
 def run():
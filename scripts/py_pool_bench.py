@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+python_repl per-call latency: a warm pre-forked worker pool vs starting a
+fresh worker process for every call (the cost a pool-less sandbox pays).
+
+    python scripts/py_pool_bench.py [--calls 200] [--cold-calls 20] [--json]
+"""
+import argparse, json, multiprocessing, os, subprocess, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+os.environ.pop("AGENT_DEBUG", None)
+
+from agent.runtime import sandbox  # noqa: E402
+from agent.runtime.stats import summarize  # noqa: E402
+
+SNIPPET = "sum(x * x for x in range(1000))"
+
+
+def warm_pool(calls: int) -> list:
+    pool = sandbox.WorkerPool(size=1).start()
+    try:
+        pool.run(SNIPPET)
+        samples = []
+        for _ in range(calls):
+            t0 = time.perf_counter()
+            pool.run(SNIPPET)
+            samples.append(time.perf_counter() - t0)
+        return samples
+    finally:
+        pool.close()
+
+
+def fresh_worker(calls: int, start_method: str) -> list:
+    """A one-worker pool started, used once and closed per call."""
+    samples = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        pool = sandbox.WorkerPool(size=1, start_method=start_method).start()
+        pool.run(SNIPPET)
+        pool.close()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def fresh_interpreter(calls: int) -> list:
+    code = f"from agent.runtime.sandbox import evaluate; print(evaluate({SNIPPET!r}))"
+    samples = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, capture_output=True,
+                       env={**os.environ, "PYTHONPATH": sys.path[0]})
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, default=200, help="Timed calls on the warm pool")
+    ap.add_argument("--cold-calls", type=int, default=20, help="Timed calls per cold strategy")
+    ap.add_argument("--json", action="store_true", help="Emit machine-readable results")
+    args = ap.parse_args()
+
+    results = {"warm_pool": summarize(warm_pool(args.calls))}
+    for method in ("forkserver", "spawn"):
+        if method in multiprocessing.get_all_start_methods():
+            results[f"fresh_{method}_worker"] = summarize(fresh_worker(args.cold_calls, method))
+    results["fresh_interpreter"] = summarize(fresh_interpreter(args.cold_calls))
+    base = results["warm_pool"]["p50_ms"]
+    for r in results.values():
+        r["x_warm_p50"] = round(r["p50_ms"] / base, 1)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'strategy':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'vs warm':>9}")
+        for name, r in results.items():
+            print(f"{name:<24}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['p99_ms']:>10.3f}"
+                  f"{r['x_warm_p50']:>8.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
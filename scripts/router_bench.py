@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Router dispatch throughput: trigger index vs the old try-every-tool loop.
+
+    python scripts/router_bench.py [--seconds 1.0] [--json]
+"""
+import argparse, json, os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+os.environ.pop("AGENT_DEBUG", None)
+os.environ.setdefault("AGENT_TOOL_CACHE_SIZE", "0")  # time dispatch, not result-cache hits
+
+from agent.runtime import router  # noqa: E402
+
+MATCHING = [
+    "23*17+88",
+    '{"tool":"calculator","args":{"expression":"6*7"}}',
+    "[[time]]",
+    "time(%Y-%m-%d)",
+    "[[upper: hello world]]",
+    "slug: Hello World!!",
+    '{"tool":"stringy","args":{"op":"title","text":"from chaos, order"}}',
+    "[[weather: Toronto]]",
+    '{"tool":"uuid"}',
+    "[[echo: ping]]",
+]
+
+NON_MATCHING = [
+    "Tell me what this project does in one short sentence.",
+    "Give me one sentence about this project.",
+    "Summarize the benefits of continuous batching for inference servers",
+    "just chatting",
+    "What is the capital of France",
+    "The quick brown fox jumps over the lazy dog " * 8,
+]
+
+def legacy_run_once(message: str):
+    """The pre-index dispatch: call every tool in turn until one stops raising."""
+    seen = set()
+    for tool in router.get_tools().values():
+        if id(tool) in seen:
+            continue
+        seen.add(id(tool))
+        try:
+            return str(tool.execute(message)), tool.name
+        except Exception:
+            continue
+    return message, None
+
+def throughput(fn, messages, seconds: float) -> float:
+    for m in messages:  # warmup
+        fn(m)
+    n, t0 = 0, time.perf_counter()
+    deadline = t0 + seconds
+    while True:
+        for m in messages:
+            fn(m)
+        n += len(messages)
+        now = time.perf_counter()
+        if now >= deadline:
+            return n / (now - t0)
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=1.0, help="Measurement time per cell")
+    ap.add_argument("--json", action="store_true", help="Emit machine-readable results")
+    args = ap.parse_args()
+
+    router.get_index()  # build registry + index outside the timed region
+    for m in MATCHING + NON_MATCHING:
+        assert legacy_run_once(m)[1] == router.run_once_with_tools(m)[1], m
+
+    results = {}
+    for label, msgs in (("matching", MATCHING), ("non_matching", NON_MATCHING)):
+        legacy = throughput(legacy_run_once, msgs, args.seconds)
+        indexed = throughput(router.run_once_with_tools, msgs, args.seconds)
+        results[label] = {"legacy_msgs_per_s": round(legacy, 1),
+                          "indexed_msgs_per_s": round(indexed, 1),
+                          "speedup": round(indexed / legacy, 2)}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print(f"{'traffic':<14}{'legacy msg/s':>14}{'indexed msg/s':>15}{'speedup':>9}")
+        for label, r in results.items():
+            print(f"{label:<14}{r['legacy_msgs_per_s']:>14,.0f}{r['indexed_msgs_per_s']:>15,.0f}"
+                  f"{r['speedup']:>8.2f}x")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
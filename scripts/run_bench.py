@@ -1,5 +1,19 @@
 #!/usr/bin/env python3
-import os, sys, shlex, subprocess, re
+"""
+Tool-routing benchmark: accuracy plus latency.
+
+    python scripts/run_bench.py                     # in-process: router.run_with_tools directly
+    python scripts/run_bench.py --subprocess        # cold start: one CLI process per call
+    python scripts/run_bench.py --repeat 500 --json > bench.json
+    python scripts/run_bench.py --tool-cache        # in-process with the cross-request result cache
+"""
+import argparse, json, os, sys, shlex, subprocess, re, time
+from collections import defaultdict
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC)
+
+from agent.runtime.stats import summarize  # noqa: E402
 
 DATA = [
     {"msg": "23*17+88", "expect": "479"},
@@ -22,21 +36,83 @@ def run(msg: str):
     p = subprocess.run(cmd, shell=True, capture_output=True, text=True)
     return p.returncode, p.stdout.strip(), p.stderr.strip()
 
+def run_inprocess(msg: str):
+    """Same contract as run() (rc, stdout, stderr, tool) without the process boundary."""
+    from agent.runtime.router import run_with_tools
+    out, tool, _ = run_with_tools(msg, max_chain=1)
+    return (0 if tool else 2), (out if tool else ""), "", tool
+
+def check(case, code: int, out: str, err: str) -> bool:
+    passed = (code == 0 and not err)
+    if "expect" in case:
+        passed = passed and (out == case["expect"])
+    if "contains" in case:
+        passed = passed and (case["contains"] in out)
+    if "match" in case:
+        passed = passed and bool(re.fullmatch(case["match"], out))
+    return passed
+
+def bench(subproc: bool, repeat: int, warmup: int) -> dict:
+    if not subproc:
+        os.environ.pop("AGENT_DEBUG", None)
+    cases, by_tool = [], defaultdict(list)
+    for case in DATA:
+        call = (lambda m: (*run(m), None)) if subproc else run_inprocess
+        for _ in range(warmup):
+            call(case["msg"])
+        samples, passed, out, tool = [], True, "", None
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            code, out, err, tool = call(case["msg"])
+            samples.append(time.perf_counter() - t0)
+            passed = passed and check(case, code, out, err)
+        cases.append({"msg": case["msg"], "tool": tool, "pass": passed, "output": out,
+                      **summarize(samples)})
+        by_tool[tool or "?"].extend(samples)
+    return {
+        "mode": "subprocess" if subproc else "inprocess",
+        "repeat": repeat,
+        "warmup": warmup,
+        "accuracy": {"passed": sum(c["pass"] for c in cases), "total": len(cases)},
+        "cases": cases,
+        "tools": {name: summarize(s) for name, s in sorted(by_tool.items())},
+    }
+
 def main() -> int:
-    ok = 0
-    for i, case in enumerate(DATA, 1):
-        code, out, err = run(case["msg"])
-        passed = (code == 0 and not err)
-        if "expect" in case:
-            passed = passed and (out == case["expect"])
-        if "contains" in case:
-            passed = passed and (case["contains"] in out)
-        if "match" in case:
-            passed = passed and bool(re.fullmatch(case["match"], out))
-        print(f"[{i:02d}] {'PASS' if passed else 'FAIL'} | {case['msg']} -> {out}")
-        ok += int(passed)
-    total = len(DATA)
-    print(f"\nAccuracy: {ok}/{total}")
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--subprocess", action="store_true",
+                    help="Cold-start mode: spawn the CLI for every call (the original benchmark)")
+    ap.add_argument("--repeat", type=int, help="Timed calls per case (default 200 in-process, 1 subprocess)")
+    ap.add_argument("--warmup", type=int, help="Untimed calls per case first (default 20 in-process, 0 subprocess)")
+    ap.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    ap.add_argument("--tool-cache", action="store_true",
+                    help="In-process: keep the router's result cache on (off by default so "
+                         "cacheable tools are timed, not their cache hits)")
+    args = ap.parse_args()
+    if not args.tool_cache:
+        os.environ["AGENT_TOOL_CACHE_SIZE"] = "0"
+    repeat = max(1, args.repeat if args.repeat is not None else (1 if args.subprocess else 200))
+    warmup = max(0, args.warmup if args.warmup is not None else (0 if args.subprocess else 20))
+
+    report = bench(args.subprocess, repeat, warmup)
+    if args.tool_cache and not args.subprocess:
+        from agent.runtime.router import cache_stats
+        report["tool_cache"] = cache_stats()
+    ok, total = report["accuracy"]["passed"], report["accuracy"]["total"]
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        for i, c in enumerate(report["cases"], 1):
+            print(f"[{i:02d}] {'PASS' if c['pass'] else 'FAIL'} | p50={c['p50_ms']:8.3f}ms "
+                  f"p99={c['p99_ms']:8.3f}ms {c['ops_per_s']:>10,.0f} ops/s | {c['msg']} -> {c['output']}")
+        if not args.subprocess:
+            print(f"\n{'tool':<12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>12}")
+            for name, s in report["tools"].items():
+                print(f"{name:<12}{s['p50_ms']:>10.3f}{s['p95_ms']:>10.3f}{s['p99_ms']:>10.3f}"
+                      f"{s['ops_per_s']:>12,.0f}")
+        for name, s in report.get("tool_cache", {}).items():
+            print(f"cache {name:<12} hit rate {s['hit_rate']:.1%} ({s['hits']}/{s['hits'] + s['misses']})")
+        print(f"\nAccuracy: {ok}/{total}  ({report['mode']}, repeat={repeat})")
     return 0 if ok == total else 1
 
 if __name__ == "__main__":
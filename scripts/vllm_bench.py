@@ -1,5 +1,26 @@
 #!/usr/bin/env python3
-import os, time, json, requests, statistics, concurrent.futures as cf
+"""
+Load generator for an OpenAI-compatible server (vLLM, or the local stub).
+
+    python scripts/vllm_bench.py                              # closed loop, concurrency 1,4,16
+    python scripts/vllm_bench.py --concurrency 1,8,32,64 --requests 200
+    python scripts/vllm_bench.py --rate 2,5,10 --requests 300 # open loop, Poisson arrivals
+    python scripts/vllm_bench.py --rate 5 --out run.json      # JSON report to diff between runs
+
+Closed loop: N workers, each sends its next request as soon as the last one
+finishes. Open loop: requests arrive at exponentially distributed intervals
+(mean 1/rate) whether or not earlier ones have finished, so queueing shows.
+Every request streams, so TTFT and time per output token (TPOT) are measured
+on the client. req/s and tok/s are over wall-clock time for the whole level;
+goodput counts only requests that met every --slo-* bound.
+"""
+import argparse, asyncio, json, os, random, sys, time
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC)
+
+from agent.runtime import llm_client  # noqa: E402
+from agent.runtime.stats import percentile  # noqa: E402
 
 BASE = os.environ.get("VLLM_BASE", "http://127.0.0.1:8000/v1")
 MODEL = os.environ.get("MODEL", "Qwen/Qwen2.5-7B-Instruct")
@@ -11,47 +32,173 @@ PROMPTS = [
     "Rewrite this in one sentence: Tool routing with auto-discovery and chaining.",
 ]
 
-def ask(prompt: str, max_tokens=128):
-    payload = {
-        "model": MODEL,
-        "messages": [{"role":"user","content":prompt}],
-        "temperature": 0.2,
-        "max_tokens": max_tokens,
+PERCENTILES = (50, 90, 95, 99)
+
+# -----------------------------
+# One request
+# -----------------------------
+async def one(client, prompt: str, args) -> dict:
+    t0 = time.perf_counter()
+    try:
+        _, usage, timing = await llm_client.achat_stream(
+            prompt, temperature=args.temperature, max_tokens=args.max_tokens,
+            timeout=args.timeout, base=args.base, model=args.model, client=client)
+    except Exception as e:
+        return {"start": t0, "end": time.perf_counter(), "ok": False,
+                "error": f"{type(e).__name__}: {e}"}
+    end = time.perf_counter()
+    tokens = usage.get("completion_tokens") or timing["chunks"]
+    ttft = timing["ttft_ms"] / 1e3 if timing["ttft_ms"] is not None else None
+    e2e = end - t0
+    tpot = (e2e - ttft) / (tokens - 1) if ttft is not None and tokens > 1 else None
+    return {"start": t0, "end": end, "ok": True, "ttft": ttft, "tpot": tpot, "e2e": e2e,
+            "tokens": tokens}
+
+def _clients(n: int, timeout: float) -> list:
+    return [llm_client.async_client(llm_client.SHARD_CONNECTIONS, timeout)
+            for _ in range(max(1, -(-n // llm_client.SHARD_CONNECTIONS)))]
+
+# -----------------------------
+# Load shapes
+# -----------------------------
+async def closed_loop(concurrency: int, args) -> list:
+    clients, records = _clients(concurrency, args.timeout), []
+    next_i = iter(range(args.requests))
+
+    async def worker(k: int):
+        client = clients[k % len(clients)]
+        for i in next_i:
+            records.append(await one(client, PROMPTS[i % len(PROMPTS)], args))
+
+    try:
+        await asyncio.gather(*(worker(k) for k in range(concurrency)))
+    finally:
+        await asyncio.gather(*(c.aclose() for c in clients))
+    return records
+
+async def open_loop(rate: float, args) -> list:
+    rng = random.Random(args.seed)
+    clients = _clients(args.max_inflight, args.timeout)
+    tasks, t_next = [], time.perf_counter()
+    try:
+        for i in range(args.requests):
+            delay = t_next - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(
+                one(clients[i % len(clients)], PROMPTS[i % len(PROMPTS)], args)))
+            t_next += rng.expovariate(rate)
+        return list(await asyncio.gather(*tasks))
+    finally:
+        await asyncio.gather(*(c.aclose() for c in clients))
+
+# -----------------------------
+# Report
+# -----------------------------
+def dist(values, scale: float = 1e3) -> dict:
+    """mean and percentiles of ``values`` (seconds) in ms; None entries are skipped."""
+    xs = sorted(v for v in values if v is not None)
+    out = {"count": len(xs), "mean": (sum(xs) / len(xs) * scale) if xs else None}
+    for q in PERCENTILES:
+        out[f"p{q}"] = percentile(xs, q) * scale if xs else None
+    return out
+
+def meets_slo(r: dict, args) -> bool:
+    bounds = (("ttft", args.slo_ttft_ms), ("tpot", args.slo_tpot_ms), ("e2e", args.slo_e2e_ms))
+    return r["ok"] and all(limit is None or (r[k] is not None and r[k] * 1e3 <= limit)
+                           for k, limit in bounds)
+
+def level_report(shape: str, load: float, records: list, args) -> dict:
+    ok = [r for r in records if r["ok"]]
+    wall = (max(r["end"] for r in records) - min(r["start"] for r in records)) if records else 0.0
+    good = sum(meets_slo(r, args) for r in records)
+    tokens = sum(r["tokens"] for r in ok)
+    per_s = lambda n: (n / wall) if wall > 0 else None
+    return {
+        "mode": shape,
+        "concurrency" if shape == "closed" else "rate": load,
+        "requests": len(records),
+        "errors": len(records) - len(ok),
+        "wall_s": wall,
+        "req_per_s": per_s(len(ok)),
+        "tok_per_s": per_s(tokens),
+        "goodput_req_per_s": per_s(good),
+        "slo_attainment": good / len(records) if records else None,
+        "output_tokens": tokens,
+        "ttft_ms": dist(r["ttft"] for r in ok),
+        "tpot_ms": dist(r["tpot"] for r in ok),
+        "e2e_ms": dist(r["e2e"] for r in ok),
+        "sample_errors": sorted({r["error"] for r in records if not r["ok"]})[:5],
     }
-    t0 = time.time()
-    r = requests.post(f"{BASE}/chat/completions", json=payload, timeout=120)
-    t1 = time.time()
-    r.raise_for_status()
-    data = r.json()
-    txt = data["choices"][0]["message"]["content"].strip()
-    usage = data.get("usage", {})
-    out_tokens = usage.get("completion_tokens")
-    return (t1 - t0), out_tokens, txt
-
-def run_serial():
-    times, toks = [], []
-    for p in PROMPTS:
-        dt, tk, _ = ask(p)
-        times.append(dt)
-        if tk is not None: toks.append(tk)
-    tps = (sum(toks)/sum(times)) if toks and sum(times) > 0 else None
-    print("\n=== Serial ===")
-    print(f"count={len(times)}  avg={statistics.mean(times):.3f}s  p95={statistics.quantiles(times, n=20)[18]:.3f}s")
-    if tps: print(f"throughput ≈ {tps:.1f} tok/s")
-
-def run_concurrent(workers=4):
-    times, toks = [], []
-    with cf.ThreadPoolExecutor(max_workers=workers) as ex:
-        futs = [ex.submit(ask, p) for p in PROMPTS * 2]  # 8 requests
-        for f in cf.as_completed(futs):
-            dt, tk, _ = f.result()
-            times.append(dt)
-            if tk is not None: toks.append(tk)
-    tps = (sum(toks)/sum(times)) if toks and sum(times) > 0 else None
-    print(f"\n=== Concurrent (workers={workers}) ===")
-    print(f"count={len(times)}  avg={statistics.mean(times):.3f}s  p95={statistics.quantiles(times, n=20)[18]:.3f}s")
-    if tps: print(f"throughput ≈ {tps:.1f} tok/s")
+
+def _floats(text: str | None, cast=float) -> list:
+    return [cast(x) for x in text.split(",") if x.strip()] if text else []
+
+async def bench(args) -> dict:
+    if args.warmup:
+        async with llm_client.async_client(1, args.timeout) as client:
+            for i in range(args.warmup):
+                await one(client, PROMPTS[i % len(PROMPTS)], args)
+    levels = []
+    for rate in _floats(args.rate):
+        levels.append(level_report("open", rate, await open_loop(rate, args), args))
+    for n in _floats(args.concurrency, int):
+        levels.append(level_report("closed", n, await closed_loop(n, args), args))
+    return {
+        "base": args.base,
+        "model": args.model,
+        "max_tokens": args.max_tokens,
+        "temperature": args.temperature,
+        "requests_per_level": args.requests,
+        "seed": args.seed,
+        "slo_ms": {"ttft": args.slo_ttft_ms, "tpot": args.slo_tpot_ms, "e2e": args.slo_e2e_ms},
+        "started": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "levels": levels,
+    }
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    ap.add_argument("--base", default=BASE, help="OpenAI-compatible base URL (default $VLLM_BASE)")
+    ap.add_argument("--model", default=MODEL, help="Model name (default $MODEL)")
+    ap.add_argument("--concurrency", help="Closed-loop sweep, e.g. 1,4,16 (the default without --rate)")
+    ap.add_argument("--rate", help="Open-loop Poisson arrival rates in req/s, e.g. 1,2,5")
+    ap.add_argument("--requests", type=int, default=64, help="Requests per level. Default 64")
+    ap.add_argument("--max-tokens", type=int, default=128)
+    ap.add_argument("--temperature", type=float, default=0.2)
+    ap.add_argument("--timeout", type=float, default=120)
+    ap.add_argument("--warmup", type=int, default=2, help="Untimed requests before the first level")
+    ap.add_argument("--max-inflight", type=int, default=256,
+                    help="Open loop: keep-alive connections to spread requests over. Default 256")
+    ap.add_argument("--seed", type=int, default=0, help="Seed for the arrival process")
+    ap.add_argument("--slo-ttft-ms", type=float, default=500)
+    ap.add_argument("--slo-tpot-ms", type=float, default=50)
+    ap.add_argument("--slo-e2e-ms", type=float, default=None)
+    ap.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    ap.add_argument("--out", help="Also write the JSON report to this file")
+    args = ap.parse_args(argv)
+    if not args.rate and not args.concurrency:
+        args.concurrency = "1,4,16"
+
+    report = asyncio.run(bench(args))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'load':<10}{'req':>6}{'err':>5}{'req/s':>8}{'tok/s':>9}{'good/s':>8}"
+              f"{'ttft p50':>10}{'p99':>9}{'tpot p50':>10}{'p99':>8}{'e2e p50':>10}{'p99':>9}")
+        num = lambda x, w, d=1: f"{x:>{w}.{d}f}" if x is not None else f"{'-':>{w}}"
+        for lv in report["levels"]:
+            load = f"c={lv['concurrency']}" if lv["mode"] == "closed" else f"r={lv['rate']:g}/s"
+            print(f"{load:<10}{lv['requests']:>6}{lv['errors']:>5}{num(lv['req_per_s'], 8, 2)}"
+                  f"{num(lv['tok_per_s'], 9)}{num(lv['goodput_req_per_s'], 8, 2)}"
+                  f"{num(lv['ttft_ms']['p50'], 10)}{num(lv['ttft_ms']['p99'], 9)}"
+                  f"{num(lv['tpot_ms']['p50'], 10, 2)}{num(lv['tpot_ms']['p99'], 8, 2)}"
+                  f"{num(lv['e2e_ms']['p50'], 10)}{num(lv['e2e_ms']['p99'], 9)}")
+            for err in lv["sample_errors"]:
+                print(f"    error: {err}")
+    return 1 if any(lv["errors"] for lv in report["levels"]) else 0
 
 if __name__ == "__main__":
-    run_serial()
-    run_concurrent(workers=int(os.environ.get("WORKERS", "4")))
+    raise SystemExit(main())
@@ -0,0 +1 @@
+# llm package
@@ -0,0 +1,182 @@
+"""
+Opt-in on-disk cache of chat completions, for reruns that send byte-identical
+requests (temperature 0 + seed). Entries are keyed on a SHA-256 of the base
+URL plus the exact request body (model, messages, temperature, max_tokens,
+seed) and hold the reply text and usage.
+
+    AGENT_LLM_CACHE=rw           read and write (also: --cache rw on the CLI)
+    AGENT_LLM_CACHE=ro           serve hits only; never write or touch the file
+    AGENT_LLM_CACHE_PATH=...     default $AGENT_CACHE_DIR/llm-cache.sqlite3
+    AGENT_LLM_CACHE_MAX_MB=256   least recently used entries go first past this
+    AGENT_LLM_CACHE_TTL=0        seconds an entry stays valid (0: forever)
+
+SQLite in WAL mode, one connection per thread, so batch workers (threads or
+processes) can share one file. Triggers keep the total size in a one-row
+meta table; only eviction reads the responses themselves.
+"""
+import hashlib, json, os, sqlite3, threading, time
+from typing import Any, Dict, Optional, Tuple
+
+from agent.runtime.paths import cache_dir
+
+MODES = ("off", "rw", "ro")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key      TEXT PRIMARY KEY,
+    text     TEXT NOT NULL,
+    usage    TEXT NOT NULL,
+    size     INTEGER NOT NULL,
+    created  REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+-- running SUM(size), so a write does not scan the table to check the bound
+CREATE TABLE IF NOT EXISTS meta (
+    id    INTEGER PRIMARY KEY CHECK (id = 1),
+    bytes INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta SELECT 1, COALESCE(SUM(size), 0) FROM responses;
+CREATE TRIGGER IF NOT EXISTS responses_add AFTER INSERT ON responses
+BEGIN UPDATE meta SET bytes = bytes + NEW.size WHERE id = 1; END;
+CREATE TRIGGER IF NOT EXISTS responses_drop AFTER DELETE ON responses
+BEGIN UPDATE meta SET bytes = bytes - OLD.size WHERE id = 1; END;
+"""
+
+
+def request_key(base: str, payload: Dict[str, Any]) -> str:
+    """Stable hash of one request: base URL plus the canonical JSON body."""
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(f"{base.rstrip('/')}\n{body}".encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path: str, read_only: bool = False, max_bytes: int = 256 << 20,
+                 ttl: float = 0):
+        self.path = path
+        self.read_only = read_only
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = self.misses = self.writes = self.evictions = 0
+        self._local = threading.local()
+        if not read_only:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            db = self._connect()
+            try:
+                db.executescript(_SCHEMA)
+            finally:
+                db.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self.read_only:
+            return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=10)
+        db = sqlite3.connect(self.path, timeout=10)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _db(self) -> Optional[sqlite3.Connection]:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            try:
+                db = self._local.db = self._connect()
+            except sqlite3.OperationalError:  # read-only and no file yet
+                return None
+        return db
+
+    def get(self, key: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        db = self._db()
+        row = None
+        if db is not None:
+            try:
+                row = db.execute("SELECT text, usage, created FROM responses WHERE key = ?",
+                                 (key,)).fetchone()
+            except sqlite3.OperationalError:  # read-only file without the table
+                row = None
+        now = time.time()
+        if row is not None and self.ttl and now - row[2] > self.ttl:
+            if not self.read_only:
+                with db:
+                    db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            row = None
+        if row is None:
+            self.misses += 1
+            return None
+        if not self.read_only:
+            with db:
+                db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return row[0], json.loads(row[1])
+
+    def put(self, key: str, text: str, usage: Dict[str, Any]) -> None:
+        if self.read_only:
+            return
+        db = self._db()
+        blob = json.dumps(usage)
+        size = len(key) + len(text.encode("utf-8")) + len(blob)
+        now = time.time()
+        with db:
+            # DELETE + INSERT rather than INSERT OR REPLACE, whose implicit delete fires no trigger
+            db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            db.execute("INSERT INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                       (key, text, blob, size, now, now))
+            self.writes += 1
+            total = db.execute("SELECT bytes FROM meta WHERE id = 1").fetchone()[0]
+            while total > self.max_bytes:
+                doomed = []
+                for k, n in db.execute("SELECT key, size FROM responses WHERE key != ? "
+                                       "ORDER BY accessed LIMIT 64", (key,)):
+                    doomed.append((k,))
+                    total -= n
+                    if total <= self.max_bytes:
+                        break
+                if not doomed:
+                    break
+                db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+                self.evictions += len(doomed)
+
+    def stats(self) -> Dict[str, Any]:
+        db = self._db()
+        entries = size = 0
+        if db is not None:
+            try:
+                entries, size = db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            except sqlite3.OperationalError:
+                pass
+        return {"path": self.path, "mode": "ro" if self.read_only else "rw", "entries": entries,
+                "bytes": size, "hits": self.hits, "misses": self.misses, "writes": self.writes,
+                "evictions": self.evictions}
+
+
+_CACHES: Dict[Tuple[str, str, int, float], ResponseCache] = {}
+_LOCK = threading.Lock()
+
+
+def default_path() -> str:
+    return os.environ.get("AGENT_LLM_CACHE_PATH") or os.path.join(cache_dir(), "llm-cache.sqlite3")
+
+
+def get_cache(mode: Optional[str] = None) -> Optional[ResponseCache]:
+    """
+    The shared cache for ``mode`` ("off", "rw", "ro"; None reads $AGENT_LLM_CACHE),
+    or None when caching is off.
+    """
+    mode = (mode or os.environ.get("AGENT_LLM_CACHE") or "off").lower()
+    if mode in ("", "0", "off", "no", "false"):
+        return None
+    if mode in ("1", "on", "yes", "true"):
+        mode = "rw"
+    if mode not in MODES:
+        raise ValueError(f"unknown LLM cache mode {mode!r}; expected one of {', '.join(MODES)}")
+    key = (default_path(), mode,
+           int(float(os.environ.get("AGENT_LLM_CACHE_MAX_MB", "256")) * (1 << 20)),
+           float(os.environ.get("AGENT_LLM_CACHE_TTL", "0")))
+    cache = _CACHES.get(key)
+    if cache is None:
+        with _LOCK:
+            cache = _CACHES.get(key)
+            if cache is None:
+                cache = _CACHES[key] = ResponseCache(key[0], read_only=mode == "ro",
+                                                     max_bytes=key[2], ttl=key[3])
+    return cache
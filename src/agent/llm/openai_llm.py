@@ -1,19 +1,25 @@
+import os
+
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from agent.llm.provider import get_provider
 
 # Load .env once (puts OPENAI_API_KEY into the environment)
 load_dotenv()
 
-# Reuse a single client. It will read OPENAI_API_KEY from the environment.
-_client = OpenAI()
+# The OpenAI API itself (the SDK's own default), not the local OpenAI-compatible BASE.
+OPENAI_API_BASE = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
 
 
 def chat_once(prompt: str, model: str = "gpt-4.1-mini") -> str:
     """
     One-shot call to OpenAI Responses API.
     Returns plain text (rsp.output_text).
+    The client is created on first use and then reused (one pooled client per
+    base URL and model); it reads OPENAI_API_KEY from the environment.
     """
-    rsp = _client.responses.create(
+    client = get_provider(OPENAI_API_BASE, model).openai()
+    rsp = client.responses.create(
         model=model,  # You can switch to "gpt-4o-mini" if you prefer
         input=prompt,
         temperature=0.2,
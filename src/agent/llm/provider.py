@@ -0,0 +1,201 @@
+"""
+LLM provider layer: one lazily created, connection-pooled client per
+(base URL, model), reused by every call in the process.
+
+    p = get_provider(base, model)   # cached; nothing is imported or connected yet
+    p.preconnect()                  # optional: open the keep-alive connection now
+    text, usage = p.chat("hi")      # OpenAI-compatible /chat/completions over requests
+    for event in p.stream(payload): # the same endpoint over SSE, one chunk dict per event
+    p.openai()                      # openai.OpenAI client (Responses API), built on first use
+    p.stats()                       # {"requests", "connections", "reused", ...}
+
+Pool size is per host: pool_size=... or $AGENT_LLM_POOL_SIZE (default 10).
+Set AGENT_LLM_PRECONNECT=1 to have the warm daemon pre-connect at startup.
+"""
+import json, os, threading, weakref
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+BASE = os.getenv("OPENAI_BASE", "http://127.0.0.1:8000/v1")
+MODEL = os.getenv("OPENAI_MODEL", "Qwen/Qwen2.5-7B-Instruct")
+API_KEY = os.getenv("OPENAI_API_KEY", "sk-not-needed")
+POOL_SIZE = int(os.getenv("AGENT_LLM_POOL_SIZE", "10"))
+
+
+def chat_payload(prompt: str, system: str, temperature: float, max_tokens: int,
+                 model: str, seed: Optional[int] = None) -> Dict[str, Any]:
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": system},
+            {"role": "user", "content": prompt},
+        ],
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }
+    if seed is not None:
+        payload["seed"] = seed
+    return payload
+
+
+def chat_reply(data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+    text = data["choices"][0]["message"]["content"].strip()
+    usage = data.get("usage", {})
+    return text, usage
+
+
+class Provider:
+    """Pooled HTTP clients for one (base URL, model); safe to share between threads."""
+
+    def __init__(self, base: str, model: str, api_key: Optional[str] = None,
+                 pool_size: Optional[int] = None):
+        self.base = base.rstrip("/")
+        self.model = model
+        self.api_key = api_key  # None: $OPENAI_API_KEY (or a local placeholder)
+        self.pool_size = max(1, pool_size or POOL_SIZE)
+        self._session: Optional[requests.Session] = None
+        self._openai = None
+        self._lock = threading.Lock()
+        # httpx (openai client) exposes no pool counters; count from response hooks.
+        self._http_requests = 0
+        self._http_streams: "weakref.WeakSet[Any]" = weakref.WeakSet()
+        self._http_connections = 0
+
+    # -----------------------------
+    # requests: OpenAI-compatible chat completions
+    # -----------------------------
+    @property
+    def session(self) -> requests.Session:
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    s = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+                    s.mount("http://", adapter)
+                    s.mount("https://", adapter)
+                    s.headers["Authorization"] = f"Bearer {self.api_key or API_KEY}"
+                    self._session = s
+        return self._session
+
+    def chat(self, prompt: str,
+             system: str = "You are helpful and concise.",
+             temperature: float = 0.2,
+             max_tokens: int = 256,
+             timeout: float = 60,
+             seed: Optional[int] = None) -> Tuple[str, Dict[str, Any]]:
+        payload = chat_payload(prompt, system, temperature, max_tokens, self.model, seed)
+        return self.complete(payload, timeout)
+
+    def complete(self, payload: Dict[str, Any], timeout: float = 60) -> Tuple[str, Dict[str, Any]]:
+        """POST a ready /chat/completions body; returns (text, usage)."""
+        r = self.session.post(f"{self.base}/chat/completions", json=payload, timeout=timeout)
+        r.raise_for_status()
+        return chat_reply(r.json())
+
+    def stream(self, payload: Dict[str, Any], timeout: float = 60) -> Iterator[Dict[str, Any]]:
+        """
+        POST ``payload`` with stream: true and yield each server-sent event as a
+        dict (OpenAI chat.completion.chunk) until [DONE]. The last event carries
+        usage when the server honours stream_options.include_usage.
+        """
+        body = {**payload, "stream": True, "stream_options": {"include_usage": True}}
+        with self.session.post(f"{self.base}/chat/completions", json=body, timeout=timeout,
+                               stream=True) as r:
+            r.raise_for_status()
+            # chunk_size=None: hand over each chunk as it arrives instead of
+            # waiting for a full read buffer.
+            for line in r.iter_lines(chunk_size=None):
+                if not line.startswith(b"data:"):
+                    continue  # blank separators, ": keep-alive" comments, event: lines
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    break
+                yield json.loads(data)
+
+    def preconnect(self, timeout: float = 5) -> bool:
+        """
+        Open a keep-alive connection now (GET {base}/models) so the first chat
+        skips TCP/TLS setup. Returns False instead of raising if the server is down.
+        """
+        try:
+            r = self.session.get(f"{self.base}/models", timeout=timeout)
+            r.content  # drain so the connection goes back to the pool
+            return True
+        except requests.RequestException:
+            return False
+
+    # -----------------------------
+    # openai SDK client (Responses API)
+    # -----------------------------
+    def openai(self):
+        """openai.OpenAI for this base, on an httpx pool of the same size."""
+        if self._openai is None:
+            with self._lock:
+                if self._openai is None:
+                    import httpx
+                    from openai import OpenAI
+                    limits = httpx.Limits(max_connections=self.pool_size,
+                                          max_keepalive_connections=self.pool_size)
+                    http = httpx.Client(limits=limits, event_hooks={"response": [self._count]})
+                    self._openai = OpenAI(base_url=self.base, api_key=self.api_key,
+                                          http_client=http)
+        return self._openai
+
+    def _count(self, response) -> None:
+        stream = response.extensions.get("network_stream")
+        with self._lock:
+            self._http_requests += 1
+            try:
+                if stream is not None and stream not in self._http_streams:
+                    self._http_streams.add(stream)
+                    self._http_connections += 1
+            except TypeError:  # not weak-referenceable: count every request as a connection
+                self._http_connections += 1
+
+    # -----------------------------
+    # Stats
+    # -----------------------------
+    def stats(self) -> Dict[str, Any]:
+        """
+        Requests sent, connections opened and requests that reused a kept-alive
+        connection, over both clients (urllib3 pool counters for requests).
+        """
+        sent, opened = self._http_requests, self._http_connections
+        if self._session is not None:
+            pools = self._session.get_adapter(self.base).poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is not None:
+                    sent += pool.num_requests
+                    opened += pool.num_connections
+        return {"base": self.base, "model": self.model, "pool_size": self.pool_size,
+                "requests": sent, "connections": opened, "reused": max(0, sent - opened)}
+
+
+_PROVIDERS: Dict[Tuple[str, str], Provider] = {}
+_LOCK = threading.Lock()
+
+
+def get_provider(base: Optional[str] = None, model: Optional[str] = None, *,
+                 api_key: Optional[str] = None, pool_size: Optional[int] = None) -> Provider:
+    """
+    The process-wide provider for (base, model), created on first use. api_key
+    and pool_size only apply when that first call creates it.
+    """
+    key = ((base or BASE).rstrip("/"), model or MODEL)
+    p = _PROVIDERS.get(key)
+    if p is None:
+        with _LOCK:
+            p = _PROVIDERS.get(key)
+            if p is None:
+                p = _PROVIDERS[key] = Provider(*key, api_key=api_key, pool_size=pool_size)
+    return p
+
+
+def stats() -> List[Dict[str, Any]]:
+    """stats() of every provider created so far."""
+    with _LOCK:
+        providers = list(_PROVIDERS.values())
+    return [p.stats() for p in providers]
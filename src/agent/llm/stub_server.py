@@ -0,0 +1,307 @@
+"""
+Local OpenAI-compatible stub for offline benchmarking: serves /v1/models and
+/v1/chat/completions (plain and SSE streaming) with a synthetic timing model,
+so llm_client, the CLI and the bench scripts run on a CPU-only machine.
+
+    python -m agent.llm.stub_server --port 8000 --ttft-ms 80 --tok-per-s 40 --max-concurrency 8
+    python -m agent.llm.stub_server --record http://gpu-box:8000/v1 --tape run.jsonl
+    python -m agent.llm.stub_server --replay run.jsonl [--strict]
+
+Synthetic replies repeat the words of the last user message up to
+--output-tokens (default: the request's max_tokens), one word per token: the
+first after TTFT, then one every 1/tok_per_s seconds. --max-concurrency caps
+requests being "generated" at once; the rest queue, as on a busy server.
+
+--record proxies every request to a real server and appends its reply (text
+deltas with their time offsets, and usage) to the --tape JSONL file; --replay
+serves those replies with their original timing, keyed like agent.llm.cache
+on the request body. While recording, a reply is sent once the upstream one
+has finished. Replay misses fall back to synthetic replies, or 404 with
+--strict.
+
+In-process (tests, perf suites):
+
+    with StubServer(ttft=0.05, tok_per_s=100) as stub:
+        llm_client.chat("hi", base=stub.base)
+"""
+import argparse, json, threading, time, uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from agent.llm.cache import request_key
+
+_WORDS = ("lorem", "ipsum", "dolor", "sit", "amet")
+_STREAM_KEYS = ("stream", "stream_options")
+
+
+def tape_key(payload: Dict[str, Any]) -> str:
+    """Replay key: the request body minus the streaming switches (either kind replays)."""
+    return request_key("", {k: v for k, v in payload.items() if k not in _STREAM_KEYS})
+
+
+def _sleep_until(deadline: float) -> None:
+    delay = deadline - time.perf_counter()
+    if delay > 0:
+        time.sleep(delay)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, code: int, obj: Dict[str, Any]) -> None:
+        out = json.dumps(obj).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def _error(self, code: int, message: str) -> None:
+        self._json(code, {"error": {"message": message, "type": "invalid_request_error"}})
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            return self._json(200, {"object": "list", "data": [
+                {"id": self.server.model, "object": "model", "owned_by": "stub"}]})
+        self._error(404, f"no route for GET {self.path}")
+
+    def do_POST(self):
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+        except ValueError:
+            return self._error(400, "request body is not JSON")
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._error(404, f"no route for POST {self.path}")
+        if not isinstance(body, dict) or not isinstance(body.get("messages"), list):
+            return self._error(400, "'messages' must be a list")
+        server = self.server
+        t0 = time.perf_counter()
+        with server.slots:
+            with server.lock:
+                server.live += 1
+                server.peak = max(server.peak, server.live)
+                server.served += 1
+            try:
+                try:
+                    reply = server.reply_for(body)
+                except Exception as e:  # --record: the upstream failed
+                    return self._error(502, f"{type(e).__name__}: {e}")
+                if reply is None:
+                    return self._error(404, "no recorded reply for this request (--strict)")
+                if body.get("stream"):
+                    self._stream(body, reply, t0)
+                else:
+                    self._complete(body, reply, t0)
+            finally:
+                with server.lock:
+                    server.live -= 1
+
+    # -----------------------------
+    # Replies: {"chunks": [[offset_s, text], ...], "usage": {...}, "done": offset_s}
+    # -----------------------------
+    def _complete(self, body: Dict[str, Any], reply: Dict[str, Any], t0: float) -> None:
+        _sleep_until(t0 + reply["done"])
+        text = "".join(piece for _, piece in reply["chunks"])
+        self._json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion",
+            "created": int(time.time()), "model": body.get("model") or self.server.model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                         "finish_reason": reply.get("finish_reason", "stop")}],
+            "usage": reply["usage"],
+        })
+
+    def _stream(self, body: Dict[str, Any], reply: Dict[str, Any], t0: float) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": body.get("model") or self.server.model}
+
+        def event(data: bytes) -> None:
+            data = b"data: " + data + b"\n\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        def chunk(delta: Dict[str, Any], finish: Optional[str] = None, **extra) -> bytes:
+            choices = [] if delta is None else [{"index": 0, "delta": delta,
+                                                  "finish_reason": finish}]
+            return json.dumps({**base, "choices": choices, **extra}).encode("utf-8")
+
+        event(chunk({"role": "assistant", "content": ""}))
+        for offset, piece in reply["chunks"]:
+            _sleep_until(t0 + offset)
+            event(chunk({"content": piece}))
+        _sleep_until(t0 + reply["done"])
+        event(chunk({}, reply.get("finish_reason", "stop")))
+        if (body.get("stream_options") or {}).get("include_usage"):
+            event(chunk(None, usage=reply["usage"]))
+        event(b"[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    The stub as an object: ``ttft`` in seconds, ``tok_per_s`` (0: no delay
+    between tokens), ``output_tokens`` (None: the request's max_tokens),
+    ``max_concurrency`` (0: unlimited). ``record``/``tape``/``replay``/``strict``
+    as on the command line. peak/served count requests in flight and answered.
+    """
+    daemon_threads = True
+    request_queue_size = 512
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, *, model: str = "stub",
+                 ttft: float = 0.05, tok_per_s: float = 50.0, output_tokens: Optional[int] = None,
+                 max_concurrency: int = 0, record: Optional[str] = None,
+                 tape: Optional[str] = None, replay: Optional[str] = None, strict: bool = False):
+        if record and not tape:
+            raise ValueError("record needs a tape file to write to")
+        super().__init__((host, port), _Handler)
+        self.model = model
+        self.ttft = max(0.0, ttft)
+        self.tok_per_s = max(0.0, tok_per_s)
+        self.output_tokens = output_tokens
+        self.record, self.tape, self.strict = record, tape, strict
+        self.slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency > 0 \
+            else _NoLimit()
+        self.lock = threading.Lock()
+        self.live = self.peak = self.served = 0
+        self.recorded: Dict[str, Dict[str, Any]] = load_tape(replay) if replay else {}
+        self._replaying = replay is not None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StubServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # -----------------------------
+    # Where a reply comes from
+    # -----------------------------
+    def reply_for(self, body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        if self.record:
+            return self._record(body)
+        if self._replaying:
+            reply = self.recorded.get(tape_key(body))
+            if reply is not None or self.strict:
+                return reply
+        return self.synthetic(body)
+
+    def synthetic(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        messages = body.get("messages") or []
+        user = [m.get("content") for m in messages if m.get("role") == "user"]
+        words = (str(user[-1]).split() if user else []) or list(_WORDS)
+        max_tokens = int(body.get("max_tokens") or 128)
+        n = max(1, min(max_tokens, self.output_tokens or max_tokens))
+        gap = 1.0 / self.tok_per_s if self.tok_per_s else 0.0
+        chunks = [[self.ttft + i * gap, (" " if i else "") + words[i % len(words)]]
+                  for i in range(n)]
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+        return {"chunks": chunks, "done": chunks[-1][0],
+                "finish_reason": "length" if n == max_tokens else "stop",
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": n,
+                          "total_tokens": prompt_tokens + n}}
+
+    def _record(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        from agent.llm.provider import get_provider
+        upstream = get_provider(self.record, body.get("model") or self.model)
+        payload = {k: v for k, v in body.items() if k not in _STREAM_KEYS}
+        t0 = time.perf_counter()
+        chunks: List[List[Any]] = []
+        usage: Dict[str, Any] = {}
+        finish = "stop"
+        if body.get("stream"):
+            for event in upstream.stream(payload):
+                usage = event.get("usage") or usage
+                for choice in event.get("choices") or ():
+                    piece = (choice.get("delta") or {}).get("content")
+                    if piece:
+                        chunks.append([time.perf_counter() - t0, piece])
+                    finish = choice.get("finish_reason") or finish
+        else:
+            text, usage = upstream.complete(payload)
+            chunks.append([time.perf_counter() - t0, text])
+        reply = {"chunks": chunks, "usage": usage, "finish_reason": finish,
+                 "done": time.perf_counter() - t0}
+        # Played back from t0 = request arrival, offsets already include the upstream TTFT.
+        entry = {"key": tape_key(body), **reply}
+        with self.lock:
+            self.recorded[entry["key"]] = reply
+            with open(self.tape, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return reply
+
+
+class _NoLimit:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def load_tape(path: str) -> Dict[str, Dict[str, Any]]:
+    """key -> reply from a --record tape (a later entry for the same key wins)."""
+    out: Dict[str, Dict[str, Any]] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                out[entry.pop("key")] = entry
+    return out
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="OpenAI-compatible stub server for offline benchmarks")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--model", default="stub", help="Model id served on /v1/models")
+    ap.add_argument("--ttft-ms", type=float, default=50, help="Time to first token. Default 50")
+    ap.add_argument("--tok-per-s", type=float, default=50,
+                    help="Output tokens per second per request (0: no delay). Default 50")
+    ap.add_argument("--output-tokens", type=int, help="Tokens per reply (default: request max_tokens)")
+    ap.add_argument("--max-concurrency", type=int, default=0,
+                    help="Requests generated at once; the rest queue (0: unlimited)")
+    ap.add_argument("--record", metavar="BASE", help="Proxy to this real server and record replies")
+    ap.add_argument("--tape", help="JSONL file --record appends to")
+    ap.add_argument("--replay", metavar="TAPE", help="Serve replies recorded in TAPE")
+    ap.add_argument("--strict", action="store_true", help="Replay: 404 instead of a synthetic reply")
+    args = ap.parse_args(argv)
+    if args.record and not args.tape:
+        ap.error("--record needs --tape")
+    server = StubServer(args.host, args.port, model=args.model, ttft=args.ttft_ms / 1e3,
+                        tok_per_s=args.tok_per_s, output_tokens=args.output_tokens,
+                        max_concurrency=args.max_concurrency, record=args.record,
+                        tape=args.tape, replay=args.replay, strict=args.strict)
+    print(f"stub serving {server.base}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Token-budgeted --ctx-file handling: count the context client-side and cut it
+to fit the model window before anything is sent.
+
+    info = fit_prompt(msg, "notes.md", window=4096, max_tokens=256)
+    info["prompt"]       # "Context:\\n...\\n\\nUser:\\n<msg>", within the window
+    info["context"]      # {"file_tokens", "sent_tokens", "prompt_tokens", "budget", ...}
+
+Tokens are counted with tiktoken ($AGENT_TOKENIZER, default cl100k_base)
+when it is installed and its encoding is available, otherwise with a
+deliberately pessimistic regex estimate. Per-line token counts are cached on
+disk under $AGENT_CACHE_DIR/ctx, keyed by the file's SHA-256 and the
+tokenizer, so an unchanged file is only tokenized once.
+
+Window: $AGENT_CTX_WINDOW, default 4096 (serve_vllm.sh's --max-model-len).
+"""
+import hashlib, os, re
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from agent.runtime.paths import cache_dir
+
+DEBUG = os.getenv("AGENT_DEBUG") == "1"
+def _dbg(*a):
+    if DEBUG: print("[DEBUG context]", *a)
+
+WINDOW = int(os.getenv("AGENT_CTX_WINDOW", "4096"))
+TOKENIZER = os.getenv("AGENT_TOKENIZER", "cl100k_base")
+# Chat template framing per request (role markers, separators), plus slack for
+# per-line counts not summing exactly to the whole-text count.
+OVERHEAD = 32
+CTX_TEMPLATE = "Context:\n{ctx}\n\nUser:\n{msg}"
+
+_HEURISTIC = re.compile(r"\w{1,4}|[^\w\s]")
+
+
+# -----------------------------
+# Counting
+# -----------------------------
+_ENCODERS: Dict[str, Any] = {}
+
+def _encoder(name: str):
+    """tiktoken encoding ``name``, or None (not installed, unknown, or not downloadable)."""
+    if name not in _ENCODERS:
+        try:
+            import tiktoken
+            _ENCODERS[name] = tiktoken.get_encoding(name)
+        except Exception as e:
+            _dbg("tiktoken unavailable, estimating tokens:", e)
+            _ENCODERS[name] = None
+    return _ENCODERS[name]
+
+def tokenizer_name(name: Optional[str] = None) -> str:
+    name = name or TOKENIZER
+    return name if _encoder(name) is not None else "heuristic"
+
+def count_tokens(text: str, tokenizer: Optional[str] = None) -> int:
+    enc = _encoder(tokenizer or TOKENIZER)
+    if enc is not None:
+        return len(enc.encode_ordinary(text))
+    return len(_HEURISTIC.findall(text))
+
+def _line_counts(lines, tokenizer: str):
+    enc = _encoder(tokenizer)
+    if enc is not None:
+        return [len(t) for t in enc.encode_ordinary_batch(lines)]
+    return [len(_HEURISTIC.findall(line)) for line in lines]
+
+
+# -----------------------------
+# Per-file cache
+# -----------------------------
+class ContextFile(NamedTuple):
+    text: str
+    sha256: str
+    tokenizer: str
+    offsets: np.ndarray     # char offset where each line starts, plus len(text)
+    cum_tokens: np.ndarray  # tokens before each line, plus the total
+
+    @property
+    def tokens(self) -> int:
+        return int(self.cum_tokens[-1])
+
+_FILES: Dict[Tuple[str, int, int, str], ContextFile] = {}
+
+def _table_path(digest: str, tokenizer: str) -> str:
+    return os.path.join(cache_dir(), "ctx", f"{digest}-{tokenizer}.npy")
+
+def load_context(path: str, tokenizer: Optional[str] = None) -> ContextFile:
+    """
+    Read ``path`` with its per-line token table. Memoized per (path, mtime,
+    size) in-process; the table itself is cached on disk by content hash.
+    """
+    tok = tokenizer_name(tokenizer)
+    st = os.stat(path)
+    memo = (os.path.abspath(path), st.st_mtime_ns, st.st_size, tok)
+    ctx = _FILES.get(memo)
+    if ctx is not None:
+        return ctx
+    with open(path, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).hexdigest()
+    text = raw.decode("utf-8")
+    lines = text.splitlines(keepends=True)
+    table_path = _table_path(digest, tok)
+    try:
+        table = np.load(table_path)
+        if table.shape != (2, len(lines) + 1):
+            raise ValueError("stale table")
+    except (OSError, ValueError):
+        table = np.zeros((2, len(lines) + 1), dtype=np.int64)
+        np.cumsum([len(line) for line in lines], out=table[0, 1:])
+        np.cumsum(_line_counts(lines, tok), out=table[1, 1:])
+        try:
+            os.makedirs(os.path.dirname(table_path), exist_ok=True)
+            tmp = f"{table_path}.{os.getpid()}.tmp.npy"
+            np.save(tmp, table)
+            os.replace(tmp, table_path)
+        except OSError as e:  # read-only cache dir: still budget, just recount next time
+            _dbg("Cannot write token table", table_path, "->", e)
+    ctx = _FILES[memo] = ContextFile(text, digest, tok, table[0], table[1])
+    return ctx
+
+
+# -----------------------------
+# Fitting
+# -----------------------------
+def truncate(ctx: ContextFile, budget: int, keep: str = "head") -> Tuple[str, int]:
+    """
+    The longest run of whole lines from the start ("head") or end ("tail") of
+    ``ctx`` costing at most ``budget`` tokens, and its token count. The line
+    that does not fit whole is cut by characters to fill what is left.
+    """
+    if budget <= 0:
+        return "", 0
+    if ctx.tokens <= budget:
+        return ctx.text, ctx.tokens
+    offsets, cum = ctx.offsets, ctx.cum_tokens
+    if keep == "tail":
+        # first line i whose suffix cum[-1] - cum[i] fits
+        i = int(np.searchsorted(cum, cum[-1] - budget, side="left"))
+        text, used = ctx.text[offsets[i]:], int(cum[-1] - cum[i])
+        if i > 0:  # fill the rest from the tail of the line before
+            line = ctx.text[offsets[i - 1]:offsets[i]]
+            part, n = _cut(line, budget - used, ctx.tokenizer, tail=True)
+            text, used = part + text, used + n
+        return text, used
+    # last i whose prefix cum[i] fits
+    i = int(np.searchsorted(cum, budget, side="right")) - 1
+    text, used = ctx.text[:offsets[i]], int(cum[i])
+    if i < len(offsets) - 1:
+        line = ctx.text[offsets[i]:offsets[i + 1]]
+        part, n = _cut(line, budget - used, ctx.tokenizer, tail=False)
+        text, used = text + part, used + n
+    return text, used
+
+def _cut(line: str, spare: int, tokenizer: str, tail: bool) -> Tuple[str, int]:
+    """
+    The longest head (or tail) of ``line`` counting at most ``spare`` tokens,
+    and its count; binary search on the length, since token density varies
+    along a line and a proportional cut can overshoot.
+    """
+    piece = (lambda n: line[len(line) - n:]) if tail else (lambda n: line[:n])
+    lo, hi, best = 0, len(line), 0
+    while lo < hi and spare > 0:
+        mid = (lo + hi + 1) // 2
+        n = count_tokens(piece(mid), tokenizer)
+        if n <= spare:
+            lo, best = mid, n
+        else:
+            hi = mid - 1
+    return piece(lo), best
+
+def fit_prompt(msg: str, path: str, window: Optional[int] = None, max_tokens: int = 256,
+               system: str = "", keep: str = "head", top_k: int = 8,
+               tokenizer: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Wrap ``msg`` with as much of ``path`` as fits in ``window`` after reserving
+    ``max_tokens`` for the reply, the system prompt and OVERHEAD. ``keep`` is
+    "head", "tail" or "relevant" (the ``top_k`` best BM25 chunks for ``msg``,
+    see agent.runtime.ctx_index). Returns {"prompt", "context"}; "context"
+    holds the token accounting for --json.
+    """
+    window = window or WINDOW
+    tok = tokenizer_name(tokenizer)
+    fixed = (count_tokens(CTX_TEMPLATE.format(ctx="", msg=msg), tok)
+             + (count_tokens(system, tok) if system else 0) + OVERHEAD)
+    budget = max(0, window - max_tokens - fixed)
+    extra: Dict[str, Any] = {}
+    if keep == "relevant":
+        from agent.runtime.ctx_index import get_index
+        index = get_index(path, tok)
+        text, sent, ids = index.select(msg, budget, top_k)
+        file_tokens = index.tokens
+        extra = {"chunks": ids, "chunks_total": index.n}
+        if not ids and text:
+            extra["fallback"] = "head"  # no chunk shares a term with the message
+    else:
+        ctx = load_context(path, tok)
+        text, sent = truncate(ctx, budget, keep)
+        file_tokens = ctx.tokens
+    return {
+        "prompt": CTX_TEMPLATE.format(ctx=text, msg=msg),
+        "context": {
+            "file": path,
+            "tokenizer": tok,
+            "keep": keep,
+            "file_tokens": file_tokens,
+            "sent_tokens": sent,
+            "prompt_tokens": sent + fixed,
+            "max_tokens": max_tokens,
+            "window": window,
+            "budget": budget,
+            "truncated": sent < file_tokens,
+            **extra,
+        },
+    }
@@ -0,0 +1,282 @@
+"""
+BM25 chunk index over a --ctx-file, so each request sends only the chunks
+relevant to the message instead of the whole file.
+
+    index = get_index("corpus.md")
+    text, tokens, ids = index.select("how does routing work?", budget=3000, k=8)
+
+The file is cut at line boundaries into chunks of about CHUNK_TOKENS tokens
+($AGENT_CTX_CHUNK_TOKENS, default 256; longer lines are split) and indexed once. The index (chunk
+byte offsets, token counts, CSR postings and the vocabulary) lives under
+$AGENT_CACHE_DIR/ctx/<sha256>-<tokenizer>-c<chunk_tokens>/ and is loaded with
+np.load(mmap_mode="r"); the file itself is mmap'd and only the chosen chunks
+are decoded. A small per-path record (mtime, size, sha256) means an
+unchanged file is not re-hashed either, so a request on a multi-hundred-MB
+corpus costs a stat(), the query's postings and k chunk reads.
+"""
+import hashlib, json, math, mmap, os, re, shutil
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from agent.runtime.context import _cut, count_tokens, tokenizer_name
+from agent.runtime.paths import cache_dir
+
+CHUNK_TOKENS = int(os.getenv("AGENT_CTX_CHUNK_TOKENS", "256"))
+INDEX_VERSION = 2
+K1, B = 1.2, 0.75
+
+_TERM = re.compile(r"\w+")
+GAP = "...\n"  # between chosen chunks that are not adjacent in the file
+_ARRAYS = ("offsets", "chunk_tokens", "doc_len", "indptr", "doc_ids", "tfs")
+
+
+def terms(text: str) -> List[str]:
+    return _TERM.findall(text.lower())
+
+
+# -----------------------------
+# Locating a file's index without re-hashing it
+# -----------------------------
+def _file_sha256(path: str) -> str:
+    """Content hash, trusted from the per-path record while mtime and size match."""
+    st = os.stat(path)
+    record = os.path.join(cache_dir(), "ctx",
+                          hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest() + ".json")
+    try:
+        with open(record, encoding="utf-8") as f:
+            rec = json.load(f)
+        if rec["mtime_ns"] == st.st_mtime_ns and rec["size"] == st.st_size:
+            return rec["sha256"]
+    except (OSError, ValueError, KeyError):
+        pass
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    try:
+        os.makedirs(os.path.dirname(record), exist_ok=True)
+        with open(f"{record}.{os.getpid()}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": digest}, f)
+        os.replace(f"{record}.{os.getpid()}.tmp", record)
+    except OSError:
+        pass
+    return digest
+
+
+# -----------------------------
+# Building
+# -----------------------------
+def line_chunks(mm, tokenizer: str, chunk_tokens: int):
+    """
+    Yield (start, end, tokens, text) runs of whole lines of about chunk_tokens
+    tokens; a line longer than that is split into chunk_tokens pieces.
+    """
+    start = pos = used = 0
+    lines: List[str] = []
+    size = len(mm)
+    while pos < size:
+        nl = mm.find(b"\n", pos)
+        end = size if nl < 0 else nl + 1
+        line = mm[pos:end].decode("utf-8", errors="replace")
+        n = count_tokens(line, tokenizer)
+        if lines and used + n > chunk_tokens:
+            yield start, pos, used, "".join(lines)
+            start, used, lines = pos, 0, []
+        while n > chunk_tokens:
+            piece, m = _split_head(line, tokenizer, chunk_tokens)
+            # byte length of the piece; only approximate where the line had invalid UTF-8
+            cut = min(pos + len(piece.encode("utf-8")), end)
+            yield pos, cut, m, piece
+            line, pos = line[len(piece):], cut
+            n = count_tokens(line, tokenizer)
+            start = pos
+        if line:
+            lines.append(line)
+            used += n
+        pos = end
+    if lines:
+        yield start, pos, used, "".join(lines)
+
+
+def _split_head(line: str, tokenizer: str, chunk_tokens: int) -> Tuple[str, int]:
+    """The longest head of ``line`` within chunk_tokens (at least one character)."""
+    window = chunk_tokens * 4  # cut from a prefix, not the whole (possibly huge) line
+    while window < len(line) and count_tokens(line[:window], tokenizer) <= chunk_tokens:
+        window *= 2
+    piece, m = _cut(line[:window], chunk_tokens, tokenizer, tail=False)
+    if not piece:
+        piece = line[:1]
+        m = count_tokens(piece, tokenizer)
+    return piece, m
+
+
+def build_index(path: str, out_dir: str, tokenizer: str, chunk_tokens: int) -> None:
+    offsets, tokens, doc_len = [0], [], []
+    vocab: Dict[str, int] = defaultdict()
+    vocab.default_factory = vocab.__len__  # unseen term -> next id, without a Python loop
+    post_terms, post_docs, post_tfs = [], [], []
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size \
+            else b""
+        try:
+            for doc, (start, end, n, text) in enumerate(line_chunks(mm, tokenizer, chunk_tokens)):
+                offsets.append(end)
+                tokens.append(n)
+                ids = np.fromiter(map(vocab.__getitem__, terms(text)), dtype=np.int64)
+                doc_len.append(len(ids))
+                uniq, tf = np.unique(ids, return_counts=True)
+                post_terms.append(uniq)
+                post_docs.append(np.full(len(uniq), doc, dtype=np.int32))
+                post_tfs.append(tf)
+        finally:
+            if isinstance(mm, mmap.mmap):
+                mm.close()
+    cat = lambda parts, dtype: np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype)
+    post_terms = cat(post_terms, np.int64)
+    order = np.argsort(post_terms, kind="stable")  # CSR by term, docs ascending within a term
+    arrays = {
+        "offsets": np.asarray(offsets, dtype=np.int64),
+        "chunk_tokens": np.asarray(tokens, dtype=np.int64),
+        "doc_len": np.asarray(doc_len, dtype=np.float32),
+        "indptr": np.concatenate(([0], np.cumsum(np.bincount(post_terms, minlength=len(vocab))))
+                                 ).astype(np.int64),
+        "doc_ids": cat(post_docs, np.int32)[order],
+        "tfs": cat(post_tfs, np.float32)[order],
+    }
+    tmp = f"{out_dir}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, arr in arrays.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), arr)
+    with open(os.path.join(tmp, "vocab.json"), "w", encoding="utf-8") as f:
+        json.dump(dict(vocab), f, ensure_ascii=False)
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"version": INDEX_VERSION, "tokenizer": tokenizer, "chunk_tokens": chunk_tokens,
+                   "chunks": len(tokens), "tokens": int(sum(tokens))}, f)
+    try:
+        os.replace(tmp, out_dir)
+    except OSError:  # another process won the race; its index is the same
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# -----------------------------
+# Querying
+# -----------------------------
+class ChunkIndex:
+    def __init__(self, path: str, index_dir: str):
+        self.path = path
+        with open(os.path.join(index_dir, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.tokenizer = meta["tokenizer"]
+        self.tokens = meta["tokens"]  # whole file
+        for name in _ARRAYS:
+            setattr(self, name, np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r"))
+        with open(os.path.join(index_dir, "vocab.json"), encoding="utf-8") as f:
+            self.vocab: Dict[str, int] = json.load(f)
+        self.n = meta["chunks"]
+        avgdl = float(np.mean(self.doc_len)) if self.n else 0.0
+        self._norm = K1 * (1 - B + B * np.asarray(self.doc_len) / (avgdl or 1.0))
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) \
+            if self.offsets[-1] else b""
+
+    def chunk(self, i: int) -> str:
+        lo, hi = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self._mm[lo:hi].decode("utf-8", errors="replace")
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every chunk for ``query`` (zeros when no term matches)."""
+        out = np.zeros(self.n, dtype=np.float32)
+        if not self.n:
+            return out
+        for term, qtf in Counter(terms(query)).items():
+            tid = self.vocab.get(term)
+            if tid is None:
+                continue
+            lo, hi = int(self.indptr[tid]), int(self.indptr[tid + 1])
+            docs, tf = self.doc_ids[lo:hi], self.tfs[lo:hi]
+            idf = math.log(1 + (self.n - (hi - lo) + 0.5) / ((hi - lo) + 0.5))
+            # docs are unique within one term's postings, so fancy-index += is safe
+            out[docs] += qtf * idf * tf * (K1 + 1) / (tf + self._norm[docs])
+        return out
+
+    def search(self, query: str, k: int = 8) -> List[Tuple[int, float]]:
+        """Top-k (chunk id, score), best first; chunks with no matching term are left out."""
+        s = self.scores(query)
+        k = min(k, int(np.count_nonzero(s)))
+        if k <= 0:
+            return []
+        top = np.argpartition(-s, k - 1)[:k]
+        top = top[np.lexsort((top, -s[top]))]
+        return [(int(i), float(s[i])) for i in top]
+
+    def select(self, query: str, budget: int, k: int = 8,
+               fallback: str = "head") -> Tuple[str, int, List[int]]:
+        """
+        Best chunks for ``query`` up to ``k`` and ``budget`` tokens (GAP
+        markers included), joined in file order; returns (text, tokens, chunk
+        ids). When no chunk matches any query term, the file's ``fallback``
+        ("head" or "tail") within ``budget`` is returned instead, with no ids;
+        when the best chunk does not fit whole, as much of its head as does.
+        """
+        hits = self.search(query, k)
+        if not hits:
+            from agent.runtime.context import load_context, truncate
+            text, used = truncate(load_context(self.path, self.tokenizer), budget, fallback)
+            return text, used, []
+        best = hits[0][0]
+        if self.chunk_tokens[best] > budget:  # rather than skip to lesser hits that fit
+            text, used = _cut(self.chunk(best), budget, self.tokenizer, tail=False)
+            return text, used, [best] if text else []
+        gap = count_tokens(GAP, self.tokenizer)
+        chosen, used, runs = set(), 0, 0  # runs of adjacent chunks: runs - 1 gaps
+        for i, _ in hits:
+            after = runs + 1 - ((i - 1) in chosen) - ((i + 1) in chosen)
+            n = int(self.chunk_tokens[i])
+            if used + n + gap * (max(after, 1) - max(runs, 1)) <= budget:
+                chosen.add(i)
+                used += n + gap * (max(after, 1) - max(runs, 1))
+                runs = after
+        ids = sorted(chosen)
+        parts, prev = [], None
+        for i in ids:
+            if prev is not None and i != prev + 1:
+                parts.append(GAP)
+            parts.append(self.chunk(i))
+            prev = i
+        return "".join(parts), used, ids
+
+    def close(self) -> None:
+        if isinstance(self._mm, mmap.mmap):
+            self._mm.close()
+        self._file.close()
+
+
+_INDEXES: Dict[Tuple[str, int, int, str, int], ChunkIndex] = {}
+
+
+def get_index(path: str, tokenizer: Optional[str] = None,
+              chunk_tokens: Optional[int] = None) -> ChunkIndex:
+    """The index for ``path``, built on first use and cached on disk and in-process."""
+    tok = tokenizer_name(tokenizer)
+    chunk_tokens = chunk_tokens or CHUNK_TOKENS
+    st = os.stat(path)
+    memo = (os.path.abspath(path), st.st_mtime_ns, st.st_size, tok, chunk_tokens)
+    index = _INDEXES.get(memo)
+    if index is None:
+        index_dir = os.path.join(cache_dir(), "ctx", f"{_file_sha256(path)}-{tok}-c{chunk_tokens}")
+        try:
+            with open(os.path.join(index_dir, "meta.json"), encoding="utf-8") as f:
+                fresh = json.load(f).get("version") == INDEX_VERSION
+        except (OSError, ValueError):
+            fresh = False
+        if not fresh:
+            shutil.rmtree(index_dir, ignore_errors=True)
+            build_index(path, index_dir, tok, chunk_tokens)
+        for old in [m for m in _INDEXES if m[0] == memo[0] and m[1:3] != memo[1:3]]:  # edited since
+            _INDEXES.pop(old).close()
+        index = _INDEXES[memo] = ChunkIndex(path, index_dir)
+    return index
@@ -0,0 +1,65 @@
+"""
+Request envelope: a message decoded once, up front, so tools never re-parse it.
+
+    {"tool": "stringy", "args": {"op": "upper", "text": "hi"}}
+      -> Envelope(tool="stringy", args={...}, raw=<text>, payload=<decoded dict>)
+
+Plain text decodes to Envelope(tool=None, args={}, raw=text, payload=None).
+"""
+import ast, json
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+
+@dataclass(frozen=True)
+class Envelope:
+    raw: str
+    tool: Optional[str] = None
+    args: Dict[str, Any] = field(default_factory=dict)
+    payload: Optional[Dict[str, Any]] = None  # the decoded object, if raw was one
+
+
+def _decode(text: str) -> Optional[Dict[str, Any]]:
+    """JSON object, or a Python dict literal ({'tool': 'echo'}); None otherwise."""
+    t = text.strip()
+    if not (t.startswith("{") and t.endswith("}")):
+        return None
+    try:
+        obj = json.loads(t)
+    except json.JSONDecodeError:
+        try:
+            obj = ast.literal_eval(t)
+        except Exception:
+            return None
+    return obj if isinstance(obj, dict) else None
+
+
+def decode_payload(text: Any) -> Optional[Dict[str, Any]]:
+    """
+    For tools: return ``text`` itself if the router already decoded it,
+    otherwise decode a JSON/dict string (direct callers), else None.
+    """
+    if isinstance(text, dict):
+        return text
+    if isinstance(text, str):
+        return _decode(text)
+    return None
+
+
+def payload_args(payload: Dict[str, Any]) -> Dict[str, Any]:
+    args = payload.get("args")
+    return args if isinstance(args, dict) else {}
+
+
+def parse_envelope(message: Any) -> Envelope:
+    raw = message if isinstance(message, str) else str(message)
+    payload = decode_payload(message)
+    if payload is None:
+        return Envelope(raw=raw)
+    tool = payload.get("tool")
+    return Envelope(
+        raw=raw,
+        tool=tool if isinstance(tool, str) else None,
+        args=payload_args(payload),
+        payload=payload,
+    )
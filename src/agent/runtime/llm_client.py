@@ -1,28 +1,261 @@
-import os, requests
-from typing import Tuple, Dict, Any
+import asyncio, json, time
+from typing import Tuple, Dict, Any, Callable, Iterable, List, Optional
 
-BASE = os.getenv("OPENAI_BASE", "http://127.0.0.1:8000/v1")
-MODEL = os.getenv("OPENAI_MODEL", "Qwen/Qwen2.5-7B-Instruct")
-API_KEY = os.getenv("OPENAI_API_KEY", "sk-not-needed")
+import requests
+
+from agent.llm.cache import get_cache, request_key
+from agent.llm.provider import API_KEY, BASE, MODEL, chat_payload, chat_reply, get_provider
+
+SYSTEM = "You are helpful and concise."
+
+def session(base: Optional[str] = None, model: Optional[str] = None) -> requests.Session:
+    """The pooled keep-alive session for (base, model) (see agent.llm.provider)."""
+    return get_provider(base, model).session
 
 def chat(prompt: str,
-         system: str = "You are helpful and concise.",
+         system: str = SYSTEM,
          temperature: float = 0.2,
          max_tokens: int = 256,
-         timeout: int = 60) -> Tuple[str, Dict[str, Any]]:
-    payload = {
-        "model": MODEL,
-        "messages": [
-            {"role": "system", "content": system},
-            {"role": "user", "content": prompt},
-        ],
-        "temperature": temperature,
-        "max_tokens": max_tokens,
-    }
-    headers = {"Authorization": f"Bearer {API_KEY}"}
-    r = requests.post(f"{BASE}/chat/completions", json=payload, headers=headers, timeout=timeout)
+         timeout: int = 60,
+         base: Optional[str] = None,
+         model: Optional[str] = None,
+         seed: Optional[int] = None,
+         cache: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+    """
+    One chat completion. ``cache`` ("off", "rw", "ro"; default $AGENT_LLM_CACHE)
+    serves byte-identical requests from agent.llm.cache; with a cache on, usage
+    carries "cached": True for a hit and False for a live call.
+    """
+    provider = get_provider(base, model)
+    payload = chat_payload(prompt, system, temperature, max_tokens, provider.model, seed)
+    store = get_cache(cache)
+    if store is None:
+        return provider.complete(payload, timeout)
+    key = request_key(provider.base, payload)
+    hit = store.get(key)
+    if hit is not None:
+        return hit[0], {**hit[1], "cached": True}
+    text, usage = provider.complete(payload, timeout)
+    store.put(key, text, usage)
+    return text, {**usage, "cached": False}
+
+class _StreamTimer:
+    """Collects SSE chunk events into (text, usage, timing), stamping each text delta."""
+
+    def __init__(self, on_token: Optional[Callable[[str], Any]] = None):
+        self.on_token = on_token
+        self.t0 = time.perf_counter()
+        self.pieces: List[str] = []
+        self.stamps: List[float] = []
+        self.usage: Dict[str, Any] = {}
+
+    def feed(self, event: Dict[str, Any]) -> None:
+        if event.get("usage"):
+            self.usage = event["usage"]
+        for choice in event.get("choices") or ():
+            piece = (choice.get("delta") or {}).get("content")
+            if piece:
+                self.stamps.append(time.perf_counter())
+                self.pieces.append(piece)
+                if self.on_token is not None:
+                    self.on_token(piece)
+
+    def result(self) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+        total = time.perf_counter() - self.t0
+        stamps = self.stamps
+        timing = {
+            "ttft_ms": round((stamps[0] - self.t0) * 1e3, 3) if stamps else None,
+            "itl_ms": round((stamps[-1] - stamps[0]) * 1e3 / (len(stamps) - 1), 3)
+                      if len(stamps) > 1 else None,
+            "total_ms": round(total * 1e3, 3),
+            "chunks": len(stamps),
+        }
+        return "".join(self.pieces).strip(), self.usage, timing
+
+def chat_stream(prompt: str,
+                system: str = SYSTEM,
+                temperature: float = 0.2,
+                max_tokens: int = 256,
+                timeout: int = 60,
+                base: Optional[str] = None,
+                model: Optional[str] = None,
+                seed: Optional[int] = None,
+                cache: Optional[str] = None,
+                on_token: Optional[Callable[[str], Any]] = None
+                ) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+    """
+    chat() over SSE: ``on_token`` is called with each text delta as it arrives.
+    Returns (text, usage, timing); timing has ttft_ms (request to first token),
+    itl_ms (mean gap between later tokens), total_ms and the number of chunks.
+    A cache hit (same key as chat()) is replayed as a single chunk.
+    """
+    provider = get_provider(base, model)
+    payload = chat_payload(prompt, system, temperature, max_tokens, provider.model, seed)
+    store = get_cache(cache)
+    key = request_key(provider.base, payload) if store is not None else None
+    timer = _StreamTimer(on_token)
+    hit = store.get(key) if store is not None else None
+    if hit is not None:
+        timer.feed({"choices": [{"delta": {"content": hit[0]}}], "usage": hit[1]})
+    else:
+        for event in provider.stream(payload, timeout):
+            timer.feed(event)
+    text, usage, timing = timer.result()
+    if store is not None:
+        if hit is None:
+            store.put(key, text, usage)
+        usage = {**usage, "cached": hit is not None}
+    return text, usage, timing
+
+# -----------------------------
+# Async: many requests in flight on one event loop
+# -----------------------------
+def _httpx():
+    try:
+        import httpx
+    except ImportError:
+        raise ImportError('achat/chat_many need httpx: pip install "httpx>=0.27.0,<0.28.0"') from None
+    return httpx
+
+# httpcore scans every pooled connection for every queued request, which goes
+# quadratic with hundreds in flight (400 requests at 200-way: ~9 s on one
+# client vs ~1 s spread over clients of 4 connections each).
+SHARD_CONNECTIONS = 4
+
+_SSL_CONTEXT = None  # loading the CA bundle costs ~50 ms; do it once, not per client
+
+def async_client(connections: int = SHARD_CONNECTIONS, timeout: float = 60):
+    """An httpx.AsyncClient keeping up to ``connections`` keep-alive connections."""
+    global _SSL_CONTEXT
+    httpx = _httpx()
+    if _SSL_CONTEXT is None:
+        _SSL_CONTEXT = httpx.create_ssl_context()
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=connections)
+    return httpx.AsyncClient(limits=limits, timeout=timeout, verify=_SSL_CONTEXT,
+                             headers={"Authorization": f"Bearer {API_KEY}"})
+
+async def achat(prompt: str,
+                system: str = SYSTEM,
+                temperature: float = 0.2,
+                max_tokens: int = 256,
+                timeout: int = 60,
+                base: Optional[str] = None,
+                model: Optional[str] = None,
+                client=None) -> Tuple[str, Dict[str, Any]]:
+    """chat() without blocking the event loop. Pass ``client`` (see async_client) to share its pool."""
+    if client is None:
+        async with async_client(1, timeout) as client:
+            return await achat(prompt, system, temperature, max_tokens, timeout, base, model, client)
+    payload = chat_payload(prompt, system, temperature, max_tokens, model or MODEL)
+    r = await client.post(f"{base or BASE}/chat/completions", json=payload, timeout=timeout)
     r.raise_for_status()
-    data = r.json()
-    text = data["choices"][0]["message"]["content"].strip()
-    usage = data.get("usage", {})
-    return text, usage
+    return chat_reply(r.json())
+
+async def achat_stream(prompt: str,
+                       system: str = SYSTEM,
+                       temperature: float = 0.2,
+                       max_tokens: int = 256,
+                       timeout: int = 60,
+                       base: Optional[str] = None,
+                       model: Optional[str] = None,
+                       seed: Optional[int] = None,
+                       client=None,
+                       on_token: Optional[Callable[[str], Any]] = None
+                       ) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+    """chat_stream() on the event loop (no cache): returns (text, usage, timing)."""
+    if client is None:
+        async with async_client(1, timeout) as client:
+            return await achat_stream(prompt, system, temperature, max_tokens, timeout, base,
+                                      model, seed, client, on_token)
+    payload = chat_payload(prompt, system, temperature, max_tokens, model or MODEL, seed)
+    payload.update(stream=True, stream_options={"include_usage": True})
+    timer = _StreamTimer(on_token)
+    async with client.stream("POST", f"{base or BASE}/chat/completions", json=payload,
+                             timeout=timeout) as r:
+        r.raise_for_status()
+        async for line in r.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            timer.feed(json.loads(data))
+    return timer.result()
+
+async def achat_many(prompts: Iterable[str], concurrency: int = 64, *,
+                     return_exceptions: bool = False, client=None, **kwargs) -> List[Any]:
+    """
+    Run achat over ``prompts`` with at most ``concurrency`` requests in flight;
+    results come back in input order. A task is only created once a semaphore
+    slot is free, so a long prompt list never sits in memory as coroutines.
+    Requests are spread over clients of SHARD_CONNECTIONS each (or all go
+    through ``client`` if given).
+    The first failure cancels the rest and is raised, unless return_exceptions
+    puts each exception in its result slot instead. Other kwargs go to achat.
+    """
+    concurrency = max(1, concurrency)
+    if client is not None:
+        clients = [client]
+    else:
+        timeout = kwargs.get("timeout", 60)
+        clients = [async_client(SHARD_CONNECTIONS, timeout)
+                   for _ in range(-(-concurrency // SHARD_CONNECTIONS))]
+    try:
+        return await _run_many(prompts, concurrency, return_exceptions, clients, kwargs)
+    finally:
+        if client is None:
+            await asyncio.gather(*(c.aclose() for c in clients))
+
+async def _run_many(prompts: Iterable[str], concurrency: int, return_exceptions: bool,
+                    clients: list, kwargs: Dict[str, Any]) -> List[Any]:
+    results: List[Any] = []
+    sem = asyncio.Semaphore(concurrency)
+    # One entry per connection slot; a request borrows a slot for its lifetime
+    # so no client ever has more in flight than it keeps alive.
+    slots = [c for c in clients for _ in range(-(-concurrency // len(clients)))]
+    pending, finished = set(), []
+
+    async def one(i: int, prompt: str):
+        client = slots.pop()
+        try:
+            results[i] = await achat(prompt, client=client, **kwargs)
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            results[i] = e
+        finally:
+            slots.append(client)
+            sem.release()
+
+    def done(task):
+        pending.discard(task)
+        finished.append(task)
+
+    try:
+        for i, prompt in enumerate(prompts):
+            await sem.acquire()
+            while finished:
+                finished.pop().result()  # surface a failure before starting more work
+            results.append(None)
+            task = asyncio.ensure_future(one(i, prompt))
+            pending.add(task)
+            task.add_done_callback(done)
+        if pending:
+            await asyncio.gather(*pending)
+        while finished:
+            finished.pop().result()
+    except BaseException:
+        for task in pending:
+            task.cancel()
+        raise
+    return results
+
+def chat_many(prompts: Iterable[str], concurrency: int = 64, *,
+              return_exceptions: bool = False, **kwargs) -> List[Any]:
+    """
+    Blocking wrapper: [(text, usage), ...] in input order, multiplexed over one
+    event loop instead of a thread per request. Call achat_many instead from
+    code that already runs an event loop.
+    """
+    return asyncio.run(achat_many(prompts, concurrency, return_exceptions=return_exceptions,
+                                  **kwargs))
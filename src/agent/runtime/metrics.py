@@ -0,0 +1,281 @@
+"""
+Router metrics and tracing.
+
+    from agent.runtime.metrics import METRICS
+    METRICS.snapshot()      # {"calculator": {"attempts", "hits", "misses", "exceptions", ...}}
+    METRICS.prometheus()    # the same in Prometheus text format
+
+Per tool the router counts attempts (real executions; result-cache and
+chain-memo answers are not attempts), hits (returned a result), misses
+(declined with ValueError, the "not for me" signal) and exceptions (anything
+else), plus a latency histogram. Counting costs two perf_counter() calls
+and a lock per attempt; AGENT_METRICS=0 turns it off.
+
+Phase timing: ``with phases() as ph:`` collects decode / match /
+tool_import / execute time for the routing done on this thread (and on
+threads running ``bind(fn)``), for the CLI's --json "routing" block;
+``timed(name)`` adds any other block (the CLI's "context" and "llm").
+
+Tracing: AGENT_TRACE=/path/trace.jsonl appends one JSON line per tool
+attempt and per routed message. When unset, TRACE is None and each call
+site pays a single ``is not None`` check. AGENT_METRICS_PORT=9464 serves
+GET /metrics in Prometheus text format from a background thread in the
+warm daemon (``serve_prometheus``).
+"""
+import atexit, bisect, json, os, threading, time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+ENABLED = os.getenv("AGENT_METRICS", "1") != "0"
+
+# Upper bounds in seconds; a final +Inf bucket is implicit.
+BUCKETS_S = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2,
+             0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+OUTCOMES = ("hit", "miss", "exception")
+_bucket = bisect.bisect_left
+
+
+# -----------------------------
+# Per-tool counters
+# -----------------------------
+class ToolStats:
+    __slots__ = ("outcomes", "counts", "sum_s", "lock")
+
+    def __init__(self):
+        self.outcomes = dict.fromkeys(OUTCOMES, 0)
+        self.counts = [0] * (len(BUCKETS_S) + 1)
+        self.sum_s = 0.0
+        self.lock = threading.Lock()
+
+    hits = property(lambda self: self.outcomes["hit"])
+    misses = property(lambda self: self.outcomes["miss"])
+    exceptions = property(lambda self: self.outcomes["exception"])
+
+    @property
+    def attempts(self) -> int:
+        return sum(self.outcomes.values())
+
+    def observe(self, outcome: str, seconds: float) -> None:
+        i = _bucket(BUCKETS_S, seconds)
+        with self.lock:
+            self.outcomes[outcome] += 1
+            self.counts[i] += 1
+            self.sum_s += seconds
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimated ``q`` quantile in seconds: the upper bound of the bucket holding it."""
+        total = sum(self.counts)
+        if not total:
+            return None
+        rank, seen = q * total, 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return BUCKETS_S[i] if i < len(BUCKETS_S) else float("inf")
+        return None
+
+
+class Metrics:
+    def __init__(self):
+        self._tools: Dict[str, ToolStats] = {}
+        self._lock = threading.Lock()
+
+    def tool(self, name: str) -> ToolStats:
+        stats = self._tools.get(name)
+        if stats is None:
+            with self._lock:
+                stats = self._tools.setdefault(name, ToolStats())
+        return stats
+
+    def record(self, tool: str, outcome: str, seconds: float) -> None:
+        if ENABLED:
+            (self._tools.get(tool) or self.tool(tool)).observe(outcome, seconds)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._tools.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        out = {}
+        for name, s in sorted(self._tools.items()):
+            with s.lock:
+                n = s.attempts
+                ms = lambda v: None if v is None else round(v * 1e3, 3)
+                out[name] = {
+                    "attempts": n, "hits": s.hits, "misses": s.misses,
+                    "exceptions": s.exceptions,
+                    "mean_ms": round(s.sum_s / n * 1e3, 3) if n else None,
+                    # histogram estimates: the bucket bound at or above the quantile
+                    "p50_ms_le": ms(s.quantile(0.50)),
+                    "p99_ms_le": ms(s.quantile(0.99)),
+                }
+        return out
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition of every tool's counters and latency histogram."""
+        lines = [
+            "# HELP agent_tool_attempts_total Tool executions by outcome.",
+            "# TYPE agent_tool_attempts_total counter",
+        ]
+        tools = sorted(self._tools.items())
+        for name, s in tools:
+            for outcome, n in list(s.outcomes.items()):
+                lines.append(f'agent_tool_attempts_total{{tool="{name}",outcome="{outcome}"}} {n}')
+        lines += [
+            "# HELP agent_tool_latency_seconds Tool execution latency.",
+            "# TYPE agent_tool_latency_seconds histogram",
+        ]
+        for name, s in tools:
+            with s.lock:
+                counts, total = list(s.counts), s.sum_s
+            cum = 0
+            for bound, n in zip(BUCKETS_S + (float("inf"),), counts):
+                cum += n
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f'agent_tool_latency_seconds_bucket{{tool="{name}",le="{le}"}} {cum}')
+            lines.append(f'agent_tool_latency_seconds_sum{{tool="{name}"}} {total:.9f}')
+            lines.append(f'agent_tool_latency_seconds_count{{tool="{name}"}} {cum}')
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+# -----------------------------
+# Routing phases for one request
+# -----------------------------
+class Phases:
+    """
+    Wall (and, where measured, process CPU) seconds per phase. Entered while
+    another Phases is active, it also reports every phase to that one.
+    """
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.cpu: Dict[str, float] = {}
+        self._outer: Optional[Phases] = None
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, seconds: float, cpu: Optional[float] = None) -> None:
+        with self._lock:
+            self.seconds[phase] = self.seconds.get(phase, 0.0) + seconds
+            if cpu is not None:
+                self.cpu[phase] = self.cpu.get(phase, 0.0) + cpu
+        if self._outer is not None:
+            self._outer.add(phase, seconds, cpu)
+
+    def ms(self) -> Dict[str, float]:
+        return {f"{k}_ms": round(v * 1e3, 3) for k, v in self.seconds.items()}
+
+    def __enter__(self) -> "Phases":
+        self._outer = _LOCAL.phases
+        _LOCAL.phases = self
+        return self
+
+    def __exit__(self, *exc) -> None:
+        _LOCAL.phases = self._outer
+
+
+class _Local(threading.local):
+    phases: Optional[Phases] = None  # class default: no AttributeError on the hot path
+
+_LOCAL = _Local()
+
+def phases() -> Phases:
+    return Phases()
+
+def current() -> Optional[Phases]:
+    return _LOCAL.phases
+
+def bind(fn: Callable) -> Callable:
+    """``fn`` wrapped to report into the calling thread's Phases from a pool thread."""
+    ph = current()
+    if ph is None:
+        return fn
+    def bound(*a, **k):
+        prev, _LOCAL.phases = _LOCAL.phases, ph
+        try:
+            return fn(*a, **k)
+        finally:
+            _LOCAL.phases = prev
+    return bound
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """Add the block's wall and CPU time to the current Phases, if any."""
+    ph = current()
+    if ph is None:
+        yield
+        return
+    t0, c0 = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        ph.add(phase, time.perf_counter() - t0, time.process_time() - c0)
+
+
+# -----------------------------
+# Trace sink
+# -----------------------------
+class TraceSink:
+    """Buffered JSONL appender; flushed every ``flush_every`` events and at exit."""
+
+    def __init__(self, path: str, flush_every: int = 256):
+        self.path = path
+        self.flush_every = flush_every
+        self._buf: List[str] = []
+        self._lock = threading.Lock()
+        atexit.register(self.flush)
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        line = json.dumps(event, ensure_ascii=False)
+        with self._lock:
+            self._buf.append(line)
+            if len(self._buf) < self.flush_every:
+                return
+            lines, self._buf = self._buf, []
+        self._write(lines)
+
+    def flush(self) -> None:
+        with self._lock:
+            lines, self._buf = self._buf, []
+        if lines:
+            self._write(lines)
+
+    def _write(self, lines: List[str]) -> None:
+        try:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError:
+            pass
+
+
+TRACE: Optional[TraceSink] = TraceSink(os.environ["AGENT_TRACE"]) if os.getenv("AGENT_TRACE") else None
+
+
+# -----------------------------
+# Prometheus endpoint
+# -----------------------------
+def serve_prometheus(port: int, host: str = "127.0.0.1"):
+    """Serve GET /metrics on a daemon thread; returns the server (``.shutdown()`` to stop)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = METRICS.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *a):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
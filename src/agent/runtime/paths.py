@@ -0,0 +1,25 @@
+"""
+Where on-disk caches live and what relative paths are relative to, kept free
+of other imports so the LLM-only path can find its cache without loading the
+router.
+
+    cache_dir()   $AGENT_CACHE_DIR, else $XDG_CACHE_HOME/agent-bench, else ~/.cache/agent-bench
+    resolve(p)    ``p`` against the requesting client's cwd (CWD, set by the
+                  daemon per request), else the process cwd
+"""
+import os
+from contextvars import ContextVar
+from typing import Optional
+
+CWD: ContextVar[Optional[str]] = ContextVar("agent_cwd", default=None)
+
+
+def cache_dir() -> str:
+    return os.environ.get("AGENT_CACHE_DIR") or os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+        "agent-bench",
+    )
+
+
+def resolve(path: str) -> str:
+    return os.path.abspath(os.path.join(CWD.get() or os.getcwd(), path))
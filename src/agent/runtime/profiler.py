@@ -0,0 +1,129 @@
+"""
+Per-request profile for the CLI's --profile: wall and CPU time per phase,
+optionally with cProfile output and tracemalloc peaks.
+
+    with Profile(memory=True, out="run") as prof:
+        with prof.phase("imports"):
+            from agent.runtime import router
+        ...
+    print(format_report(prof.report()), file=sys.stderr)   # run.pstats, run.tracemalloc
+
+Phases the caller names (imports, discover) and phases reported through
+``metrics`` while the profile is active (decode, match, tool_import,
+execute from the router; context, llm from the CLI) land in one table;
+"other" is the rest of the total. Concurrent --multi calls sum their
+execute time, so phases can add up to more than the wall total.
+"""
+import cProfile, time, tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from agent.runtime import metrics
+
+TOP_ALLOCATIONS = 5
+# Import machinery and the profilers themselves would otherwise top every listing.
+_IGNORE = (tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+           tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+           tracemalloc.Filter(False, tracemalloc.__file__),
+           tracemalloc.Filter(False, cProfile.__file__))
+
+
+class Profile:
+    def __init__(self, memory: bool = False, out: Optional[str] = None):
+        self.memory = memory
+        self.out = out  # path prefix for .pstats / .tracemalloc files
+        self.phases = metrics.Phases()
+        self.peaks: Dict[str, int] = {}
+        self._stack: List[int] = []  # running peak of each open phase
+        self._peak = 0
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._owns_tracemalloc = False
+        self.wall = self.cpu = 0.0
+
+    def __enter__(self) -> "Profile":
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        if self.out:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        self.phases.__enter__()
+        self._t0, self._c0 = time.perf_counter(), time.process_time()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.wall = time.perf_counter() - self._t0
+        self.cpu = time.process_time() - self._c0
+        self.phases.__exit__(*exc)
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(f"{self.out}.pstats")
+        if self.memory:
+            self._peak = max(self._peak, tracemalloc.get_traced_memory()[1])
+            self._snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORE)
+            if self.out:
+                self._snapshot.dump(f"{self.out}.tracemalloc")
+            if self._owns_tracemalloc:
+                tracemalloc.stop()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the block as ``name``; with memory on, also record its allocation peak."""
+        if self.memory:
+            if self._stack:  # reset_peak() below would lose the enclosing phase's peak so far
+                self._stack[-1] = max(self._stack[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._stack.append(0)
+        t0, c0 = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.phases.add(name, time.perf_counter() - t0, time.process_time() - c0)
+            if self.memory:
+                peak = max(self._stack.pop(), tracemalloc.get_traced_memory()[1])
+                self.peaks[name] = max(self.peaks.get(name, 0), peak)
+                self._peak = max(self._peak, peak)
+                if self._stack:
+                    self._stack[-1] = max(self._stack[-1], peak)
+
+    def report(self) -> Dict[str, Any]:
+        """{phases: {name: {wall_ms, cpu_ms}}, total, [memory], [files]}; call after exit."""
+        ms = lambda s: round(s * 1e3, 3)
+        phases = {name: {"wall_ms": ms(s), "cpu_ms": ms(self.phases.cpu.get(name, 0.0))}
+                  for name, s in self.phases.seconds.items()}
+        phases["other"] = {
+            "wall_ms": ms(max(0.0, self.wall - sum(self.phases.seconds.values()))),
+            "cpu_ms": ms(max(0.0, self.cpu - sum(self.phases.cpu.values()))),
+        }
+        out: Dict[str, Any] = {"phases": phases,
+                               "total": {"wall_ms": ms(self.wall), "cpu_ms": ms(self.cpu)}}
+        if self._snapshot is not None:
+            top = self._snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+            out["memory"] = {
+                "peak_kb": round(self._peak / 1024, 1),
+                "phases_peak_kb": {k: round(v / 1024, 1) for k, v in self.peaks.items()},
+                # live at exit, not at the peak: what the request left allocated
+                "top_live": [{"where": f"{s.traceback[0].filename}:{s.traceback[0].lineno}",
+                              "kb": round(s.size / 1024, 1), "count": s.count} for s in top],
+            }
+        if self.out:
+            out["files"] = [f"{self.out}.pstats"] + ([f"{self.out}.tracemalloc"] if self.memory else [])
+        return out
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """The report as a few aligned lines for stderr."""
+    total = report["total"]
+    lines = [f"profile: {total['wall_ms']:.1f} ms wall, {total['cpu_ms']:.1f} ms cpu"]
+    for name, p in report["phases"].items():
+        lines.append(f"  {name:<12}{p['wall_ms']:>10.2f} ms{p['cpu_ms']:>10.2f} ms cpu")
+    mem = report.get("memory")
+    if mem:
+        per = ", ".join(f"{k} {v:.0f}" for k, v in mem["phases_peak_kb"].items())
+        lines.append(f"  memory peak {mem['peak_kb']:.0f} KB" + (f" ({per})" if per else ""))
+        for s in mem["top_live"]:
+            lines.append(f"    {s['kb']:>9.1f} KB  {s['where']}")
+    for path in report.get("files", ()):
+        lines.append(f"  wrote {path}")
+    return "\n".join(lines)
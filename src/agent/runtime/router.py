@@ -1,5 +1,15 @@
-import os, sys, importlib.util, glob, inspect, types
-from typing import Callable, Dict, Optional, Tuple
+import os, re, sys, json, hashlib, importlib.util, glob, inspect, threading, time, types
+import contextvars
+from typing import Callable, Dict, FrozenSet, Iterator, List, Optional, Tuple
+
+try:  # regex parser, used only to pull required literals out of trigger patterns
+    from re import _parser as _sre_parse  # py3.11+
+except ImportError:  # pragma: no cover - py3.10
+    import sre_parse as _sre_parse  # type: ignore[no-redef]
+
+from agent.runtime import metrics, tool_cache
+from agent.runtime.envelope import parse_envelope
+from agent.runtime.paths import cache_dir
 
 DEBUG = os.getenv("AGENT_DEBUG") == "1"
 def _dbg(*a):
@@ -7,22 +17,90 @@ def _dbg(*a):
 
 TOOLS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "tools")
 
+Trigger = Tuple[str, int]  # (regex source, re flags)
+
+def _as_trigger(pat) -> Trigger:
+    if isinstance(pat, re.Pattern):
+        return pat.pattern, int(pat.flags)
+    return str(pat), 0
+
+def _module_aliases(module: types.ModuleType) -> List[str]:
+    aliases = set()
+    for attr in ("TOOL_NAME", "TOOL_ALIAS", "TOOL_ALIASES"):
+        if hasattr(module, attr):
+            val = getattr(module, attr)
+            if isinstance(val, str):
+                aliases.add(val)
+            elif isinstance(val, (list, tuple, set)):
+                aliases |= set(map(str, val))
+    return sorted(aliases)
+
+def _module_triggers(module: types.ModuleType,
+                     attrs: Tuple[str, ...] = ("TRIGGERS", "ROUTE_TRIGGERS")) -> List[Trigger]:
+    # Patterns the router indexes: TRIGGERS (also used by the tool itself)
+    # plus ROUTE_TRIGGERS (selection-only, e.g. calculator's plain-math detector).
+    triggers: List[Trigger] = []
+    for attr in attrs:
+        val = getattr(module, attr, None)
+        if isinstance(val, (list, tuple)):
+            triggers.extend(_as_trigger(p) for p in val)
+    return triggers
+
+def _module_cache_policy(module: types.ModuleType) -> tool_cache.Policy:
+    return tool_cache.policy_of(getattr(module, "TOOL_CACHE", None))
+
 class Tool:
-    def __init__(self, name: str, module: types.ModuleType, execute: Callable):
+    """
+    A routable tool. Built either from an imported module, or from a manifest
+    entry (``path`` + declared aliases/triggers/cache policy), in which case the
+    module is imported the first time the router actually calls ``execute``.
+    ``triggers`` match whole tool calls (spliceable spans); ``route_triggers``
+    only help select the tool for a message.
+    """
+
+    def __init__(self, name: str, module: Optional[types.ModuleType] = None,
+                 execute: Optional[Callable] = None, *, path: Optional[str] = None,
+                 aliases=(), triggers=(), route_triggers=(), cache: tool_cache.Policy = None):
         self.name = name
-        self.module = module
-        self.execute = execute
-        self.aliases = set()
-        # Optional aliases from module
-        for attr in ("TOOL_NAME", "TOOL_ALIAS", "TOOL_ALIASES"):
-            if hasattr(module, attr):
-                val = getattr(module, attr)
-                if isinstance(val, str):
-                    self.aliases.add(val)
-                elif isinstance(val, (list, tuple, set)):
-                    self.aliases |= set(map(str, val))
+        self.path = path
+        self._module = module
+        self._execute = execute
+        self._lock = threading.Lock()
+        self.aliases = set(aliases)
+        self.span_triggers: List[Trigger] = [tuple(t) for t in triggers]
+        self.triggers: List[Trigger] = self.span_triggers + [tuple(t) for t in route_triggers]
+        self.cache = tool_cache.policy_of(cache)
+        if module is not None:
+            self.aliases |= set(_module_aliases(module))
+            self.span_triggers = _module_triggers(module, ("TRIGGERS",))
+            self.triggers = _module_triggers(module)
+            self.cache = _module_cache_policy(module)
         self.aliases.add(name)
 
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    @property
+    def module(self) -> types.ModuleType:
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    mod = _import_module_from_path(self.path) if self.path else None
+                    if mod is None:
+                        raise ImportError(f"tool {self.name!r} failed to import from {self.path}")
+                    _dbg("Lazily imported tool:", self.name)
+                    self._module = mod
+        return self._module
+
+    def execute(self, text):
+        if self._execute is None:
+            fn = getattr(self.module, "execute", None)
+            if not callable(fn):
+                raise ValueError(f"tool {self.name!r} has no execute()")
+            self._execute = fn
+        return self._execute(text)
+
 def _import_module_from_path(path: str) -> Optional[types.ModuleType]:
     spec = importlib.util.spec_from_file_location(
         f"agent.tools.{os.path.splitext(os.path.basename(path))[0]}", path
@@ -37,75 +115,557 @@ def _import_module_from_path(path: str) -> Optional[types.ModuleType]:
         _dbg("Failed importing", path, "->", e)
         return None
 
-def discover_tools() -> Dict[str, Tool]:
-    tools: Dict[str, Tool] = {}
-    for path in glob.glob(os.path.join(TOOLS_DIR, "*.py")):
-        base = os.path.basename(path)
+# -----------------------------
+# Tool manifest
+# -----------------------------
+# Per-file record of what the router needs to route without importing:
+# name, aliases, triggers, cache policy, plus mtime/size/sha256 to notice edits. Entries are
+# rebuilt (by importing that one module) only when its file changes.
+MANIFEST_VERSION = 3
+
+def manifest_path(tools_dir: Optional[str] = None) -> str:
+    tools_dir = os.path.abspath(tools_dir or TOOLS_DIR)
+    tag = hashlib.sha1(tools_dir.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(cache_dir(), f"tools-{tag}.json")
+
+def _sha256(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _manifest_entry(path: str, st: os.stat_result, digest: str,
+                    loaded: Dict[str, types.ModuleType]) -> Dict:
+    base = os.path.basename(path)
+    entry = {"file": base, "mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": digest,
+             "name": None, "aliases": [], "triggers": [], "route_triggers": [], "cache": None}
+    mod = _import_module_from_path(path)
+    if not mod:
+        return entry
+    if not callable(getattr(mod, "execute", None)):
+        _dbg("Skip", base, "no execute()")
+        return entry
+    entry["name"] = getattr(mod, "TOOL_NAME", os.path.splitext(base)[0])  # prefer module TOOL_NAME
+    entry["aliases"] = _module_aliases(mod)
+    entry["triggers"] = [list(t) for t in _module_triggers(mod, ("TRIGGERS",))]
+    entry["route_triggers"] = [list(t) for t in _module_triggers(mod, ("ROUTE_TRIGGERS",))]
+    entry["cache"] = _module_cache_policy(mod)
+    loaded[base] = mod
+    return entry
+
+def _read_manifest(path: str, tools_dir: str) -> Dict[str, Dict]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != MANIFEST_VERSION or data.get("tools_dir") != tools_dir:
+        return {}
+    return {e["file"]: e for e in data.get("entries", [])}
+
+def _write_manifest(path: str, tools_dir: str, entries: List[Dict]) -> None:
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "tools_dir": tools_dir, "entries": entries}, f)
+        os.replace(tmp, path)
+    except OSError as e:  # read-only cache dir: still route, just rebuild next time
+        _dbg("Cannot write manifest", path, "->", e)
+
+def load_manifest(tools_dir: Optional[str] = None) -> Tuple[List[Dict], Dict[str, types.ModuleType]]:
+    """
+    Current manifest entries (sorted by file) and any modules imported while
+    refreshing stale entries. Unchanged files cost one stat() and no import.
+    """
+    tools_dir = os.path.abspath(tools_dir or TOOLS_DIR)
+    path = manifest_path(tools_dir)
+    old = _read_manifest(path, tools_dir)
+    entries: List[Dict] = []
+    loaded: Dict[str, types.ModuleType] = {}
+    dirty = False
+    for file_path in sorted(glob.glob(os.path.join(tools_dir, "*.py"))):
+        base = os.path.basename(file_path)
         if base.startswith("_") or base == "__init__.py":
             continue
-        mod = _import_module_from_path(path)
-        if not mod:
+        st = os.stat(file_path)
+        prev = old.pop(base, None)
+        if prev and prev["mtime_ns"] == st.st_mtime_ns and prev["size"] == st.st_size:
+            entries.append(prev)
             continue
-        exec_fn = getattr(mod, "execute", None)
-        if not callable(exec_fn):
-            _dbg("Skip", base, "no execute()")
+        digest = _sha256(file_path)
+        if prev and prev["sha256"] == digest:  # touched, not edited
+            entries.append({**prev, "mtime_ns": st.st_mtime_ns})
+        else:
+            _dbg("Manifest refresh:", base)
+            entries.append(_manifest_entry(file_path, st, digest, loaded))
+        dirty = True
+    if dirty or old:  # old leftovers are deleted files
+        _write_manifest(path, tools_dir, entries)
+    return entries, loaded
+
+def discover_tools(tools_dir: Optional[str] = None) -> Dict[str, Tool]:
+    tools_dir = os.path.abspath(tools_dir or TOOLS_DIR)
+    tools: Dict[str, Tool] = {}
+    entries, loaded = load_manifest(tools_dir)
+    for e in entries:
+        if not e["name"]:
             continue
-        name = getattr(mod, "TOOL_NAME", os.path.splitext(base)[0])  # prefer module TOOL_NAME
-        tool = Tool(name=name, module=mod, execute=exec_fn)
+        tool = Tool(name=e["name"], module=loaded.get(e["file"]),
+                    path=os.path.join(tools_dir, e["file"]),
+                    aliases=e["aliases"], triggers=e["triggers"],
+                    route_triggers=e["route_triggers"], cache=e["cache"])
         # Register primary and aliases (lowercased)
         for key in tool.aliases:
             tools[str(key).lower()] = tool
-        _dbg("Loaded tool:", name, "aliases:", sorted(tool.aliases))
+        _dbg("Registered tool:", tool.name, "aliases:", sorted(tool.aliases),
+             "(loaded)" if tool.loaded else "(lazy)")
     return tools
 
+# -----------------------------
+# Trigger index
+# -----------------------------
+_INLINE_GROUP = re.compile(r"\(\?P<\w+>")
+_LEADING_FLAGS = re.compile(r"^\(\?([aiLmsux]+)\)")
+_SCOPED_FLAGS = ((re.S, "s"), (re.M, "m"), (re.X, "x"))
+
+def _pattern_source(trigger: Trigger) -> str:
+    """Source of one trigger, rewritten so it can sit inside a larger alternation."""
+    src, flags = trigger
+    scoped = "".join(ch for flag, ch in _SCOPED_FLAGS if flags & flag)
+    if "(?P=" in src:
+        raise ValueError("named backreferences cannot be indexed")
+    m = _LEADING_FLAGS.match(src)
+    if m:  # global flags are only legal at the very start, so scope them instead
+        scoped += m.group(1).replace("i", "")
+        src = src[m.end():]
+    # Tools reuse group names (op, text, ...); the index only needs to know which tool hit.
+    src = _INLINE_GROUP.sub("(?:", src)
+    return f"(?{scoped}:{src})" if scoped else f"(?:{src})"
+
+def _required_literals(seq) -> Optional[FrozenSet[str]]:
+    """
+    Casefolded strings of which any match of the parsed pattern ``seq`` must
+    contain at least one; None when no such literal can be proven.
+    """
+    best: Optional[FrozenSet[str]] = None
+
+    def consider(cands: Optional[FrozenSet[str]]) -> None:
+        nonlocal best
+        if not cands:
+            return
+        if best is None or (min(map(len, cands)), -len(cands)) > (min(map(len, best)), -len(best)):
+            best = cands
+
+    run: List[str] = []
+    for op, av in seq:
+        kind = op.name
+        if kind == "LITERAL":
+            run.append(chr(av))
+            continue
+        if run:
+            consider(frozenset(["".join(run).casefold()]))
+            run = []
+        if kind == "SUBPATTERN":
+            consider(_required_literals(av[-1]))
+        elif kind in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT") and av[0] >= 1:
+            consider(_required_literals(av[2]))
+        elif kind == "BRANCH":
+            alts = [_required_literals(b) for b in av[1]]
+            if all(alts):
+                consider(frozenset().union(*alts))
+        elif kind == "IN" and all(o.name == "LITERAL" for o, _ in av):
+            consider(frozenset(chr(a).casefold() for _, a in av))
+    if run:
+        consider(frozenset(["".join(run).casefold()]))
+    return best
+
+_ANCHORS = {"AT_BEGINNING", "AT_BEGINNING_STRING", "AT_END", "AT_END_STRING"}
+
+def _span_safe(seq) -> bool:
+    """
+    Whether a parsed trigger can delimit a call inside a longer message: no
+    ^/$ anchors and no greedy ``.+``/``.*``, which would swallow the text
+    (and any other calls) after it.
+    """
+    for op, av in seq:
+        kind = op.name
+        if kind == "AT" and av.name in _ANCHORS:
+            return False
+        if kind in ("MAX_REPEAT", "POSSESSIVE_REPEAT") and av[1] == _sre_parse.MAXREPEAT \
+                and any(o.name == "ANY" for o, _ in av[2]):
+            return False
+        if kind == "SUBPATTERN" and not _span_safe(av[-1]):
+            return False
+        if kind in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT") and not _span_safe(av[2]):
+            return False
+        if kind == "BRANCH" and not all(_span_safe(b) for b in av[1]):
+            return False
+    return True
+
+_BRACKETS = re.compile(r"\[\[|\]\]")
+
+class TriggerIndex:
+    """
+    All tool triggers compiled once: a literal prefilter that rejects messages
+    containing none of the strings some trigger requires, and one alternation
+    whose leftmost match names the tool to run (ties go to discovery order).
+    Tools that declare no triggers stay "unindexed" and are tried last, as before.
+    A second alternation over TRIGGERS alone (no ROUTE_TRIGGERS) finds every
+    tool-call span in a message for run_spans_with_tools; triggers that are
+    anchored or end in a greedy ``.+`` only ever route whole messages.
+    """
+
+    def __init__(self, tools: Dict[str, Tool]):
+        self.indexed: List[Tuple[Tool, re.Pattern]] = []
+        self.unindexed: List[Tool] = []
+        owners: Dict[str, Tool] = {}
+        branches: List[str] = []
+        span_branches: List[str] = []
+        literals: Optional[set] = set()
+        for tool in _unique(tools):
+            if not tool.triggers:
+                self.unindexed.append(tool)
+                continue
+            try:
+                sources = [_pattern_source(p) for p in tool.triggers]
+                per_tool = re.compile("|".join(sources), re.I)
+            except (re.error, ValueError) as e:
+                _dbg("Cannot index", tool.name, "->", e)
+                self.unindexed.append(tool)
+                continue
+            self.indexed.append((tool, per_tool))
+            for trigger in tool.span_triggers:
+                src = _pattern_source(trigger)
+                if _span_safe(_sre_parse.parse(src, re.I)):
+                    span_branches.append(src)
+            for src in sources:
+                group = f"_t{len(branches)}"
+                owners[group] = tool
+                branches.append(f"(?P<{group}>{src})")
+                if literals is not None:
+                    try:
+                        req = _required_literals(_sre_parse.parse(src, re.I))
+                    except Exception:
+                        req = None
+                    if req is None:
+                        literals = None  # one unbounded trigger disables the prefilter
+                    else:
+                        literals |= req
+        self.owners = owners
+        self.automaton = re.compile("|".join(branches), re.I) if branches else None
+        self.span_automaton = re.compile("|".join(span_branches), re.I) if span_branches else None
+        # Longest first so common hits short-circuit sooner on the any() below.
+        self.literals = tuple(sorted(literals, key=len, reverse=True)) if literals is not None else None
+        _dbg("Indexed", len(self.indexed), "tools;", len(branches), "triggers;",
+             "prefilter:", self.literals)
+
+    def may_match(self, message: str) -> bool:
+        if self.literals is None:
+            return True
+        folded = message.casefold()
+        return any(lit in folded for lit in self.literals)
+
+    def spans(self, message: str) -> List[Tuple[int, int]]:
+        """
+        (start, end) of each tool call in ``message``, left to right. Calls
+        never overlap or nest: a match inside another ``[[...]]`` belongs to
+        that call, and one followed by a stray ``]`` is ambiguous, so both are
+        left as written.
+        """
+        if self.span_automaton is None or not self.may_match(message):
+            return []
+        brackets = [(m.start(), 1 if m.group() == "[[" else -1) for m in _BRACKETS.finditer(message)]
+        out: List[Tuple[int, int]] = []
+        depth = i = pos = 0
+        while True:
+            m = self.span_automaton.search(message, pos)
+            if m is None:
+                return out
+            start, end = m.span()
+            while i < len(brackets) and brackets[i][0] < start:
+                depth = max(0, depth + brackets[i][1])
+                i += 1
+            if end > start and depth == 0 and not message.startswith("]", end):
+                out.append((start, end))
+                pos = end
+            else:
+                pos = start + 1
+
+    def candidates(self, message: str) -> Iterator[Tool]:
+        """
+        Yield tools worth trying, best first. Normally only the first is
+        consumed; the rest are computed lazily in case it declines the input.
+        """
+        if self.automaton is not None and self.may_match(message):
+            m = self.automaton.search(message)
+            if m:
+                first = self.owners[m.lastgroup]
+                yield first
+                # Slow path: the leading tool declined, rank the others by first hit.
+                hits = []
+                for order, (tool, pat) in enumerate(self.indexed):
+                    if tool is first:
+                        continue
+                    hit = pat.search(message)
+                    if hit:
+                        hits.append((hit.start(), order, tool))
+                for _, _, tool in sorted(hits, key=lambda h: h[:2]):
+                    yield tool
+        yield from self.unindexed
+
+def _unique(tools: Dict[str, Tool]) -> List[Tool]:
+    # De-duplicate by module (some names may point to same Tool via aliases)
+    seen, out = set(), []
+    for tool in tools.values():
+        if id(tool) not in seen:
+            seen.add(id(tool))
+            out.append(tool)
+    return out
+
 # Cache so we don’t re-import on every call
 _TOOLS_CACHE: Optional[Dict[str, Tool]] = None
+_INDEX_CACHE: Optional[TriggerIndex] = None
 def get_tools() -> Dict[str, Tool]:
     global _TOOLS_CACHE
     if _TOOLS_CACHE is None:
         _TOOLS_CACHE = discover_tools()
     return _TOOLS_CACHE
 
-def run_once_with_tools(message: str) -> Tuple[str, Optional[str]]:
+def get_index() -> TriggerIndex:
+    global _INDEX_CACHE
+    if _INDEX_CACHE is None:
+        _INDEX_CACHE = TriggerIndex(get_tools())
+    return _INDEX_CACHE
+
+def _call(tool: Tool, subject, message: str):
+    """tool.execute(subject) as a str, or the Exception it raised; via the result cache if cacheable."""
+    cache = tool_cache.get_cache() if tool.cache else None
+    if cache is not None:
+        out = cache.get(tool.name, message)
+        if isinstance(out, tool_cache.Declined):
+            return ValueError(out.reason)  # a fresh instance: never share one across threads
+        if out is not tool_cache.MISS:
+            return out
+    ph = metrics.current()
+    if not tool.loaded and tool.path:  # first use: keep the lazy import out of tool latency
+        t0, c0 = time.perf_counter(), time.process_time()
+        try:
+            tool.module
+        except ImportError:
+            pass  # execute() raises it again below and it's counted as an exception
+        if ph is not None:
+            ph.add("tool_import", time.perf_counter() - t0, time.process_time() - c0)
+    c0 = time.process_time() if ph is not None else 0.0
+    t0 = time.perf_counter()
+    try:
+        out, outcome = str(tool.execute(subject)), "hit"
+    except Exception as e:
+        # ValueError is how tools say "not for me"; anything else is a failure
+        outcome = "miss" if isinstance(e, ValueError) else "exception"
+        out = e.with_traceback(None)  # kept for re-raising; don't pin the failed frames
+    dt = time.perf_counter() - t0
+    metrics.METRICS.record(tool.name, outcome, dt)
+    if ph is not None:
+        ph.add("execute", dt, time.process_time() - c0)
+    if metrics.TRACE is not None:
+        metrics.TRACE.emit({"ts": time.time(), "event": "tool", "tool": tool.name,
+                            "outcome": outcome, "ms": round(dt * 1e3, 3)})
+    # Only results and "not for me" declines are deterministic; a failure may be transient.
+    if cache is not None and outcome != "exception":
+        cache.put(tool.name, message, out if outcome == "hit" else tool_cache.Declined(str(out)),
+                  tool.cache)
+    return out
+
+def _execute(tool: Tool, subject, message: str, memo: Optional[Dict]) -> str:
+    """tool.execute(subject), answered from ``memo`` when (tool, message) was seen this chain."""
+    key = (tool.name, message)
+    if memo is not None and key in memo:
+        memo["_hits"] = memo.get("_hits", 0) + 1
+        out = memo[key]
+    else:
+        out = _call(tool, subject, message)
+        if memo is not None:  # declines are remembered too, so they are not retried
+            memo[key] = out
+    if isinstance(out, Exception):
+        raise out.with_traceback(None)
+    return out
+
+def metrics_snapshot() -> Dict[str, Dict]:
+    """Per-tool attempts, hits, misses, exceptions and latency (see agent.runtime.metrics)."""
+    return metrics.METRICS.snapshot()
+
+def cache_stats() -> Dict[str, Dict]:
+    """Per-tool hit/miss counts of the cross-request result cache (see agent.runtime.tool_cache)."""
+    cache = tool_cache.get_cache()
+    return cache.stats() if cache is not None else {}
+
+def _timed(candidates: Iterator[Tool], ph: "metrics.Phases") -> Iterator[Tool]:
+    """``candidates`` with the time spent producing each one added to the "match" phase."""
+    while True:
+        t0, c0 = time.perf_counter(), time.process_time()
+        tool = next(candidates, None)
+        ph.add("match", time.perf_counter() - t0, time.process_time() - c0)
+        if tool is None:
+            return
+        yield tool
+
+def run_once_with_tools(message: str, memo: Optional[Dict] = None) -> Tuple[str, Optional[str]]:
     """
-    Try each tool exactly once. Each tool should raise on no-match.
+    Decode the message once; a payload naming a known tool goes straight to it,
+    anything else runs the tool whose trigger matches earliest in the text.
     Returns (output, tool_name_or_None). If no tool matched, echo the input.
+    A tool that raises is treated as a no-match and the next candidate is tried.
+    ``memo`` (see run_with_tools) caches results per (tool, message).
     """
-    tools = get_tools()
-    # De-duplicate by module (some names may point to same Tool via aliases)
-    seen = set()
-    for key, tool in tools.items():
-        if id(tool) in seen:
+    if metrics.TRACE is None:
+        return _route_once(message, memo)
+    t0 = time.perf_counter()
+    out, name = _route_once(message, memo)
+    metrics.TRACE.emit({"ts": time.time(), "event": "route", "tool": name, "chars": len(message),
+                        "ms": round((time.perf_counter() - t0) * 1e3, 3)})
+    return out, name
+
+def _route_once(message: str, memo: Optional[Dict]) -> Tuple[str, Optional[str]]:
+    ph = metrics.current()
+    if ph is not None:
+        t0, c0 = time.perf_counter(), time.process_time()
+    env = parse_envelope(message)
+    if ph is not None:
+        ph.add("decode", time.perf_counter() - t0, time.process_time() - c0)
+    # Tools receive the decoded payload (dict) when there is one, never re-parsing it.
+    subject = env.payload if env.payload is not None else message
+    named = get_tools().get(env.tool.lower()) if env.tool else None
+    if named is not None:
+        try:
+            return _execute(named, subject, message, memo), named.name
+        except Exception as e:
+            _dbg("Tool", named.name, "declined payload:", e)
+    candidates = get_index().candidates(env.raw)
+    if ph is not None:
+        candidates = _timed(candidates, ph)
+    for tool in candidates:
+        if tool is named:
             continue
-        seen.add(id(tool))
         try:
-            out = tool.execute(message)
-            # If no exception, this tool matched.
-            return str(out), tool.name
-        except Exception:
+            return _execute(tool, subject, message, memo), tool.name
+        except Exception as e:
+            _dbg("Tool", tool.name, "declined:", e)
             continue
     # No tool matched → plain echo (or pass to LLM in a real app)
     return message, None
 
-def run_with_tools(message: str, max_chain: int = 1) -> Tuple[str, Optional[str], int]:
+# Chains are checked for cycles up to this long; longer ones still run, but
+# every repeated pass is answered from the (tool, input) memo.
+CYCLE_WINDOW = 8
+
+def run_with_tools(message: str, max_chain: int = 1,
+                   stats: Optional[Dict] = None) -> Tuple[str, Optional[str], int]:
     """
     Run tools, then (optionally) chain if the output still looks like it might contain triggers.
     max_chain=1: one pass (no chaining).
     max_chain>1: up to that many total passes. Stops if a pass returns None tool.
-    """
-    out, name = run_once_with_tools(message)
-    used = 0
-    last_used = name
-    if name: used = 1
 
-    passes = 1
-    while passes < max_chain:
-        nxt, nxt_name = run_once_with_tools(out)
+    A pass whose input repeats one of the last CYCLE_WINDOW inputs starts a
+    cycle (length 1: a fixed point), and tools are deterministic within a
+    chain, so the remaining passes are resolved without running them; the
+    result and pass count are the same as running all of them. ``stats``, if
+    given, is filled with {executed, skipped, memo_hits, stop}, where stop is
+    "no_tool", "max_chain", "fixed_point" or "cycle".
+    """
+    memo: Optional[Dict] = {} if max_chain > 1 else None
+    inputs: List[str] = []
+    outputs: List[Tuple[str, str]] = []
+    out, last_used, used, skipped, stop = message, None, 0, 0, "max_chain"
+    while used < max_chain:
+        seen = next((j for j in range(len(inputs) - 1, max(-1, len(inputs) - 1 - CYCLE_WINDOW), -1)
+                     if inputs[j] == out), None)
+        if seen is not None:
+            period = len(inputs) - seen
+            skipped = max_chain - used
+            out, last_used = outputs[seen + (skipped - 1) % period]
+            used = max_chain
+            stop = "fixed_point" if period == 1 else "cycle"
+            _dbg("Chain", stop, "of", period, "after", len(inputs), "passes; skipped", skipped)
+            break
+        nxt, nxt_name = run_once_with_tools(out, memo)
         if not nxt_name:
+            stop = "no_tool"
             break
-        out = nxt
-        last_used = nxt_name
+        inputs.append(out)
+        outputs.append((nxt, nxt_name))
+        out, last_used = nxt, nxt_name
         used += 1
-        passes += 1
 
+    if stats is not None:
+        stats.update(executed=len(inputs) + (stop == "no_tool"), skipped=skipped,
+                     memo_hits=(memo or {}).get("_hits", 0), stop=stop)
     return out, last_used, used
+
+# -----------------------------
+# Several tool calls in one message
+# -----------------------------
+TOOL_WORKERS = int(os.getenv("AGENT_TOOL_WORKERS", "8"))
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+def _executor():
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR is None:
+                from concurrent.futures import ThreadPoolExecutor
+                _EXECUTOR = ThreadPoolExecutor(max_workers=max(1, TOOL_WORKERS),
+                                               thread_name_prefix="tool")
+    return _EXECUTOR
+
+def splice_once_with_tools(message: str, whole: bool = True) -> Tuple[str, List[str]]:
+    """
+    Run every tool call found in ``message`` (see TriggerIndex.spans), several
+    at once on a thread pool, and put each output where its call was. Calls
+    no tool accepts are left as written. With ``whole``, a tool payload or a
+    message with no call spans (plain math, {"help": true}) is routed whole
+    as in run_once_with_tools. Returns (text, names of the tools that ran).
+    """
+    spans = [] if parse_envelope(message).payload is not None else get_index().spans(message)
+    if not spans and not whole:
+        return message, []
+    if not spans:
+        out, name = run_once_with_tools(message)
+        return out, [name] if name else []
+    calls = [message[start:end] for start, end in spans]
+    # Latency is the slowest call, not the sum; one call needs no hand-off.
+    # Each call runs in a copy of this context (paths.CWD in the daemon, ...).
+    if len(calls) > 1:
+        run = metrics.bind(run_once_with_tools)
+        results = [f.result() for f in [_executor().submit(contextvars.copy_context().run, run, c)
+                                        for c in calls]]
+    else:
+        results = [run_once_with_tools(calls[0])]
+    parts, names, pos = [], [], 0
+    for (start, end), (out, name) in zip(spans, results):
+        parts.append(message[pos:start])
+        parts.append(out if name else message[start:end])
+        if name:
+            names.append(name)
+        pos = end
+    parts.append(message[pos:])
+    return "".join(parts), names
+
+def run_spans_with_tools(message: str, max_chain: int = 1) -> Tuple[str, List[str], int]:
+    """
+    splice_once_with_tools, repeated up to ``max_chain`` passes while a pass
+    still runs a tool and changes the text. Only the first pass routes a
+    span-less message whole; later passes splice, so the text around earlier
+    results is kept. Returns (text, tool names across all passes, passes that
+    ran a tool).
+    """
+    out, used, passes = message, [], 0
+    while passes < max_chain:
+        nxt, names = splice_once_with_tools(out, whole=not passes)
+        if not names:
+            break
+        used += names
+        passes += 1
+        if nxt == out:
+            break
+        out = nxt
+    return out, used, passes
@@ -0,0 +1,256 @@
+"""
+Pre-forked worker processes for running untrusted Python snippets with
+per-call limits, so a runaway snippet costs one worker, not the caller.
+
+    pool = get_pool()
+    pool.run("sum(range(10))")        # "45"
+    pool.run("while True: pass")      # "ERROR: CPU time limit exceeded (1s)"
+
+Each worker caps its address space (RLIMIT_AS, $AGENT_PY_MEM_MB, default 256;
+Linux does not enforce RLIMIT_RSS) and, per call, its CPU time ($AGENT_PY_CPU_S,
+default 2, with a CPU-time timer). Limits are set soft == hard so a snippet
+cannot raise them back; RLIMIT_CPU is therefore a lifetime budget of
+WORKER_CPU_CALLS full calls, and a worker near it retires after its reply and
+is replaced. The parent also enforces a wall-clock timeout
+($AGENT_PY_TIMEOUT_S, default 5). A worker that dies or times out is killed
+and a replacement is forked in the background while later calls use the
+other idle workers ($AGENT_PY_WORKERS, default 2).
+
+Snippets see a small set of builtins (no import, open, eval, ...). That keeps
+honest snippets honest; the process limits are what contain runaway ones.
+This is not a security boundary against hostile code.
+"""
+import ast, atexit, builtins, io, math, multiprocessing, os, queue, resource, signal, threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+DEBUG = os.getenv("AGENT_DEBUG") == "1"
+def _dbg(*a):
+    if DEBUG: print("[DEBUG sandbox]", *a)
+
+WORKERS = int(os.getenv("AGENT_PY_WORKERS", "2"))
+CPU_S = int(os.getenv("AGENT_PY_CPU_S", "2"))
+MEM_MB = int(os.getenv("AGENT_PY_MEM_MB", "256"))
+TIMEOUT_S = float(os.getenv("AGENT_PY_TIMEOUT_S", "5"))
+WORKER_CPU_CALLS = 20
+MAX_OUTPUT = 10_000
+# forkserver children start from a clean single-threaded server, so forking
+# while the daemon's threads hold locks cannot wedge a worker.
+START_METHOD = os.getenv("AGENT_PY_START") or (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+
+SAFE_BUILTINS = {name: getattr(builtins, name) for name in (
+    "abs", "all", "any", "bin", "bool", "chr", "dict", "divmod", "enumerate", "filter", "float",
+    "format", "frozenset", "hex", "int", "isinstance", "len", "list", "map", "max", "min", "oct",
+    "ord", "pow", "range", "repr", "reversed", "round", "set", "slice", "sorted", "str", "sum",
+    "tuple", "zip", "ArithmeticError", "Exception", "IndexError", "KeyError", "TypeError",
+    "ValueError", "ZeroDivisionError")}
+
+
+# -----------------------------
+# Worker side
+# -----------------------------
+def evaluate(code: str) -> str:
+    """
+    Run ``code`` in a fresh namespace. Returns what it printed plus the repr
+    of a trailing expression; a snippet with neither returns its variables.
+    """
+    tree = ast.parse(code, mode="exec")
+    last = tree.body.pop() if tree.body and isinstance(tree.body[-1], ast.Expr) else None
+    out = io.StringIO()
+    ns: Dict[str, Any] = {"__builtins__": {**SAFE_BUILTINS, "math": math,
+                                           "print": lambda *a, **k: print(*a, **k, file=out)}}
+    exec(compile(tree, "<py>", "exec"), ns)
+    value = eval(compile(ast.Expression(last.value), "<py>", "eval"), ns) if last else None
+    text = out.getvalue()
+    if value is not None:
+        text += repr(value)
+    if not text and last is None:
+        text = str({k: v for k, v in ns.items() if k != "__builtins__"})
+    return text[:MAX_OUTPUT]
+
+
+def _set_limit(which: int, limit: int) -> None:
+    """Lower both the soft and the hard limit, so it cannot be raised again."""
+    _, hard = resource.getrlimit(which)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(which, (limit, limit))
+
+
+def _cpu_used() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _worker_main(conn, mem_mb: int, cpu_s: int, cpu_calls: int) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # ^C is the parent's to handle
+    if mem_mb > 0:
+        _set_limit(resource.RLIMIT_AS, mem_mb << 20)
+    evaluate("sum(range(10))")  # warm the compile/eval path before the first real call
+    if cpu_s > 0:  # a hard limit cannot be extended per call, so budget the worker's life
+        budget = math.ceil(_cpu_used()) + cpu_s * cpu_calls
+        _set_limit(resource.RLIMIT_CPU, budget)
+    conn.send(("ready", os.getpid()))
+    while True:
+        try:
+            code = conn.recv()
+        except EOFError:
+            return
+        if cpu_s > 0:  # SIGPROF's default action kills the worker once the call used cpu_s
+            signal.setitimer(signal.ITIMER_PROF, cpu_s)
+        try:
+            reply = ("ok", evaluate(code))
+        except MemoryError:
+            reply = ("error", "memory limit exceeded")
+        except BaseException as e:
+            reply = ("error", f"{type(e).__name__}: {e}")
+        finally:
+            signal.setitimer(signal.ITIMER_PROF, 0)
+        retire = cpu_s > 0 and _cpu_used() + cpu_s >= budget  # the next call might hit RLIMIT_CPU
+        conn.send(reply + (retire,))
+        if retire:
+            return
+
+
+# -----------------------------
+# Parent side
+# -----------------------------
+class _Worker:
+    def __init__(self, ctx, mem_mb: int, cpu_s: int, cpu_calls: int):
+        self.conn, child = ctx.Pipe()
+        self.proc = ctx.Process(target=_worker_main, args=(child, mem_mb, cpu_s, cpu_calls),
+                                daemon=True)
+        self.proc.start()
+        child.close()
+
+    def wait_ready(self, timeout: float) -> bool:
+        try:
+            return self.conn.poll(timeout) and self.conn.recv()[0] == "ready"
+        except (EOFError, OSError):
+            return False
+
+    def kill(self) -> None:
+        if self.proc.is_alive():
+            self.proc.kill()
+        self.proc.join(1)
+        self.conn.close()
+
+
+class WorkerPool:
+    def __init__(self, size: int = WORKERS, cpu_s: int = CPU_S, mem_mb: int = MEM_MB,
+                 timeout: float = TIMEOUT_S, start_method: str = START_METHOD,
+                 cpu_calls: int = WORKER_CPU_CALLS):
+        self.size = max(1, size)
+        self.cpu_s = cpu_s
+        self.cpu_calls = cpu_calls
+        self.mem_mb = mem_mb
+        self.timeout = timeout
+        self._ctx = multiprocessing.get_context(start_method)
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._spawning: List[threading.Thread] = []
+        self.stats = {"calls": 0, "errors": 0, "killed": 0, "retired": 0, "spawned": 0}
+
+    def start(self) -> "WorkerPool":
+        """Fork one worker now and the rest in the background."""
+        self._spawn()
+        for _ in range(self.size - 1):
+            self._respawn()
+        return self
+
+    def _spawn(self) -> None:
+        worker = _Worker(self._ctx, self.mem_mb, self.cpu_s, self.cpu_calls)
+        if not worker.wait_ready(30):
+            worker.kill()
+            raise RuntimeError("python worker failed to start")
+        with self._lock:
+            self.stats["spawned"] += 1
+            if self._closed:
+                worker.kill()
+                return
+        self._idle.put(worker)
+
+    def _respawn(self) -> None:
+        def spawn():
+            try:
+                self._spawn()
+            except Exception as e:
+                _dbg("respawn failed:", e)
+        thread = threading.Thread(target=spawn, daemon=True)
+        with self._lock:
+            self._spawning = [t for t in self._spawning if t.is_alive()] + [thread]
+        thread.start()
+
+    def run(self, code: str) -> str:
+        """Output of ``code`` in a worker, or "ERROR: ..." (the caller never sees an exception)."""
+        try:
+            ok, text = self.call(code)
+        except TimeoutError as e:
+            ok, text = False, str(e)
+        return text if ok else f"ERROR: {text}"
+
+    def call(self, code: str) -> Tuple[bool, str]:
+        """(True, output) or (False, error message); raises TimeoutError if no worker frees up."""
+        try:
+            worker = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"no python worker free within {self.timeout:g}s") from None
+        with self._lock:
+            self.stats["calls"] += 1
+        t0 = time.monotonic()
+        try:
+            worker.conn.send(code)
+            if worker.conn.poll(self.timeout):
+                status, text, retire = worker.conn.recv()
+                if retire:
+                    worker.kill()
+                    self._respawn()
+                else:
+                    self._idle.put(worker)
+                with self._lock:
+                    self.stats["errors"] += status != "ok"
+                    self.stats["retired"] += retire
+                return status == "ok", text
+            reason = f"timed out after {self.timeout:g}s"
+        except (EOFError, OSError):  # the worker died mid-call: SIGPROF, OOM kill, ...
+            worker.proc.join(1)
+            exitcode = worker.proc.exitcode
+            reason = (f"CPU time limit exceeded ({self.cpu_s}s)"
+                      if exitcode in (-signal.SIGPROF, -signal.SIGXCPU)
+                      and self.cpu_s > 0 else f"worker exited ({exitcode})")
+        _dbg("killing worker", worker.proc.pid, reason, f"after {time.monotonic() - t0:.2f}s")
+        worker.kill()
+        with self._lock:
+            self.stats["killed"] += 1
+            self.stats["errors"] += 1
+        self._respawn()
+        return False, reason
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            spawning = list(self._spawning)
+        for thread in spawning:  # let in-flight forks finish so none is cut off mid-handshake
+            thread.join(5)
+        while True:
+            try:
+                self._idle.get_nowait().kill()
+            except queue.Empty:
+                return
+
+
+_POOL: Optional[WorkerPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_pool() -> WorkerPool:
+    """The process-wide pool, started on first use and closed at exit."""
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = WorkerPool().start()
+                atexit.register(_POOL.close)
+    return _POOL
@@ -0,0 +1,28 @@
+"""Latency summaries shared by the bench scripts."""
+import math
+from typing import Dict, Iterable, List, Sequence
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Linear-interpolated percentile (q in 0..100) of an already sorted sequence."""
+    if not sorted_values:
+        return math.nan
+    pos = (len(sorted_values) - 1) * q / 100.0
+    lo = math.floor(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def summarize(samples_s: Iterable[float], percentiles: Sequence[float] = (50, 95, 99)) -> Dict[str, float]:
+    """
+    Summary of per-operation latencies given in seconds: count, mean and the
+    requested percentiles in milliseconds, plus ops/sec over the summed time.
+    """
+    xs: List[float] = sorted(samples_s)
+    total = sum(xs)
+    out: Dict[str, float] = {"count": len(xs)}
+    out["mean_ms"] = (total / len(xs) * 1e3) if xs else math.nan
+    for q in percentiles:
+        out[f"p{q:g}_ms"] = percentile(xs, q) * 1e3
+    out["ops_per_s"] = (len(xs) / total) if total > 0 else math.nan
+    return out
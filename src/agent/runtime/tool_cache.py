@@ -0,0 +1,140 @@
+"""
+Cross-request cache of tool results, for tools that declare they are safe to
+cache. A tool module opts in next to TOOL_NAME / TOOL_ALIASES:
+
+    TOOL_CACHE = "pure"   # same input, same output: kept until evicted
+    TOOL_CACHE = "day"    # same output until local midnight (e.g. weather)
+    TOOL_CACHE = 300      # same output for this many seconds
+
+Tools without TOOL_CACHE (clock, uuid, ...) are never cached. Entries are
+keyed on (tool, message) and held in one process-wide LRU bounded by
+$AGENT_TOOL_CACHE_SIZE entries (default 4096; 0 disables it) and
+$AGENT_TOOL_CACHE_MB of keys plus values (default 16). A ValueError decline
+is cached as a Declined(reason), so a pure tool that rejected an input is not
+retried; any other exception may be transient and is never cached.
+"""
+import datetime, os, threading, time
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional, Tuple, Union
+
+Policy = Union[str, int, float, None]
+
+SIZE = int(os.getenv("AGENT_TOOL_CACHE_SIZE", "4096"))
+MAX_BYTES = int(float(os.getenv("AGENT_TOOL_CACHE_MB", "16")) * (1 << 20))
+
+MISS = object()
+
+
+class Declined(NamedTuple):
+    """A cached "not for me": the message of the ValueError the tool raised."""
+    reason: str
+
+
+def policy_of(value: Any) -> Policy:
+    """Validated TOOL_CACHE value: "pure", "day", seconds > 0, or None (don't cache)."""
+    if value in ("pure", "day"):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and value > 0:
+        return value
+    return None
+
+
+def _expires(policy: Policy, now: float) -> float:
+    if policy == "pure":
+        return float("inf")
+    if policy == "day":
+        tomorrow = datetime.date.fromtimestamp(now) + datetime.timedelta(days=1)
+        return time.mktime(tomorrow.timetuple())
+    return now + float(policy)
+
+
+def _nbytes(tool: str, message: str, value: Any) -> int:
+    text = value.reason if isinstance(value, Declined) else value
+    return len(tool) + len(message.encode("utf-8")) + len(text.encode("utf-8"))
+
+
+class ResultCache:
+    """LRU bounded by entries and bytes, with per-entry expiry and per-tool counters; thread-safe."""
+
+    def __init__(self, maxsize: int = SIZE, maxbytes: int = MAX_BYTES):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self._data: "OrderedDict[Tuple[str, str], Tuple[float, Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, tool: str, field: str) -> None:
+        counts = self._stats.setdefault(tool, {"hits": 0, "misses": 0, "evictions": 0})
+        counts[field] += 1
+
+    def get(self, tool: str, message: str) -> Any:
+        """The cached result (a str, or a Declined), else MISS."""
+        key = (tool, message)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] <= time.time():
+                del self._data[key]
+                self.nbytes -= entry[2]
+                entry = None
+            if entry is None:
+                self._count(tool, "misses")
+                return MISS
+            self._data.move_to_end(key)
+            self._count(tool, "hits")
+            return entry[1]
+
+    def put(self, tool: str, message: str, value: Any, policy: Policy) -> None:
+        """Store a str result or a Declined; an entry larger than maxbytes is not kept."""
+        size = _nbytes(tool, message, value)
+        if size > self.maxbytes:
+            return
+        key = (tool, message)
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[2]
+            self._data[key] = (_expires(policy, time.time()), value, size)
+            self.nbytes += size
+            while len(self._data) > self.maxsize or self.nbytes > self.maxbytes:
+                (name, _), (_, _, n) = self._data.popitem(last=False)
+                self.nbytes -= n
+                self._count(name, "evictions")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._stats.clear()
+            self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per tool: hits, misses, evictions, hit_rate and current entries."""
+        with self._lock:
+            sizes: Dict[str, int] = {}
+            for tool, _ in self._data:
+                sizes[tool] = sizes.get(tool, 0) + 1
+            out = {}
+            for tool, counts in sorted(self._stats.items()):
+                lookups = counts["hits"] + counts["misses"]
+                out[tool] = {**counts, "hit_rate": round(counts["hits"] / lookups, 4) if lookups else 0.0,
+                             "entries": sizes.get(tool, 0)}
+            return out
+
+
+_CACHE: Optional[ResultCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_cache() -> Optional[ResultCache]:
+    """The process-wide cache, or None when $AGENT_TOOL_CACHE_SIZE is 0."""
+    global _CACHE
+    if SIZE <= 0:
+        return None
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = ResultCache(SIZE, MAX_BYTES)
+    return _CACHE
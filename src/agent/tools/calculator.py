@@ -5,15 +5,25 @@ import ast
 import operator as _op
 import os
 import re
-from typing import Any, Optional, Union
+import threading
+from collections import OrderedDict
+from typing import (Any, Callable, Collection, Dict, List, Mapping, NamedTuple, Optional,
+                    Sequence, Tuple, Union)
+
+from agent.runtime.envelope import decode_payload
+
+TOOL_CACHE = "pure"  # results depend only on the input (see agent.runtime.tool_cache)
 
 
 # -----------------------------
 # Debug helper
 # -----------------------------
-def _dbg(msg: str) -> None:
-    if os.environ.get("AGENT_DEBUG"):
-        print(f"[DEBUG calculator] {msg}")
+# Read once at import, like the other tools: no environ lookup per call, and
+# callers pass arguments (not f-strings) so nothing is formatted when it's off.
+DEBUG = os.getenv("AGENT_DEBUG") == "1"
+def _dbg(*a) -> None:
+    if DEBUG:
+        print("[DEBUG calculator]", *a)
 
 
 # -----------------------------
@@ -28,14 +38,17 @@ UNICODE_MAP = {
 }
 
 
+# Every glyph rewrite, caret-power included, in one translation table.
+_GLYPHS = str.maketrans({**UNICODE_MAP, "^": "**"})
+_THOUSANDS = re.compile(r"(?<=\d),(?=\d{3}\b)")
+
+
 def _normalize(s: str) -> str:
-    # unify common unicode math glyphs
-    for k, v in UNICODE_MAP.items():
-        s = s.replace(k, v)
-    # convert caret-power to Python's ** (common user expectation)
-    s = s.replace("^", "**")
+    # unify common unicode math glyphs; convert caret-power to Python's **
+    s = s.translate(_GLYPHS)
     # strip thousands separators when used as 1,234
-    s = re.sub(r"(?<=\d),(?=\d{3}\b)", "", s)
+    if "," in s:
+        s = _THOUSANDS.sub("", s)
     return s
 
 
@@ -53,70 +66,102 @@ MAX_EXPR_LEN = 512  # overall expression text length
 #   [[calc: 23*17+88]]
 #   calc(23*17+88)
 #   CALCULATE: 23*17+88
+# Captures start (and, for calc(...), end) on a non-blank character, so the
+# neighbouring \s* never competes with the class for the same blanks: each
+# pattern fails in one pass instead of backtracking quadratically over long
+# runs of spaces.
+_EXPR_CH = r"[0-9.,+\-*/() \t^×÷]"
+_EXPR_NB = r"[0-9.,+\-*/()^×÷]"
 TRIGGERS = [
-    re.compile(r"\[\[\s*calc\s*:\s*([0-9.,+\-*/() \t^×÷]+)\]\]", re.I),
-    re.compile(r"\bcalc\s*\(\s*([0-9.,+\-*/() \t^×÷]+)\s*\)", re.I),
-    re.compile(r"\bcalculate\s*:\s*([0-9.,+\-*/() \t^×÷]+)", re.I),
+    re.compile(rf"\[\[\s*calc\s*:\s*({_EXPR_NB}{_EXPR_CH}*)\]\]", re.I),
+    re.compile(rf"\bcalc\s*\(\s*({_EXPR_NB}(?:{_EXPR_CH}*{_EXPR_NB})?)\s*\)", re.I),
+    re.compile(rf"\bcalculate\s*:\s*({_EXPR_NB}{_EXPR_CH}*)", re.I),
 ]
 
-# Generic arithmetic finder that tolerates spaces *between* tokens.
-# We allow sequences of (number|op|paren) surrounded by optional whitespace.
-GENERIC_EXPR = re.compile(
-    r"(?P<expr>(?:\s*(?:\d[\d,]*\.?\d*|\.\d+|\(|\)|\*{1,2}|\/|\+|\-)\s*)+)",
-    re.U,
-)
+# Generic arithmetic finder: runs of (number|op|paren) tokens, blanks allowed
+# between tokens. A span only starts on a token, so no position is scanned
+# more than a constant number of times: O(n) on any input.
+_TOKEN = r"\d[\d,]*\.?\d*|\.\d+|[()*/+\-]"
+_SPAN = re.compile(rf"(?:{_TOKEN})(?:\s*(?:{_TOKEN}))*")
+_HAS_DIGIT = re.compile(r"\d")
+_TRAILING_OP = re.compile(r"[\+\-\*/\*]{1,2}\s*$")
+
+
+# Router-only selector: a digit next to an operator or paren. A superset of what
+# the generic finder accepts, so the router never skips a plain-math message.
+ROUTE_TRIGGERS = [
+    re.compile(r"\d[.,]?\s*[-+*/()^×÷−–—]|[-+*/()^×÷−–—]\s*\.?\d"),
+]
 
 
-def _longest_match(pattern: re.Pattern, text: str) -> Optional[str]:
-    best = None
-    best_len = -1
-    for m in pattern.finditer(text):
-        seg = m.group("expr")
-        if seg and len(seg) > best_len:
-            best = seg
-            best_len = len(seg)
-    return best
+def _looks_arithmetic(expr: str) -> bool:
+    # Heuristic sanity: must contain a digit and at least one operator/paren
+    return bool(_HAS_DIGIT.search(expr)) and any(
+        op in expr for op in ("+", "-", "*", "/", "(", ")")
+    )
+
+
+def _generic_expr(text: str) -> Optional[str]:
+    """
+    Longest token span (the blanks on either side count towards its length),
+    if it looks like arithmetic. Arithmetic spans over MAX_EXPR_LEN are
+    skipped; "expression too long" is raised only when one was skipped and
+    nothing acceptable is left.
+    """
+    best, best_len, n = None, -1, len(text)
+    too_long = False
+    for m in _SPAN.finditer(text):
+        span = m.group()
+        if len(span) > MAX_EXPR_LEN and _looks_arithmetic(span):
+            too_long = True
+            continue
+        # Blanks on either side; each blank run borders at most two spans.
+        lo, hi = m.start(), m.end()
+        while lo and text[lo - 1].isspace():
+            lo -= 1
+        while hi < n and text[hi].isspace():
+            hi += 1
+        if hi - lo > best_len:
+            best, best_len = span, hi - lo
+
+    if best is None or not _looks_arithmetic(best):
+        if too_long:
+            raise ValueError("expression too long")
+        return None
+    # If trailing operator snuck in (e.g., '23*17 +'), trim it
+    expr = _TRAILING_OP.sub("", best).strip()
+    if not expr and too_long:
+        raise ValueError("expression too long")
+    return expr or None
 
 
 def extract_expr(text: str) -> Optional[str]:
     """
     Try to pull a math expression out of arbitrary text.
     Returns a normalized string or None if nothing plausible is found.
+    Linear in len(text): one normalization pass, one pass per trigger, one
+    tokenizing pass for the generic finder.
     """
     if not isinstance(text, str):
         return None
-    raw = text
     text = _normalize(text)
 
-    # Try explicit triggers first (against raw and normalized)
-    for pat in TRIGGERS:
-        m = pat.search(raw) or pat.search(text)
+    # Try explicit triggers first (all need "calc"; re.I patterns get no
+    # literal-prefix scan, so one substring test saves three full passes)
+    for pat in TRIGGERS if "calc" in text.lower() else ():
+        m = pat.search(text)
         if m:
             expr = _normalize(m.group(1)).strip()
-            if expr:
-                if len(expr) > MAX_EXPR_LEN:
-                    raise ValueError("expression too long")
-                return expr
-
-    # Try generic expression finder: take the longest plausible span
-    candidate = _longest_match(GENERIC_EXPR, text)
-    if candidate:
-        expr = candidate.strip()
-        # Heuristic sanity: must contain a digit and at least one operator/paren
-        if any(ch.isdigit() for ch in expr) and any(
-            op in expr for op in ("+", "-", "*", "/", "(", ")")
-        ):
             if len(expr) > MAX_EXPR_LEN:
                 raise ValueError("expression too long")
-            # If trailing operator snuck in (e.g., '23*17 +'), trim it
-            expr = re.sub(r"[\+\-\*/\*]{1,2}\s*$", "", expr).strip()
-            return expr or None
+            return expr
 
-    return None
+    # Try generic expression finder: take the longest plausible span
+    return _generic_expr(text)
 
 
 # -----------------------------
-# Safe evaluation (AST)
+# Safe evaluation (AST -> postfix program)
 # -----------------------------
 _ALLOWED_BINOPS = {
     ast.Add: _op.add,
@@ -133,48 +178,200 @@ _ALLOWED_UNARYOPS = {
 
 Number = Union[int, float]
 
+# The validated AST is flattened once into a postfix program that a loop runs
+# against a value stack: no recursion (nesting is bounded by MAX_EXPR_LEN, not
+# the interpreter's recursion limit) and no isinstance chains per node at run
+# time. Instructions are (kind, arg) pairs; operator instructions come prebuilt
+# from a table mapping AST op types to (kind, callable).
+_PUSH, _LOAD, _UNARY, _BINARY, _FAIL = range(5)
+
+Program = List[Tuple[int, Any]]
+Instructions = Mapping[type, Tuple[int, Callable]]
+
+
+def _checked_pow(base: Number, exp: Number) -> Number:
+    if not isinstance(base, (int, float)) or not isinstance(exp, (int, float)):
+        raise ValueError("invalid power")
+    if abs(exp) > MAX_EXP or abs(base) > MAX_ABS:
+        raise ValueError("expression too large")
+    return _op.pow(base, exp)
+
+
+def _instructions(unary: Mapping[type, Callable], binary: Mapping[type, Callable]) -> Instructions:
+    return {**{op: (_UNARY, fn) for op, fn in unary.items()},
+            **{op: (_BINARY, fn) for op, fn in binary.items()}}
+
+
+_SCALAR_OPS = _instructions(_ALLOWED_UNARYOPS, {**_ALLOWED_BINOPS, ast.Pow: _checked_pow})
+
+
+def _to_postfix(node: ast.AST, ops: Instructions = _SCALAR_OPS,
+                names: Optional[Collection[str]] = None) -> Program:
+    """
+    Validate an expression AST and flatten it into postfix order.
+
+    The first disallowed node becomes a _FAIL instruction carrying the message
+    the old recursive evaluator raised, at the point it raised it: after the
+    operands it had already evaluated ("1/0 + x" still reports division by
+    zero). ``names`` allows those variables (used by evaluate_many); None
+    rejects every name.
+    """
+    program: Program = []
+    emit = program.append
+    # Work stack of nodes still to visit and, interleaved, the operator
+    # instructions to emit once their operands are out.
+    todo: list = [node]
+    pop, push = todo.pop, todo.append
+    Constant, UnaryOp, BinOp = ast.Constant, ast.UnaryOp, ast.BinOp
+    while todo:
+        node = pop()
+        t = type(node)
+        if t is Constant:
+            if not isinstance(node.value, (int, float)):
+                emit((_FAIL, "invalid constant"))
+                break
+            emit((_PUSH, node.value))
+        elif t is tuple:
+            emit(node)
+        elif t is BinOp:
+            instr = ops.get(type(node.op))
+            if instr is None or instr[0] != _BINARY:
+                emit((_FAIL, "operator not allowed"))
+                break
+            push(instr)
+            push(node.right)
+            push(node.left)
+        elif t is UnaryOp and type(node.op) in ops:
+            push(ops[type(node.op)])
+            push(node.operand)
+        elif t is ast.Name and names is not None:
+            if node.id not in names:
+                emit((_FAIL, f"unknown variable: {node.id}"))
+                break
+            emit((_LOAD, node.id))
+        else:
+            # Explicitly forbid everything else (names, calls, attrs, etc.)
+            emit((_FAIL, "invalid expression"))
+            break
+    return program
+
+
+def _run(program: Program) -> Number:
+    """Execute a scalar program."""
+    stack: List[Number] = []
+    push, pop = stack.append, stack.pop
+    PUSH, BINARY, UNARY = _PUSH, _BINARY, _UNARY
+    for kind, arg in program:
+        if kind == PUSH:
+            push(arg)
+        elif kind == BINARY:
+            rhs = pop()
+            stack[-1] = arg(stack[-1], rhs)
+        elif kind == UNARY:
+            stack[-1] = arg(stack[-1])
+        else:
+            raise ValueError(arg)
+    return stack[-1]
+
 
 def _safe_eval(node: ast.AST) -> Number:
-    # Numbers: Constant in py3.8+; Num for older ASTs
-    if isinstance(node, ast.Constant):
-        if isinstance(node.value, (int, float)):
-            return node.value
-        raise ValueError("invalid constant")
-    if isinstance(node, ast.Num):  # pragma: no cover (older versions)
-        return node.n  # type: ignore[attr-defined]
-
-    # Parentheses
     if isinstance(node, ast.Expression):
-        return _safe_eval(node.body)
-
-    # Unary +/-
-    if isinstance(node, ast.UnaryOp) and type(node.op) in _ALLOWED_UNARYOPS:
-        val = _safe_eval(node.operand)
-        return _ALLOWED_UNARYOPS[type(node.op)](val)
-
-    # Binary operations
-    if isinstance(node, ast.BinOp):
-        # Intercept exponent first to apply limits
-        if isinstance(node.op, ast.Pow):
-            base = _safe_eval(node.left)
-            exp = _safe_eval(node.right)
-            if not isinstance(base, (int, float)) or not isinstance(exp, (int, float)):
-                raise ValueError("invalid power")
-            if abs(exp) > MAX_EXP or abs(base) > MAX_ABS:
-                raise ValueError("expression too large")
-            return _op.pow(base, exp)
-
-        # Allowed simple ops
-        op_type = type(node.op)
-        if op_type in _ALLOWED_BINOPS:
-            left = _safe_eval(node.left)
-            right = _safe_eval(node.right)
-            return _ALLOWED_BINOPS[op_type](left, right)
-
-        raise ValueError("operator not allowed")
-
-    # Explicitly forbid everything else (names, calls, attrs, etc.)
-    raise ValueError("invalid expression")
+        node = node.body
+    return _run(_to_postfix(node))
+
+
+# -----------------------------
+# Compiled-expression cache
+# -----------------------------
+# Evaluation is pure, so each normalized expression is parsed, validated and
+# evaluated once; later calls replay the stored result, or re-raise the stored
+# friendly error ("division by zero", "expression too large", ...).
+class _Compiled:
+    __slots__ = ("value", "error")
+
+    def __init__(self, value: Optional[Number], error: Optional[str]):
+        self.value = value
+        self.error = error
+
+
+class _LRU:
+    """Thread-safe bounded LRU with hit/miss counters (maxsize 0 disables it)."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = max(0, int(maxsize))
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[str, _Compiled]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[_Compiled]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: _Compiled) -> None:
+        with self._lock:
+            if self.maxsize <= 0:
+                return
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def resize(self, maxsize: int) -> None:
+        with self._lock:
+            self.maxsize = max(0, int(maxsize))
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def info(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "size": len(self._data), "maxsize": self.maxsize}
+
+
+_CACHE = _LRU(int(os.environ.get("AGENT_CALC_CACHE_SIZE", "1024")))
+
+
+def cache_info() -> Dict[str, int]:
+    """{"hits", "misses", "size", "maxsize"} for the compiled-expression cache."""
+    return _CACHE.info()
+
+
+def cache_clear() -> None:
+    """Drop every cached expression and reset the counters."""
+    _CACHE.clear()
+
+
+def set_cache_size(maxsize: int) -> None:
+    """Resize the cache (default $AGENT_CALC_CACHE_SIZE or 1024); 0 disables caching."""
+    _CACHE.resize(maxsize)
+
+
+def _compile(expr: str) -> _Compiled:
+    try:
+        result = _safe_eval(ast.parse(expr, mode="eval"))
+    except ZeroDivisionError:
+        return _Compiled(None, "division by zero")
+    except SyntaxError:
+        return _Compiled(None, "invalid syntax")
+    except ValueError as e:
+        return _Compiled(None, str(e))
+
+    # Prefer int if exact
+    if isinstance(result, float) and result.is_integer():
+        result = int(result)
+    return _Compiled(result, None)
 
 
 def evaluate(expr: str) -> Number:
@@ -191,18 +388,179 @@ def evaluate(expr: str) -> Number:
     if len(expr) > MAX_EXPR_LEN:
         raise ValueError("expression too long")
 
+    entry = _CACHE.get(expr)
+    if entry is None:
+        entry = _compile(expr)
+        _CACHE.put(expr, entry)
+    if entry.error is not None:
+        raise ValueError(entry.error)
+    return entry.value
+
+
+# -----------------------------
+# Vectorized batch evaluation (NumPy)
+# -----------------------------
+# A template such as "a*x + b" is compiled once into the same postfix program
+# as the scalar path, linked against NumPy-aware ops. Guards become masks: each
+# op flags the elements it would have raised for in an error-code array (first
+# error wins, in the scalar evaluator's left-to-right order) and the batch
+# carries on.
+_V_DIV0, _V_LARGE, _V_POW = 1, 2, 3
+_V_MESSAGES = (None, "division by zero", "expression too large", "invalid power")
+
+Kernel = Callable[[Dict[str, Any], Any], Any]
+
+
+class Batch(NamedTuple):
+    values: Any  # float64 ndarray, NaN wherever errors is set
+    errors: Any  # object ndarray: None, or the message evaluate() would raise
+
+
+def _flag(code, mask, err: int) -> None:
+    import numpy as np
+    np.copyto(code, err, where=(code == 0) & mask)
+
+
+def _vdiv(num, den, code):
+    _flag(code, den == 0, _V_DIV0)
+    return num / den
+
+
+def _vpow(base, exp, code):
+    import numpy as np
+    _flag(code, (np.abs(exp) > MAX_EXP) | (np.abs(base) > MAX_ABS), _V_LARGE)
+    _flag(code, (base == 0) & (exp < 0), _V_DIV0)
+    _flag(code, (base < 0) & (exp != np.floor(exp)), _V_POW)  # complex result
+    return np.power(base, exp)
+
+
+def _unguarded(fn: Callable) -> Callable:
+    return lambda a, b, code: fn(a, b)
+
+
+_VECTOR_OPS = _instructions(_ALLOWED_UNARYOPS, {
+    **{op: _unguarded(fn) for op, fn in _ALLOWED_BINOPS.items()},
+    ast.Div: _vdiv,
+    ast.Pow: _vpow,
+})
+
+
+def _vkernel(program: Program) -> Kernel:
+    import numpy as np
+    linked = [(kind, np.float64(arg) if kind == _PUSH else arg) for kind, arg in program]
+
+    def run(env, code):
+        stack: list = []
+        push, pop = stack.append, stack.pop
+        for kind, arg in linked:
+            if kind == _PUSH:
+                push(arg)
+            elif kind == _BINARY:
+                rhs = pop()
+                stack[-1] = arg(stack[-1], rhs, code)
+            elif kind == _UNARY:
+                stack[-1] = arg(stack[-1])
+            else:  # _LOAD
+                push(env[arg])
+        return stack[-1]
+    return run
+
+
+def _constant_kernel(expr: str) -> Tuple[Optional[Kernel], Optional[str]]:
+    # No variables: the scalar path (and its cache) gives the exact answer.
+    import numpy as np
     try:
-        tree = ast.parse(expr, mode="eval")
-        result = _safe_eval(tree.body)  # evaluate expression body
-    except ZeroDivisionError:
-        raise ValueError("division by zero")
-    except SyntaxError:
-        raise ValueError("invalid syntax")
+        value = np.float64(float(evaluate(expr)))
+    except ValueError as e:
+        return None, str(e)
+    except TypeError:  # complex result, e.g. (-8)**0.5
+        return None, "invalid power"
+    except OverflowError:
+        return None, "expression too large"
+    return (lambda env, code: value), None
 
-    # Prefer int if exact
-    if isinstance(result, float) and result.is_integer():
-        return int(result)
-    return result
+
+_VCACHE = _LRU(256)
+
+
+def _kernel(expr: Any, names: Sequence[str]) -> Tuple[Optional[Kernel], Optional[str]]:
+    """(kernel, None) or (None, message) for one template; compiled once per names."""
+    if not isinstance(expr, str):
+        return None, "invalid input"
+    expr = _normalize(expr).strip()
+    key = f"{expr}\0{','.join(sorted(names))}"
+    entry = _VCACHE.get(key)
+    if entry is None:
+        kernel, error = None, None
+        if not expr:
+            error = "no arithmetic expression found"
+        elif len(expr) > MAX_EXPR_LEN:
+            error = "expression too long"
+        else:
+            try:
+                program = _to_postfix(ast.parse(expr, mode="eval").body, _VECTOR_OPS, names)
+                if program[-1][0] == _FAIL:
+                    error = program[-1][1]
+                elif any(kind == _LOAD for kind, _ in program):
+                    kernel = _vkernel(program)
+                else:
+                    kernel, error = _constant_kernel(expr)
+            except SyntaxError:
+                error = "invalid syntax"
+            except ValueError as e:
+                error = str(e)
+        entry = (kernel, error)
+        _VCACHE.put(key, entry)  # type: ignore[arg-type]
+    return entry  # type: ignore[return-value]
+
+
+def evaluate_many(exprs: Union[str, Sequence[str]],
+                  variables: Optional[Mapping[str, Any]] = None) -> Batch:
+    """
+    Evaluate a table of expressions with NumPy, without aborting on bad rows.
+
+    ``exprs`` is either one template, broadcast over ``variables`` (name ->
+    scalar or array), or a sequence with one expression per row, in which case
+    array variables hold one value per row. Each distinct expression is
+    compiled once and run vectorized over all of its rows. Values are float64;
+    a failing element gets NaN and the message evaluate() would raise
+    ("division by zero", "expression too large", ...).
+    """
+    import numpy as np
+
+    env = {k: np.asarray(v, dtype=np.float64) for k, v in (variables or {}).items()}
+    if isinstance(exprs, str):
+        shape = np.broadcast_shapes(*(a.shape for a in env.values()))
+        groups: list = [(exprs, Ellipsis)]
+    else:
+        exprs = list(exprs)
+        shape = (len(exprs),)
+        for k, a in env.items():
+            if a.ndim and a.shape != shape:
+                raise ValueError(f"variable {k!r} has shape {a.shape}; expected {shape}, "
+                                 "one value per expression")
+        rows: Dict[Any, list] = {}
+        for i, e in enumerate(exprs):
+            rows.setdefault(e if isinstance(e, str) else id(e), []).append(i)
+        groups = [(exprs[r[0]], np.asarray(r)) for r in rows.values()]
+
+    values = np.full(shape, np.nan)
+    errors = np.full(shape, None, dtype=object)
+    messages = np.array(_V_MESSAGES, dtype=object)
+    for expr, idx in groups:
+        kernel, error = _kernel(expr, env.keys())
+        if kernel is None:
+            errors[idx] = error
+            continue
+        sub = env if idx is Ellipsis else {k: a[idx] if a.ndim else a for k, a in env.items()}
+        out_shape = shape if idx is Ellipsis else idx.shape
+        code = np.zeros(out_shape, dtype=np.uint8)
+        with np.errstate(all="ignore"):
+            res = np.broadcast_to(kernel(sub, code), out_shape)
+        _flag(code, np.isinf(res), _V_LARGE)  # float overflow (ints were exact before)
+        values[idx] = np.where(code == 0, res, np.nan)
+        errors[idx] = messages[code]
+    return Batch(values, errors)
 
 
 # -----------------------------
@@ -213,11 +571,14 @@ def calc(text: Any) -> Number:
     Main tool entry: parse out an expression from arbitrary text and evaluate it.
     Raises ValueError('no arithmetic expression found') if none present.
     """
-    _dbg(f"type(text) = {type(text)}")
-    if isinstance(text, str):
-        _dbg(f"raw text (trunc): {repr(text[:80])}")
+    _dbg("type(text) =", type(text))
+    if DEBUG and isinstance(text, str):
+        _dbg("raw text (trunc):", repr(text[:80]))
 
-    # If dict/json payloads are passed, extract the expression
+    # If dict/json payloads are passed (the router hands them over already
+    # decoded), extract the expression
+    if isinstance(text, str):
+        text = decode_payload(text) or text
     if isinstance(text, dict):
         if "expression" in text:
             expr = text["expression"]
@@ -232,19 +593,19 @@ def calc(text: Any) -> Number:
             raise ValueError("no arithmetic expression found")
         if len(expr) > MAX_EXPR_LEN:
             raise ValueError("expression too long")
-        _dbg(f"extracted expr: {expr!s}")
-        _dbg(f"final expr: {expr}")
+        _dbg("extracted expr:", expr)
+        _dbg("final expr:", expr)
         return evaluate(expr)
 
     # Otherwise treat as free-form text
     expr = extract_expr(text if isinstance(text, str) else str(text))
-    _dbg(f"extracted expr: {expr!s}")
+    _dbg("extracted expr:", expr)
 
     if expr is None:
         raise ValueError("no arithmetic expression found")
 
     expr = _normalize(expr)
-    _dbg(f"final expr: {expr}")
+    _dbg("final expr:", expr)
 
     return evaluate(expr)
 
@@ -259,4 +620,14 @@ def execute(text: Any) -> str:
     return str(result)
 
 
-__all__ = ["extract_expr", "evaluate", "calc", "execute"]
+__all__ = [
+    "extract_expr",
+    "evaluate",
+    "calc",
+    "execute",
+    "cache_info",
+    "cache_clear",
+    "set_cache_size",
+    "evaluate_many",
+    "Batch",
+]
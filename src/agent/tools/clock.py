@@ -1,6 +1,8 @@
 # src/agent/tools/clock.py
-import os, re, json, datetime
-from typing import Optional, Dict, Any
+import os, re, datetime
+from typing import Any
+
+from agent.runtime.envelope import decode_payload, payload_args
 
 DEBUG = os.getenv("AGENT_DEBUG") == "1"
 def _dbg(*a):
@@ -12,27 +14,17 @@ TRIGGERS = [
     r"\btime\s*\(\s*(?P<fmt>[^)]+)\s*\)",     # time(%Y-%m-%d)
 ]
 
-def _maybe_parse_json(text: str) -> Optional[Dict[str, Any]]:
-    """Try to parse JSON payload safely, else return None."""
-    t = text.strip()
-    if t.startswith("{") and t.endswith("}"):
-        try:
-            return json.loads(t)
-        except Exception as e:
-            _dbg("JSON parse error:", e)
-            return None
-    return None
-
 def execute(text: Any) -> str:
-    if not isinstance(text, str):
-        text = str(text)
-
     # JSON form: {"tool":"clock","args":{"format":"%H:%M"}}
-    j = _maybe_parse_json(text)
+    j = decode_payload(text)
     if j and j.get("tool") == "clock":
-        fmt = j.get("args", {}).get("format", "%Y-%m-%d %H:%M:%S")
+        fmt = payload_args(j).get("format", "%Y-%m-%d %H:%M:%S")
         _dbg("JSON trigger matched with fmt:", fmt)
         return datetime.datetime.now().strftime(fmt)
+    if isinstance(text, dict):
+        raise ValueError("No clock trigger matched")
+    if not isinstance(text, str):
+        text = str(text)
 
     # Regex triggers: [[time]] or time(%Y-%m-%d)
     for pat in TRIGGERS:
@@ -1,5 +1,9 @@
-import json, ast, re, os
-from typing import Any, Dict, Optional
+TOOL_ALIASES = ["help", "help_tool"]
+TOOL_CACHE = "pure"
+import re, os
+from typing import Any
+
+from agent.runtime.envelope import decode_payload
 
 DEBUG = os.getenv("AGENT_DEBUG") == "1"
 def _dbg(*a):
@@ -13,19 +17,10 @@ TRIGGERS = [
     r"\bhelp\s+me\b",
 ]
 
-def _maybe_json(text: str) -> Optional[Dict[str, Any]]:
-    t = text.strip()
-    if not t: return None
-    if (t.startswith("{") and t.endswith("}")) or t.startswith("{'") or t.startswith('{"'):
-        try:
-            return json.loads(t)
-        except json.JSONDecodeError:
-            try:
-                obj = ast.literal_eval(t)
-                if isinstance(obj, dict): return obj
-            except Exception:
-                return None
-    return None
+# Router-only: flat {"help": true} payloads carry no "tool" key to route on.
+ROUTE_TRIGGERS = [
+    r"[\"']help[\"']\s*:\s*true",
+]
 
 def _help_text() -> str:
     return (
@@ -35,15 +30,17 @@ def _help_text() -> str:
         "- stringy: [[upper: hi]] | slug: Hello World | {\"tool\":\"string\",\"args\":{\"op\":\"title\",\"text\":\"hello\"}}\n"
         "- weather(stub): [[weather: Toronto]] | weather: Athens | {\"tool\":\"weather\",\"args\":{\"city\":\"Montreal\"}}\n"
         "- uuid: [[uuid]] | uuid() | {\"tool\":\"uuid\"}\n"
+        "- python: [[py: sum(range(10))]] | {\"tool\":\"python\",\"args\":{\"code\":\"2**10\"}}\n"
+        "- retrieval: [[search: daemon socket]] | {\"tool\":\"retrieval\",\"args\":{\"query\":\"...\",\"k\":3}}\n"
         "- echo: [[echo: text]] | echo: text | echo(text) | {\"tool\":\"echo\",\"args\":{\"text\":\"...\"}}\n"
         "CLI: python -m src.ui.cli --use-tools \"[[calc: 2+2]]\""
     )
 
 def execute(text: Any) -> str:
     # JSON forms: {"tool":"help"} or {"help":true}
-    if isinstance(text, dict):
-        if text.get("tool") == "help" or text.get("help") is True:
-            return _help_text()
+    payload = decode_payload(text)
+    if payload and (payload.get("tool") in TOOL_ALIASES or payload.get("help") is True):
+        return _help_text()
 
     if isinstance(text, str):
         # ignore plain flags like "--use-tools"
@@ -51,10 +48,6 @@ def execute(text: Any) -> str:
         if t.startswith("-") and not any(ch.isalnum() for ch in t):
             raise ValueError("no match")
 
-        payload = _maybe_json(t)
-        if payload and (payload.get("tool") == "help" or payload.get("help") is True):
-            return _help_text()
-
         for pat in TRIGGERS:
             if re.search(pat, t, flags=re.I):
                 return _help_text()
@@ -1,7 +1,51 @@
+"""
+Run a Python snippet in a sandboxed, pre-forked worker (agent.runtime.sandbox).
+
+    [[py: sum(x * x for x in range(10))]]            -> 285
+    {"tool":"python","args":{"code":"x = 2\nx ** 10"}}  -> 1024
+
+Output is what the snippet printed plus the repr of a trailing expression;
+errors and limit hits come back as "ERROR: ...".
+"""
+import os, re
+from typing import Any
+
+from agent.runtime.envelope import decode_payload, payload_args
+
+TOOL_ALIASES = ["python", "py", "python_repl"]
+
+DEBUG = os.getenv("AGENT_DEBUG") == "1"
+def _dbg(*a):
+    if DEBUG: print("[DEBUG python_repl]", *a)
+
+TRIGGERS = [
+    # [[py: ...]], up to the first ]] not followed by another ] (so [[py: [[1], [2]]]] works)
+    r"(?s)\[\[\s*py(?:thon)?\s*:\s*(?P<code>.+?)\]\](?!\])",
+]
+
 def run(code: str) -> str:
-    local_vars = {}
+    from agent.runtime.sandbox import get_pool
     try:
-        exec(code, {"__builtins__": {}}, local_vars)
-        return str(local_vars)
-    except Exception as e:
-        return f"ERROR: {e}"
+        return get_pool().run(code)
+    except Exception as e:  # no worker could start; still answer, so no other tool takes [[py:]]
+        _dbg("pool failed:", e)
+        return f"ERROR: python unavailable: {e}"
+
+def execute(text: Any) -> str:
+    j = decode_payload(text)
+    if j and j.get("tool") in TOOL_ALIASES:
+        code = payload_args(j).get("code")
+        if not code:
+            raise ValueError("python: missing 'code'")
+        return run(str(code))
+    if isinstance(text, dict):
+        raise ValueError("No python trigger matched")
+
+    s = text if isinstance(text, str) else str(text)
+    for pat in TRIGGERS:
+        m = re.search(pat, s, re.IGNORECASE)
+        if m:
+            _dbg("code:", m.group("code"))
+            return run(m.group("code").strip())
+
+    raise ValueError("No python trigger matched")
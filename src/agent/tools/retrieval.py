@@ -1,2 +1,335 @@
-def retrieve(query: str) -> str:
-    return "RETRIEVAL_PLACEHOLDER: no index yet"
+"""
+Local document search: passages of the files under $AGENT_DOCS_DIR (default
+./docs), embedded offline with signed feature hashing and searched with a
+FAISS inner-product index. A relative docs dir is resolved against the
+client's cwd, also when the request goes through the daemon.
+
+    [[search: how does chaining work]]
+    {"tool":"retrieval","args":{"query":"daemon socket","k":3}}
+    {"tool":"retrieval","args":{"queries":["calc", "clock format"],"k":2}}   # batched, JSON out
+    {"tool":"retrieval","args":{"query":"socket","dir":"notes"}}           # docs/notes only
+
+The index and a manifest (per-file mtime/size/sha256 and passage offsets)
+live under $AGENT_CACHE_DIR/retrieval-<dir hash>/. Only added, edited or
+deleted files are re-embedded; an up-to-date index is opened with
+IO_FLAG_MMAP. A "dir" argument must stay inside the docs dir. Needs faiss-cpu;
+without it the tool declines every request.
+"""
+import hashlib, json, mmap, os, re, threading, time, zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from agent.runtime.envelope import decode_payload, payload_args
+from agent.runtime.paths import resolve
+
+TOOL_ALIASES = ["retrieval", "search", "retrieve"]
+
+DEBUG = os.getenv("AGENT_DEBUG") == "1"
+def _dbg(*a):
+    if DEBUG: print("[DEBUG retrieval]", *a)
+
+TRIGGERS = [
+    r"\[\[\s*(?:search|retrieve)\s*:\s*(?P<query>.+?)\s*\]\]",   # [[search: ...]]
+]
+
+DIM = int(os.getenv("AGENT_RETRIEVAL_DIM", "512"))
+CHUNK_TOKENS = int(os.getenv("AGENT_RETRIEVAL_CHUNK_TOKENS", "128"))
+RESCAN_S = float(os.getenv("AGENT_RETRIEVAL_RESCAN_S", "30"))  # daemon: re-check files this often
+TEXT_EXTS = {".md", ".txt", ".rst", ".py", ".json", ".yaml", ".yml", ".toml", ".cfg", ".ini",
+             ".html", ".csv", ".sh"}
+MANIFEST_VERSION = 1
+
+_TERM = re.compile(r"\w+")
+
+
+def _faiss():
+    try:
+        import faiss
+    except ImportError:
+        raise ValueError('retrieval needs faiss: pip install "faiss-cpu>=1.8"') from None
+    return faiss
+
+
+# -----------------------------
+# Embedding: signed feature hashing of words and word bigrams
+# -----------------------------
+def embed(texts: Sequence[str], dim: int = DIM) -> np.ndarray:
+    """(len(texts), dim) float32, L2-normalized, so inner product is cosine similarity."""
+    out = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        words = _TERM.findall(text.lower())
+        feats = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        if not feats:
+            continue
+        h = np.fromiter(map(zlib.crc32, map(str.encode, feats)), dtype=np.uint32, count=len(feats))
+        keys, tf = np.unique(h, return_counts=True)
+        sign = np.where(keys & 0x80000000, -1.0, 1.0).astype(np.float32)
+        np.add.at(out[row], keys % dim, sign * (1.0 + np.log(tf)))
+        norm = np.linalg.norm(out[row])
+        if norm:
+            out[row] /= norm
+    return out
+
+
+# -----------------------------
+# Store: index + manifest for one docs directory
+# -----------------------------
+def docs_dir() -> str:
+    return resolve(os.environ.get("AGENT_DOCS_DIR") or "docs")
+
+def _subdir(path: str) -> str:
+    """``path`` under docs_dir(); ValueError if it resolves anywhere else (.., /etc, symlinks)."""
+    base = os.path.realpath(docs_dir())
+    root = os.path.realpath(os.path.join(base, path))
+    if os.path.commonpath([base, root]) != base:
+        raise ValueError(f"retrieval: dir {path!r} is outside the docs dir")
+    return root
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _passages(path: str) -> List[Tuple[int, int, int, str]]:
+    """(start byte, end byte, first line, text) for each passage of ``path``."""
+    from agent.runtime.context import tokenizer_name
+    from agent.runtime.ctx_index import line_chunks
+    with open(path, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            return []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            out, line = [], 1
+            for start, end, _, text in line_chunks(mm, tokenizer_name(), CHUNK_TOKENS):
+                out.append((start, end, line, text))
+                line += text.count("\n")
+            return out
+
+
+class Store:
+    def __init__(self, root: str, dim: int = DIM, cache: Optional[str] = None):
+        from agent.runtime.paths import cache_dir
+        root = self.root = os.path.abspath(root)
+        self.dim = dim
+        tag = hashlib.sha1(f"{root}|{dim}|{CHUNK_TOKENS}".encode("utf-8")).hexdigest()[:12]
+        self.dir = cache or os.path.join(cache_dir(), f"retrieval-{tag}")
+        self.index = None
+        self.files: Dict[str, Dict[str, Any]] = {}
+        self.where: Dict[int, Tuple[str, int, int, int]] = {}  # id -> (relpath, start, end, line)
+        self.next_id = 0
+        self.checked = 0.0
+        self.stats = {"added": 0, "removed": 0, "mmap": False}
+        self._lock = threading.RLock()  # faiss must not search while an update runs
+
+    @property
+    def index_path(self) -> str:
+        return os.path.join(self.dir, "index.faiss")
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.dir, "manifest.json")
+
+    def _scan(self) -> Dict[str, os.stat_result]:
+        found = {}
+        for base, dirs, names in os.walk(self.root):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            for name in names:
+                if os.path.splitext(name)[1].lower() in TEXT_EXTS:
+                    path = os.path.join(base, name)
+                    found[os.path.relpath(path, self.root)] = os.stat(path)
+        return found
+
+    def _load_manifest(self) -> None:
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != MANIFEST_VERSION or data.get("dim") != self.dim \
+                or not os.path.exists(self.index_path):
+            return
+        self.files, self.next_id = data["files"], data["next_id"]
+
+    def refresh(self) -> "Store":
+        """Bring the index in line with the files on disk (one stat() each if unchanged)."""
+        with self._lock:
+            faiss = _faiss()
+            first = self.index is None
+            if first:
+                self._load_manifest()
+            found = self._scan() if os.path.isdir(self.root) else {}
+            stale, fresh, touched = [], [], False
+            for rel in list(self.files):
+                if rel not in found:
+                    stale.append(rel)
+            for rel, st in found.items():
+                prev = self.files.get(rel)
+                if prev and (prev["mtime_ns"], prev["size"]) == (st.st_mtime_ns, st.st_size):
+                    continue
+                digest = _sha256(os.path.join(self.root, rel))
+                if prev and prev["sha256"] == digest:  # touched, not edited
+                    prev["mtime_ns"] = st.st_mtime_ns
+                    touched = True
+                    continue
+                if prev:
+                    stale.append(rel)
+                fresh.append((rel, st, digest))
+            dirty = bool(stale or fresh)
+            if first and not dirty and self.files:
+                self.index = faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP)
+                self.stats["mmap"] = True
+            elif first or dirty:
+                if self.index is None or self.stats["mmap"]:
+                    self.index = faiss.read_index(self.index_path) if self.files \
+                        else faiss.IndexIDMap2(faiss.IndexFlatIP(self.dim))
+                    self.stats["mmap"] = False
+                self._apply(stale, fresh)
+            if touched and not dirty:
+                self._save(index=False)
+            self.where = {pid: (rel, start, end, line)
+                          for rel, entry in self.files.items()
+                          for pid, start, end, line in entry["passages"]}
+            self.checked = time.monotonic()
+            return self
+
+    def _apply(self, stale: List[str], fresh: List[Tuple[str, os.stat_result, str]]) -> None:
+        gone = [p[0] for rel in stale for p in self.files.pop(rel)["passages"]]
+        if gone:
+            self.index.remove_ids(np.asarray(gone, dtype=np.int64))
+        texts, ids = [], []
+        for rel, st, digest in fresh:
+            passages = []
+            for start, end, line, text in _passages(os.path.join(self.root, rel)):
+                passages.append([self.next_id, start, end, line])
+                ids.append(self.next_id)
+                texts.append(text)
+                self.next_id += 1
+            self.files[rel] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": digest,
+                               "passages": passages}
+        for i in range(0, len(texts), 1024):
+            self.index.add_with_ids(embed(texts[i:i + 1024], self.dim),
+                                    np.asarray(ids[i:i + 1024], dtype=np.int64))
+        self.stats["added"] += len(ids)
+        self.stats["removed"] += len(gone)
+        _dbg("index update:", len(fresh), "files in,", len(stale), "out;",
+             self.index.ntotal, "passages")
+        self._save()
+
+    def _save(self, index: bool = True) -> None:
+        try:
+            os.makedirs(self.dir, exist_ok=True)
+            if index:
+                tmp = f"{self.index_path}.{os.getpid()}.tmp"
+                _faiss().write_index(self.index, tmp)
+                os.replace(tmp, self.index_path)
+            tmp = f"{self.manifest_path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"version": MANIFEST_VERSION, "root": self.root, "dim": self.dim,
+                           "next_id": self.next_id, "files": self.files}, f)
+            os.replace(tmp, self.manifest_path)
+        except OSError as e:  # read-only cache dir: keep serving from memory
+            _dbg("Cannot persist index", self.dir, "->", e)
+
+    def passage(self, pid: int) -> Optional[Tuple[str, int, str]]:
+        """(path, line, text) of passage ``pid``, or None if its file changed since it was indexed."""
+        rel, start, end, line = self.where[pid]
+        entry = self.files.get(rel)
+        try:
+            with open(os.path.join(self.root, rel), "rb") as f:
+                st = os.fstat(f.fileno())
+                if entry is None or (st.st_mtime_ns, st.st_size) != (entry["mtime_ns"], entry["size"]):
+                    return None  # the offsets point into the old contents
+                f.seek(start)
+                return rel, line, f.read(end - start).decode("utf-8", errors="replace")
+        except OSError:
+            return None
+
+    def search(self, queries: Sequence[str], k: int = 3) -> List[List[Dict[str, Any]]]:
+        """
+        Top-k passages per query, best first, from one batched index search.
+        A hit in a file edited since the last refresh triggers a refresh and
+        one more search, so no passage is read at stale offsets.
+        """
+        vectors = embed(queries, self.dim)
+        for attempt in range(2):
+            with self._lock:
+                if attempt or time.monotonic() - self.checked > RESCAN_S:
+                    self.refresh()
+                if not queries or not self.index.ntotal:
+                    return [[] for _ in queries]
+                scores, ids = self.index.search(vectors, min(max(1, k), self.index.ntotal))
+                results, stale = [], False
+                for row_scores, row_ids in zip(scores, ids):
+                    hits = []
+                    for score, pid in zip(row_scores, row_ids):
+                        found = self.passage(int(pid)) if pid >= 0 and score > 0 else None
+                        if found is None:
+                            stale |= pid >= 0 and score > 0
+                            continue
+                        rel, line, text = found
+                        hits.append({"path": rel, "line": line, "score": round(float(score), 4),
+                                     "text": text})
+                    results.append(hits)
+            if not stale:
+                break
+        return results
+
+
+_STORES: Dict[str, Store] = {}
+_LOCK = threading.Lock()
+
+def get_store(root: Optional[str] = None) -> Store:
+    """The refreshed store for ``root`` (default docs_dir()), loaded once per process."""
+    root = os.path.abspath(root or docs_dir())
+    store = _STORES.get(root)
+    if store is None:
+        with _LOCK:
+            store = _STORES.get(root)
+            if store is None:
+                store = _STORES[root] = Store(root).refresh()
+    return store
+
+
+# -----------------------------
+# Tool entry points
+# -----------------------------
+def _snippet(text: str, width: int = 160) -> str:
+    flat = " ".join(text.split())
+    return flat if len(flat) <= width else flat[:width - 3] + "..."
+
+def _format(hits: List[Dict[str, Any]]) -> str:
+    if not hits:
+        return "no matches"
+    return "\n".join(f"{h['path']}:{h['line']} ({h['score']:.2f}) {_snippet(h['text'])}"
+                     for h in hits)
+
+def retrieve(query: str, k: int = 3, root: Optional[str] = None) -> str:
+    return _format(get_store(root).search([query], k)[0])
+
+def execute(text: Any) -> str:
+    j = decode_payload(text)
+    if j and j.get("tool") in TOOL_ALIASES:
+        args = payload_args(j)
+        k = int(args.get("k", 3))
+        root = _subdir(str(args["dir"])) if args.get("dir") else None
+        if isinstance(args.get("queries"), list):
+            queries = [str(q) for q in args["queries"]]
+            return json.dumps([{"query": q, "hits": hits}
+                               for q, hits in zip(queries, get_store(root).search(queries, k))],
+                              ensure_ascii=False)
+        query = args.get("query")
+        if not query:
+            raise ValueError("retrieval: missing 'query'")
+        return retrieve(str(query), k, root)
+    if isinstance(text, dict):
+        raise ValueError("No retrieval trigger matched")
+
+    s = text if isinstance(text, str) else str(text)
+    for pat in TRIGGERS:
+        m = re.search(pat, s, re.IGNORECASE)
+        if m:
+            return retrieve(m.group("query"))
+
+    raise ValueError("No retrieval trigger matched")
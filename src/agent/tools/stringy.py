@@ -1,6 +1,9 @@
 TOOL_ALIASES = ["string", "stringy"]
-import os, re, json
-from typing import Any, Dict, Optional
+TOOL_CACHE = "pure"
+import os, re
+from typing import Any
+
+from agent.runtime.envelope import decode_payload, payload_args
 
 DEBUG = os.getenv("AGENT_DEBUG") == "1"
 def _dbg(*a):
@@ -15,17 +18,6 @@ TRIGGERS = [
     r"^(?P<op>slug|upper|lower|title)\s*:\s*(?P<text>.+)$",
 ]
 
-def _maybe_parse_json(text: str) -> Optional[Dict[str, Any]]:
-    t = text.strip()
-    if not t:
-        return None
-    if t.startswith("{") and t.endswith("}"):
-        try:
-            return json.loads(t)
-        except Exception:
-            return None
-    return None
-
 def execute(text: Any) -> str:
     """
     Apply string operations:
@@ -37,17 +29,19 @@ def execute(text: Any) -> str:
       upper: hello
       {"tool":"stringy","args":{"op":"upper","text":"hello"}}
     """
-    if not isinstance(text, str):
-        text = str(text)
-    _dbg("raw text:", text)
-
     # Try JSON first
-    j = _maybe_parse_json(text)
-    if j and j.get("tool") == "stringy":
-        args = j.get("args", {})
+    j = decode_payload(text)
+    if j and j.get("tool") in TOOL_ALIASES:
+        args = payload_args(j)
         op, txt = args.get("op"), args.get("text")
         if op and txt:
             return _apply(op, txt)
+    if isinstance(text, dict):
+        raise ValueError("No stringy trigger matched")
+
+    if not isinstance(text, str):
+        text = str(text)
+    _dbg("raw text:", text)
 
     # Regex triggers
     for pat in TRIGGERS:
@@ -1,6 +1,8 @@
 TOOL_NAME = "uuid"
-import os, re, json, uuid
-from typing import Any, Dict, Optional
+import os, re, uuid
+from typing import Any
+
+from agent.runtime.envelope import decode_payload, payload_args
 
 DEBUG = os.getenv("AGENT_DEBUG") == "1"
 def _dbg(*a):
@@ -12,23 +14,18 @@ TRIGGERS = [
     r"^\s*uuid\s*$",          # uuid
 ]
 
-def _maybe_json(text: str) -> Optional[Dict[str, Any]]:
-    t = text.strip()
-    if t.startswith("{") and t.endswith("}"):
-        try: return json.loads(t)
-        except Exception as e: _dbg("JSON parse error:", e)
-    return None
-
 def execute(text: Any) -> str:
-    s = text if isinstance(text, str) else str(text)
-
     # JSON-style: {"tool":"uuid"} or {"tool":"uuid","args":{"v":"4"}}
-    j = _maybe_json(s)
+    j = decode_payload(text)
     if j and j.get("tool") in {"uuid"}:
-        v = str((j.get("args") or {}).get("v", "4")).strip()
+        v = str(payload_args(j).get("v", "4")).strip()
         if v not in {"", "4"}:
             raise ValueError("uuid: only v4 supported")
         return str(uuid.uuid4())
+    if isinstance(text, dict):
+        raise ValueError("No uuid trigger matched")
+
+    s = text if isinstance(text, str) else str(text)
 
     # Trigger-style
     for pat in TRIGGERS:
@@ -1,5 +1,9 @@
-import os, re, json, datetime
-from typing import Any, Dict, Optional
+import os, re, datetime
+from typing import Any
+
+from agent.runtime.envelope import decode_payload, payload_args
+
+TOOL_CACHE = "day"  # the (stub) report is fixed per city per day
 
 DEBUG = os.getenv("AGENT_DEBUG") == "1"
 def _dbg(*a):
@@ -10,29 +14,22 @@ TRIGGERS = [
     r"\bweather\s*:\s*(?P<city>.+)$",                 # weather: Toronto
 ]
 
-def _maybe_json(text: str) -> Optional[Dict[str, Any]]:
-    t = text.strip()
-    if t.startswith("{") and t.endswith("}"):
-        try:
-            return json.loads(t)
-        except Exception as e:
-            _dbg("JSON parse error:", e)
-    return None
-
 def _fake_report(city: str) -> str:
     day = datetime.datetime.now().strftime("%Y-%m-%d")
     return f"{day} | {city.strip()} | 22°C | Clear | wind 8 km/h"
 
 def execute(text: Any) -> str:
-    s = text if isinstance(text, str) else str(text)
-
     # JSON-style: {"tool":"weather","args":{"city":"Toronto"}}
-    j = _maybe_json(s)
+    j = decode_payload(text)
     if j and j.get("tool") in {"weather"}:
-        city = (j.get("args") or {}).get("city")
+        city = payload_args(j).get("city")
         if not city:
             raise ValueError("weather: missing 'city'")
         return _fake_report(city)
+    if isinstance(text, dict):
+        raise ValueError("No weather trigger matched")
+
+    s = text if isinstance(text, str) else str(text)
 
     # Trigger-style
     for pat in TRIGGERS:
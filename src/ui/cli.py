@@ -3,7 +3,7 @@ import os
 import sys
 import json
 
-def main():
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser()
     parser.add_argument("--use-tools", action="store_true", help="Enable tool routing")
     parser.add_argument("--quiet", action="store_true", help="Suppress debug output from tools")
@@ -11,93 +11,336 @@ def main():
                         help="Exit nonzero if no tool matches")
     parser.add_argument("--chain", type=int, default=1,
                         help="Max tool passes (chaining). Default 1")
+    parser.add_argument("--multi", action="store_true",
+                        help="Run every tool call in the message (concurrently) and splice each "
+                             "result in place; --json adds the per-call tools list")
     parser.add_argument("--llm", action="store_true", help="Use LLM for fallback if no tool matches")
     parser.add_argument("--llm-only", action="store_true", help="Bypass tools and query the LLM directly")
     parser.add_argument("--json", action="store_true", help="Emit JSON with {mode, tool, passes, text, usage}")
     parser.add_argument("--base", help="OpenAI-compatible base URL (e.g., http://127.0.0.1:8000/v1)")
     parser.add_argument("--model", help="Model name (e.g., Qwen/Qwen2.5-7B-Instruct)")
     parser.add_argument("--ctx-file", help="Path to a context file to prepend for LLM paths")
-    parser.add_argument("message")
-    args = parser.parse_args()
+    parser.add_argument("--ctx-window", type=int,
+                        help="Model context window in tokens; --ctx-file is cut to fit "
+                             "(default: $AGENT_CTX_WINDOW or 4096)")
+    parser.add_argument("--ctx-keep", choices=("head", "tail", "relevant"), default="head",
+                        help="What of an oversized --ctx-file to send: its head, its tail, or the "
+                             "chunks most relevant to the message (BM25). Default head")
+    parser.add_argument("--ctx-top-k", type=int, default=8,
+                        help="--ctx-keep relevant: at most this many chunks. Default 8")
+    parser.add_argument("--max-tokens", type=int, default=256,
+                        help="LLM reply budget in tokens. Default 256")
+    parser.add_argument("--cache", choices=("off", "rw", "ro"),
+                        help="On-disk LLM response cache (default: $AGENT_LLM_CACHE or off); "
+                             "hits set usage.cached in --json")
+    parser.add_argument("--stream", action="store_true",
+                        help="LLM paths: stream tokens over SSE as they arrive; --json adds "
+                             "timing {ttft_ms, itl_ms, total_ms}")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run the warm daemon on --socket instead of answering a message")
+    parser.add_argument("--client", action="store_true",
+                        help="Send the message to a running daemon (see --serve)")
+    parser.add_argument("--socket", help="Daemon Unix socket path (default: $AGENT_SOCKET or a per-user tmp path)")
+    parser.add_argument("--batch", nargs="?", const="-", metavar="FILE",
+                        help="Answer one message per line of FILE (default stdin) and stream JSONL results")
+    parser.add_argument("--workers", type=int, default=1, help="Batch worker pool size. Default 1 (inline)")
+    parser.add_argument("--pool", choices=("thread", "process"), default="thread",
+                        help="Batch worker pool kind. Default thread")
+    parser.add_argument("--unordered", action="store_true",
+                        help="Batch: emit results as they complete instead of in input order")
+    parser.add_argument("--profile", action="store_true",
+                        help="Report wall and CPU time per phase (imports, discover, decode, match, "
+                             "execute, context, llm) on stderr, or as a profile block with --json")
+    parser.add_argument("--profile-mem", action="store_true",
+                        help="--profile plus tracemalloc peaks per phase and the top live allocations")
+    parser.add_argument("--profile-out", metavar="PREFIX",
+                        help="--profile plus cProfile stats in PREFIX.pstats (and the tracemalloc "
+                             "snapshot in PREFIX.tracemalloc with --profile-mem)")
+    parser.add_argument("message", nargs="?")
+    return parser
 
-    # Apply quiet BEFORE importing router/llm so debug flags are respected
-    if args.quiet:
-        os.environ.pop("AGENT_DEBUG", None)
+def result(text: str, mode: str, tool: str | None, passes: int = 0, usage: dict | None = None,
+           rc: int = 0) -> dict:
+    return {
+        "mode": mode,           # "tools" or "llm" or "echo"
+        "tool": tool,           # e.g., "calculator" or None
+        "passes": passes,       # number of tool passes used
+        "text": text,           # final output string
+        "usage": usage or {},   # LLM token usage if available
+        "rc": rc,               # intended exit code
+    }
 
-    msg = args.message
+def _llm(args, msg: str, with_ctx: bool, on_token=None) -> dict:
+    from agent.runtime import metrics
+    from agent.runtime.llm_client import SYSTEM, chat, chat_stream
+    context = None
+    if with_ctx and args.ctx_file:
+        from agent.runtime.context import fit_prompt
+        try:
+            with metrics.timed("context"):
+                fitted = fit_prompt(msg, args.ctx_file, window=args.ctx_window,
+                                    max_tokens=args.max_tokens, system=SYSTEM, keep=args.ctx_keep,
+                                    top_k=args.ctx_top_k)
+            msg, context = fitted["prompt"], fitted["context"]
+        except (OSError, UnicodeDecodeError):
+            pass
+    kw = dict(max_tokens=args.max_tokens, base=args.base, model=args.model, cache=args.cache)
+    if args.stream:
+        with metrics.timed("llm"):
+            text, usage, timing = chat_stream(msg, on_token=on_token, **kw)
+        payload = result(text, mode="llm", tool=None, passes=0, usage=usage, rc=0)
+        payload["timing"] = timing
+    else:
+        with metrics.timed("llm"):
+            text, usage = chat(msg, **kw)
+        payload = result(text, mode="llm", tool=None, passes=0, usage=usage, rc=0)
+    if context is not None:
+        payload["context"] = context  # client-side token accounting for --ctx-file
+    return payload
 
-    def emit(payload_text: str, mode: str, tool: str | None, passes: int = 0, usage: dict | None = None, rc: int = 0):
-        if args.json:
-            print(json.dumps({
-                "mode": mode,           # "tools" or "llm" or "echo"
-                "tool": tool,           # e.g., "calculator" or None
-                "passes": passes,       # number of tool passes used
-                "text": payload_text,   # final output string
-                "usage": usage or {},   # LLM token usage if available
-                "rc": rc,               # intended exit code
-            }, ensure_ascii=False))
-        else:
-            print(payload_text)
-        sys.exit(rc)
+def respond(args, message: str | None = None, on_token=None) -> dict:
+    """
+    Answer one parsed request; pure apart from tool/LLM calls (no printing, no exit).
+    ``message`` overrides args.message (batch mode reuses one args per line);
+    ``on_token`` receives streamed LLM text as it arrives (with --stream).
+    """
+    msg = args.message if message is None else message
 
     # LLM-only path
     if args.llm_only:
-        import os
-        if args.base: os.environ["OPENAI_BASE"] = args.base
-        if args.model: os.environ["OPENAI_MODEL"] = args.model
-        from agent.runtime.llm_client import chat
-        if args.ctx_file:
-            try:
-                ctx = Path(args.ctx_file).read_text(encoding="utf-8")
-                msg = f"Context:\n{ctx}\n\nUser:\n{msg}"
-            except Exception:
-                pass
-        text, usage = chat(msg)
-        emit(text, mode="llm", tool=None, passes=0, usage=usage, rc=0)
+        return _llm(args, msg, with_ctx=True, on_token=on_token)
 
     # Tools path
     if args.use_tools:
-        from agent.runtime.router import run_with_tools
-        out, used_tool, used_count = run_with_tools(msg, max_chain=max(1, args.chain))
+        import time
+        from agent.runtime import metrics
+        from agent.runtime.router import run_spans_with_tools, run_with_tools
+        chain = {} if args.chain > 1 and not args.multi else None
+        tools = None
+        t0 = time.perf_counter()
+        with metrics.phases() as phases:
+            if args.multi:
+                out, tools, used_count = run_spans_with_tools(msg, max_chain=max(1, args.chain))
+                used_tool = ",".join(dict.fromkeys(tools)) or None
+            else:
+                out, used_tool, used_count = run_with_tools(msg, max_chain=max(1, args.chain),
+                                                            stats=chain)
+        # decode / match / execute time spent routing (execute sums concurrent --multi calls)
+        routing = {**phases.ms(), "total_ms": round((time.perf_counter() - t0) * 1e3, 3)}
 
         if used_tool:
-            emit(out, mode="tools", tool=used_tool, passes=used_count, rc=0)
+            payload = result(out, mode="tools", tool=used_tool, passes=used_count, rc=0)
+            if tools is not None:
+                payload["tools"] = tools
+            if chain is not None:
+                payload["chain"] = chain  # passes executed vs resolved by cycle detection
+            payload["routing"] = routing
+            return payload
 
         # No tool matched
         if args.tool_only and not args.llm:
-            if args.json:
-                print(json.dumps({"mode":"tools","tool":None,"passes":0,"text":"","usage":{},"rc":2}))
-            else:
-                print("No tool matched", file=sys.stderr)
-            sys.exit(2)
+            return result("", mode="tools", tool=None, passes=0, rc=2)
 
         if args.llm:
-            import os
-        if args.base: os.environ["OPENAI_BASE"] = args.base
-        if args.model: os.environ["OPENAI_MODEL"] = args.model
-        from agent.runtime.llm_client import chat
-            text, usage = chat(msg)
-            emit(text, mode="llm", tool=None, passes=0, usage=usage, rc=0)
+            return _llm(args, msg, with_ctx=False, on_token=on_token)
 
         # fallback echo
-        emit(out, mode="echo", tool=None, passes=0, rc=0)
+        return result(out, mode="echo", tool=None, passes=0, rc=0)
 
     # No tools requested
     if args.llm:
-        import os
-        if args.base: os.environ["OPENAI_BASE"] = args.base
-        if args.model: os.environ["OPENAI_MODEL"] = args.model
-        from agent.runtime.llm_client import chat
-        if args.ctx_file:
+        return _llm(args, msg, with_ctx=True, on_token=on_token)
+    return result(msg, mode="echo", tool=None, passes=0, rc=0)
+
+# -----------------------------
+# Batch mode
+# -----------------------------
+def _batch_items(lines):
+    """
+    Yield (index, id, message) per non-blank line. A JSON object with a string
+    "message" (optionally "id") or a JSON string is unwrapped; any other line,
+    tool payloads included, is the message verbatim.
+    """
+    index = 0
+    for line in lines:
+        line = line.rstrip("\r\n")
+        if not line.strip():
+            continue
+        msg, rid = line, None
+        if line[:1] in "{\"":
             try:
-                ctx = Path(args.ctx_file).read_text(encoding="utf-8")
-                msg = f"Context:\n{ctx}\n\nUser:\n{msg}"
-            except Exception:
-                pass
-        text, usage = chat(msg)
-        emit(text, mode="llm", tool=None, passes=0, usage=usage, rc=0)
+                obj = json.loads(line)
+            except ValueError:
+                obj = None
+            if isinstance(obj, str):
+                msg = obj
+            elif isinstance(obj, dict) and isinstance(obj.get("message"), str):
+                msg, rid = obj["message"], obj.get("id")
+        yield index, rid, msg
+        index += 1
+
+def _run_chunk(args, chunk) -> list:
+    out = []
+    for index, rid, msg in chunk:
+        try:
+            payload = respond(args, msg)
+        except Exception as e:
+            payload = result("", mode="error", tool=None, rc=1)
+            payload["error"] = f"{type(e).__name__}: {e}"
+        if rid is not None:
+            payload["id"] = rid
+        if args.unordered:
+            payload["index"] = index
+        out.append(payload)
+    return out
+
+def _chunks(items, size: int):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def run_batch(args, lines, out=sys.stdout) -> int:
+    """
+    Stream one JSON result per input line. Work is submitted through a bounded
+    window so arbitrarily long inputs never sit in memory all at once.
+    Returns 1 if any line raised, else 0 (per-line rc stays in each payload).
+    """
+    import itertools
+    from collections import deque
+    from concurrent import futures
+
+    failed = False
+    def write(payloads):
+        nonlocal failed
+        for payload in payloads:
+            failed |= "error" in payload
+            out.write(json.dumps(payload, ensure_ascii=False) + "\n")
+        out.flush()
+
+    items = _batch_items(lines)
+    workers = max(1, args.workers)
+    if workers == 1:
+        for chunk in _chunks(items, 1):
+            write(_run_chunk(args, chunk))
+        return int(failed)
+
+    # Processes pay pickling per task, so hand them runs of lines at a time.
+    size = 64 if args.pool == "process" else 1
+    pool_cls = futures.ProcessPoolExecutor if args.pool == "process" else futures.ThreadPoolExecutor
+    chunks = _chunks(items, size)
+    with pool_cls(max_workers=workers) as pool:
+        submit = lambda c: pool.submit(_run_chunk, args, c)
+        pending = deque(submit(c) for c in itertools.islice(chunks, workers * 4))
+        if args.unordered:
+            live = set(pending)
+            while live:
+                done, live = futures.wait(live, return_when=futures.FIRST_COMPLETED)
+                for fut in done:
+                    write(fut.result())
+                live |= {submit(c) for c in itertools.islice(chunks, len(done))}
+        else:
+            while pending:
+                write(pending.popleft().result())
+                pending.extend(submit(c) for c in itertools.islice(chunks, 1))
+    return int(failed)
+
+def emit(args, payload: dict) -> int:
+    """Print a respond() payload the way the CLI always has; returns the exit code."""
+    rc = payload.get("rc", 0)
+    if payload.get("error"):
+        print(payload["error"], file=sys.stderr)
+    elif args.json:
+        print(json.dumps(payload, ensure_ascii=False))
+    elif rc == 2 and payload.get("mode") == "tools" and payload.get("tool") is None:
+        print("No tool matched", file=sys.stderr)
     else:
-        emit(msg, mode="echo", tool=None, passes=0, rc=0)
+        print(payload["text"])
+    return rc
+
+def main(argv: list[str] | None = None):
+    parser = build_parser()
+    argv = sys.argv[1:] if argv is None else argv
+    args = parser.parse_args(argv)
+
+    if args.profile_mem or args.profile_out:
+        args.profile = True
+    if args.profile and (args.serve or args.client or args.batch is not None):
+        parser.error("--profile profiles one in-process request; drop --serve/--client/--batch")
+
+    if args.serve:
+        from .daemon import serve
+        serve(args.socket)
+        return
+
+    if args.batch is not None:
+        if args.message is not None or args.client:
+            parser.error("--batch reads messages from FILE/stdin; drop the message and --client")
+        if args.quiet:
+            os.environ.pop("AGENT_DEBUG", None)
+        if args.batch == "-":
+            sys.exit(run_batch(args, sys.stdin))
+        with open(args.batch, encoding="utf-8") as f:
+            sys.exit(run_batch(args, f))
+
+    if args.message is None:
+        parser.error("the following arguments are required: message")
+
+    if args.client:
+        from .daemon import DaemonUnavailable, request
+        try:
+            payload = request(argv, path=args.socket)
+        except DaemonUnavailable as e:
+            print(e, file=sys.stderr)
+            sys.exit(3)
+        sys.exit(emit(args, payload))
+
+    # Apply quiet BEFORE importing router/llm so debug flags are respected
+    if args.quiet:
+        os.environ.pop("AGENT_DEBUG", None)
+
+    on_token = None
+    if args.stream and not args.json:
+        def on_token(piece: str):
+            sys.stdout.write(piece)
+            sys.stdout.flush()
+
+    if args.profile:
+        payload, report = profiled(args, on_token)
+        if args.json:
+            payload["profile"] = report
+    else:
+        payload = respond(args, on_token=on_token)
+
+    if on_token is not None and "timing" in payload:  # the text already went out token by token
+        print()
+        rc = payload.get("rc", 0)
+    else:
+        rc = emit(args, payload)
+    if args.profile and not args.json:
+        from agent.runtime.profiler import format_report
+        print(format_report(report), file=sys.stderr)
+    sys.exit(rc)
+
+def profiled(args, on_token=None) -> tuple[dict, dict]:
+    """respond() under a Profile: (payload, report), with the lazy imports and tool discovery as phases."""
+    from agent.runtime.profiler import Profile
+    prof = Profile(memory=args.profile_mem, out=args.profile_out)
+    with prof:
+        with prof.phase("imports"):
+            if args.use_tools and not args.llm_only:
+                from agent.runtime import router
+            if args.llm or args.llm_only:
+                import agent.runtime.llm_client  # noqa: F401
+        if args.use_tools and not args.llm_only:
+            with prof.phase("discover"):
+                router.get_index()
+        payload = respond(args, on_token=on_token)
+    return payload, prof.report()
 
 if __name__ == "__main__":
     main()
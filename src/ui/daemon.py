@@ -0,0 +1,155 @@
+"""
+Warm CLI daemon: keeps the tool registry, trigger index and LLM HTTP session
+loaded so each request costs a Unix-socket round trip instead of a process start.
+
+    python -m src.ui.cli --serve                        # foreground daemon
+    python -m src.ui.cli --client --use-tools "2+2"     # same output as without --client
+
+Wire format: one JSON object per line each way. Requests are
+{"argv": [...], "cwd": "..."}; replies are the CLI's {mode, tool, passes,
+text, usage, rc} payload, or {"rc": n, "error": "..."}. {"stats": true}
+returns {"rc": 0, "tool_cache": {tool: {hits, misses, hit_rate, ...}},
+"tools": {tool: {attempts, hits, misses, exceptions, ...}}}. With
+AGENT_METRICS_PORT set, GET http://127.0.0.1:<port>/metrics serves the
+router metrics in Prometheus text format.
+
+Debug flags (AGENT_DEBUG) are read once when the daemon starts, so --quiet
+has no per-request effect in client mode.
+"""
+import json, os, socket, socketserver, sys, tempfile
+from typing import Any, Dict, List, Optional
+
+
+class DaemonUnavailable(RuntimeError):
+    pass
+
+
+def default_socket() -> str:
+    env = os.environ.get("AGENT_SOCKET")
+    if env:
+        return env
+    run_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(run_dir, f"agent-bench-{os.getuid()}.sock")
+
+
+def _answer(req: Dict[str, Any]) -> Dict[str, Any]:
+    from .cli import build_parser, respond
+    if req.get("stats"):
+        from agent.runtime import router
+        return {"rc": 0, "tool_cache": router.cache_stats(), "tools": router.metrics_snapshot()}
+    try:
+        args = build_parser().parse_args(req.get("argv") or [])
+    except SystemExit:
+        return {"rc": 2, "error": "invalid arguments"}
+    if args.message is None:
+        return {"rc": 2, "error": "the following arguments are required: message"}
+    if not req.get("cwd"):
+        return respond(args)
+    from agent.runtime import paths
+    if args.ctx_file:
+        args.ctx_file = os.path.join(req["cwd"], args.ctx_file)
+    token = paths.CWD.set(req["cwd"])  # tools resolve relative paths (docs dir, ...) from here
+    try:
+        return respond(args)
+    finally:
+        paths.CWD.reset(token)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # A client may keep the connection open and send several requests.
+        for line in self.rfile:
+            try:
+                reply = _answer(json.loads(line))
+            except Exception as e:
+                reply = {"rc": 1, "error": f"{type(e).__name__}: {e}"}
+            self.wfile.write(json.dumps(reply, ensure_ascii=False).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class _Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def warm() -> None:
+    """
+    Pay every one-time cost up front: tool discovery, the trigger index, the
+    python_repl worker pool (unless AGENT_PY_WORKERS=0), the default LLM
+    provider's pooled session (connected too if AGENT_LLM_PRECONNECT=1), and
+    the Prometheus endpoint if AGENT_METRICS_PORT is set.
+    """
+    from agent.llm.provider import get_provider
+    from agent.runtime import metrics, router, sandbox
+    router.get_index()
+    if sandbox.WORKERS > 0:
+        sandbox.get_pool()
+    if os.environ.get("AGENT_METRICS_PORT"):
+        metrics.serve_prometheus(int(os.environ["AGENT_METRICS_PORT"]))
+    provider = get_provider()
+    provider.session
+    if os.environ.get("AGENT_LLM_PRECONNECT") == "1":
+        provider.preconnect()
+
+
+def _is_live(path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        try:
+            s.connect(path)
+            return True
+        except OSError:
+            return False
+
+
+def make_server(path: str) -> socketserver.BaseServer:
+    if os.path.exists(path):
+        if _is_live(path):
+            raise SystemExit(f"daemon already listening on {path}")
+        os.unlink(path)  # stale socket from a killed daemon
+    warm()
+    server = _Server(path, _Handler)
+    os.chmod(path, 0o600)
+    return server
+
+
+def serve(path: Optional[str] = None) -> None:
+    path = path or default_socket()
+    server = make_server(path)
+    print(f"agent daemon listening on {path}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+
+def request(argv: List[str], path: Optional[str] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Send one CLI argv to the daemon and return its payload."""
+    return _send({"argv": list(argv), "cwd": os.getcwd()}, path, timeout)
+
+
+def stats(path: Optional[str] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """The daemon's per-tool result-cache and router counters."""
+    return _send({"stats": True}, path, timeout)
+
+
+def _send(req: Dict[str, Any], path: Optional[str], timeout: Optional[float]) -> Dict[str, Any]:
+    path = path or default_socket()
+    msg = json.dumps(req, ensure_ascii=False)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        try:
+            s.connect(path)
+        except OSError as e:
+            raise DaemonUnavailable(f"no daemon on {path} ({e.strerror or e}); "
+                                    "start one with: python -m src.ui.cli --serve") from None
+        s.sendall(msg.encode("utf-8") + b"\n")
+        with s.makefile("rb") as f:
+            line = f.readline()
+    if not line:
+        raise DaemonUnavailable(f"daemon on {path} closed the connection")
+    return json.loads(line)
@@ -0,0 +1,36 @@
+import pytest
+
+from agent.llm.stub_server import StubServer
+
+
+class _ReversingStub(StubServer):
+    """
+    The stub server replying with the prompt reversed, one character per
+    token, so client tests can assert exact text and usage. "boom" makes the
+    request fail (502). .bodies keeps every request body.
+    """
+
+    def __init__(self):
+        super().__init__(ttft=0.05, tok_per_s=100)
+        self.bodies = []
+
+    def reply_for(self, body):
+        with self.lock:
+            self.bodies.append(body)
+        return super().reply_for(body)
+
+    def synthetic(self, body):
+        prompt = str(body["messages"][-1]["content"])
+        if prompt == "boom":
+            raise RuntimeError("boom")
+        gap = 1.0 / self.tok_per_s
+        chunks = [[self.ttft + i * gap, ch] for i, ch in enumerate(prompt[::-1])]
+        return {"chunks": chunks, "done": chunks[-1][0] if chunks else self.ttft,
+                "usage": {"completion_tokens": len(prompt)}}
+
+
+@pytest.fixture
+def fake_llm():
+    """A local chat-completions server; .base is its /v1 URL, .peak the max requests in flight."""
+    with _ReversingStub() as server:
+        yield server
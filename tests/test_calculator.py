@@ -16,3 +16,92 @@ def test_trigger():
 def test_dict_json():
     assert execute({"expression": "23*17+88"}) == "479"
     assert execute('{"tool":"calculator","args":{"expression":"23*17+88"}}') == "479"
+
+
+def test_eval_cache_hits_and_errors():
+    import pytest
+    from agent.tools import calculator
+
+    calculator.cache_clear()
+    assert execute("[[calc: 12*12]]") == "144"
+    assert execute("calc(12 * 12)") == "144"  # different spacing → separate key
+    info = calculator.cache_info()
+    assert info["misses"] == 2 and info["size"] == 2
+    assert execute("[[calc: 12*12]]") == "144"
+    assert calculator.cache_info()["hits"] == 1
+
+    for _ in range(2):  # negative results are cached too, same message
+        with pytest.raises(ValueError, match="division by zero"):
+            calculator.evaluate("1/0")
+    assert calculator.cache_info()["hits"] == 2
+
+
+def test_eval_cache_bounded():
+    from agent.tools import calculator
+
+    calculator.cache_clear()
+    calculator.set_cache_size(2)
+    try:
+        for e in ("1+1", "2+2", "3+3"):
+            calculator.evaluate(e)
+        assert calculator.cache_info()["size"] == 2
+    finally:
+        calculator.set_cache_size(1024)
+
+
+def test_extract_linear_on_blank_runs():
+    import time
+    import pytest
+    from agent.tools.calculator import extract_expr
+
+    # Each of these took seconds with the old backtracking regexes.
+    t0 = time.perf_counter()
+    assert extract_expr("x" + " " * 50_000 + "x") is None
+    assert extract_expr("calc(1" + " " * 50_000 + "x") == "(1"
+    assert extract_expr("[[calc: " + " " * 50_000 + "x") is None
+    assert time.perf_counter() - t0 < 1.0
+
+    assert extract_expr("calc( 2 ^ 3 )") == "2 ** 3"
+    assert extract_expr("then 1 + 2, or 10 * 20 *") == "10 * 20"
+    with pytest.raises(ValueError, match="too long"):
+        extract_expr("1+" * 400 + "1")
+    # an over-long span elsewhere does not hide a valid one
+    assert extract_expr("1+" * 400 + "1 is long; meanwhile 6 * 7") == "6 * 7"
+
+
+def test_evaluate_many_template_and_rows():
+    import pytest
+
+    np = pytest.importorskip("numpy")
+    from agent.tools.calculator import evaluate_many
+
+    b = evaluate_many("10/x + x^2", {"x": np.array([0, 1, 2, 1e13])})
+    assert b.values[1:3].tolist() == [11.0, 9.0]
+    assert b.errors.tolist() == ["division by zero", None, None, "expression too large"]
+    assert np.isnan(b.values[[0, 3]]).all()
+
+    rows = evaluate_many(["a*2", "1/0", "a/b", "oops(", "a*2"], {"a": np.arange(5), "b": 0})
+    assert rows.values[[0, 4]].tolist() == [0.0, 8.0]
+    assert rows.errors.tolist() == [None, "division by zero", "division by zero",
+                                    "invalid syntax", None]
+    with pytest.raises(ValueError, match="one value per expression"):
+        evaluate_many(["a", "a"], {"a": np.arange(3)})
+
+
+def test_evaluator_is_iterative():
+    import ast
+
+    import pytest
+    from agent.tools import calculator
+
+    # Far deeper than the recursion limit; the postfix program runs in a loop.
+    node = ast.Constant(2)
+    for _ in range(5000):
+        node = ast.UnaryOp(ast.USub(), node)
+    assert calculator._safe_eval(node) == 2
+    assert calculator.evaluate("-" * 501 + "(2**3)") == -8
+    assert calculator.evaluate("-2**2 + 2**-1 * 4") == -2
+    for expr, err in [("1/0 + x", "division by zero"), ("(1/0) % 2", "operator not allowed"),
+                      ("2**(1e3)", "expression too large")]:
+        with pytest.raises(ValueError, match=err):
+            calculator.evaluate(expr)
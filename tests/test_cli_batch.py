@@ -0,0 +1,27 @@
+import subprocess, sys, json
+
+LINES = "\n".join([
+    "23*17+88",
+    '{"tool":"echo","args":{"text":"hi"}}',
+    "",
+    '{"message":"[[upper: x]]","id":"a7"}',
+    "just chatting",
+]) + "\n"
+
+def run_batch(*flags):
+    p = subprocess.run([sys.executable, "-m", "src.ui.cli", "--batch", "--use-tools", *flags],
+                       input=LINES, capture_output=True, text=True)
+    return p.returncode, [json.loads(l) for l in p.stdout.splitlines()], p.stderr
+
+def test_batch_ordered_stdin():
+    code, rows, err = run_batch()
+    assert code == 0 and err == ""
+    assert [r["text"] for r in rows] == ["479", "hi", "X", "just chatting"]
+    assert rows[2]["id"] == "a7" and rows[3]["mode"] == "echo"
+
+def test_batch_unordered_process_pool():
+    code, rows, err = run_batch("--tool-only", "--workers", "2", "--pool", "process", "--unordered")
+    assert code == 0 and err == ""
+    by_index = {r["index"]: r for r in rows}
+    assert sorted(by_index) == [0, 1, 2, 3]
+    assert by_index[0]["tool"] == "calculator" and by_index[3]["rc"] == 2
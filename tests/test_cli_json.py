@@ -16,3 +16,11 @@ def test_json_tool_only_no_match():
     assert code == 2
     data = json.loads(out)
     assert data["mode"] == "tools" and data["tool"] is None and data["rc"] == 2
+
+def test_json_multi_splices_every_call():
+    msg = "[[calc: 23*17]] and [[nope]] then [[upper: done]]"
+    code, out, err = run(f'{PY_EXE} -m src.ui.cli --use-tools --multi --json {shlex.quote(msg)}')
+    assert code == 0 and err == ""
+    data = json.loads(out)
+    assert data["text"] == "391 and [[nope]] then DONE"
+    assert data["tool"] == "calculator,stringy" and data["tools"] == ["calculator", "stringy"]
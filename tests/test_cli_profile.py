@@ -0,0 +1,48 @@
+import json, pstats, shlex, subprocess, sys, tracemalloc
+
+from src.ui import cli
+PY_EXE = shlex.quote(sys.executable)
+
+
+def run(cmd):
+    p = subprocess.run(cmd, shell=True, capture_output=True, text=True)
+    return p.returncode, p.stdout.strip(), p.stderr.strip()
+
+
+def test_profile_json_phases_and_files(tmp_path):
+    prefix = shlex.quote(str(tmp_path / "run"))
+    code, out, err = run(f'{PY_EXE} -m src.ui.cli --use-tools --json --profile-mem '
+                         f'--profile-out {prefix} "[[calc: 6*7]]"')
+    assert code == 0 and err == ""
+    data = json.loads(out)
+    assert data["text"] == "42"
+    prof = data["profile"]
+    assert {"imports", "discover", "decode", "match", "execute", "other"} <= set(prof["phases"])
+    assert all(set(p) == {"wall_ms", "cpu_ms"} for p in prof["phases"].values())
+    assert prof["total"]["wall_ms"] >= prof["phases"]["imports"]["wall_ms"]
+    assert prof["memory"]["peak_kb"] > 0 and prof["memory"]["top_live"]
+    assert prof["files"] == [str(tmp_path / "run.pstats"), str(tmp_path / "run.tracemalloc")]
+    assert pstats.Stats(prof["files"][0]).total_calls > 0
+    assert tracemalloc.Snapshot.load(prof["files"][1]).traces
+
+
+def test_profile_breakdown_goes_to_stderr():
+    code, out, err = run(f'{PY_EXE} -m src.ui.cli --use-tools --profile "2+2"')
+    assert code == 0 and out == "4"
+    assert err.startswith("profile: ") and "execute" in err and "discover" in err
+
+
+def test_profile_times_the_llm_call(fake_llm, monkeypatch, capsys):
+    monkeypatch.setenv("AGENT_LLM_CACHE", "off")
+    try:
+        cli.main(["--llm-only", "--json", "--profile", "--base", fake_llm.base, "hi"])
+    except SystemExit as e:
+        assert e.code == 0
+    prof = json.loads(capsys.readouterr().out)["profile"]
+    assert "discover" not in prof["phases"]
+    assert prof["phases"]["llm"]["wall_ms"] >= 50  # the fake server's delay
+
+
+def test_profile_rejects_other_modes():
+    code, out, err = run(f'{PY_EXE} -m src.ui.cli --profile --client "2+2"')
+    assert code == 2 and "--profile" in err
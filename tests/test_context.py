@@ -0,0 +1,65 @@
+import json, os, subprocess, sys
+
+from agent.llm.stub_server import StubServer
+from agent.runtime import context
+
+
+def _corpus(tmp_path, lines=2000):
+    path = tmp_path / "ctx.md"
+    path.write_text("".join(f"line {i}: routing notes about the calculator tool.\n"
+                            for i in range(lines)), encoding="utf-8")
+    return str(path)
+
+
+def test_fit_prompt_cuts_to_the_window(tmp_path, monkeypatch):
+    monkeypatch.setenv("AGENT_CACHE_DIR", str(tmp_path / "cache"))
+    path = _corpus(tmp_path)
+    info = context.fit_prompt("why?", path, window=1024, max_tokens=128)
+    c = info["context"]
+    assert c["truncated"] and c["sent_tokens"] <= c["budget"] < c["file_tokens"]
+    assert c["prompt_tokens"] + c["max_tokens"] <= c["window"]
+    assert context.count_tokens(info["prompt"], c["tokenizer"]) <= c["prompt_tokens"]
+    assert info["prompt"].startswith("Context:\nline 0:") and info["prompt"].endswith("User:\nwhy?")
+
+    tail = context.fit_prompt("why?", path, window=1024, max_tokens=128, keep="tail")["prompt"]
+    assert "line 1999:" in tail and "line 0:" not in tail
+
+    small = context.fit_prompt("why?", path, window=10**6)["context"]
+    assert not small["truncated"] and small["sent_tokens"] == small["file_tokens"]
+
+
+def test_cut_line_never_exceeds_the_budget(tmp_path, monkeypatch):
+    monkeypatch.setenv("AGENT_CACHE_DIR", str(tmp_path / "cache"))
+    path = tmp_path / "one.md"
+    # token-dense start, sparse end: a proportional cut overshoots from the head
+    path.write_text("+" * 200 + "a" * 4000 + "\n", encoding="utf-8")
+    ctx = context.load_context(str(path))
+    for keep in ("head", "tail"):
+        text, used = context.truncate(ctx, 100, keep)
+        assert used == context.count_tokens(text, ctx.tokenizer) <= 100
+        assert used >= 95  # and still fills the budget
+
+
+def test_token_table_is_cached_by_content_hash(tmp_path, monkeypatch):
+    monkeypatch.setenv("AGENT_CACHE_DIR", str(tmp_path / "cache"))
+    path = _corpus(tmp_path, 50)
+    first = context.load_context(path)
+    table = context._table_path(first.sha256, first.tokenizer)
+    assert os.path.exists(table)
+    context._FILES.clear()
+    mtime = os.stat(table).st_mtime_ns
+    again = context.load_context(path)
+    assert again.tokens == first.tokens and os.stat(table).st_mtime_ns == mtime
+
+
+def test_cli_reports_context_tokens(tmp_path):
+    path = _corpus(tmp_path)
+    env = {**os.environ, "AGENT_CACHE_DIR": str(tmp_path / "cache")}
+    with StubServer(ttft=0, tok_per_s=0) as stub:
+        p = subprocess.run([sys.executable, "-m", "src.ui.cli", "--llm-only", "--json",
+                            "--base", stub.base, "--ctx-file", path, "--ctx-window", "512",
+                            "--max-tokens", "32", "hello"], capture_output=True, text=True, env=env)
+    payload = json.loads(p.stdout)
+    assert payload["usage"]["completion_tokens"] == 32
+    c = payload["context"]
+    assert c["truncated"] and c["window"] == 512 and c["prompt_tokens"] + 32 <= 512
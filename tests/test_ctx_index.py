@@ -0,0 +1,95 @@
+import json, os, subprocess, sys
+
+from agent.llm.stub_server import StubServer
+from agent.runtime import ctx_index
+
+
+def _corpus(tmp_path, needle_at=700):
+    lines = [f"note {i}: filler about tools, clocks and string helpers.\n" for i in range(1000)]
+    lines[needle_at] = "The daemon socket defaults to XDG_RUNTIME_DIR.\n"
+    path = tmp_path / "corpus.md"
+    path.write_text("".join(lines), encoding="utf-8")
+    return str(path)
+
+
+def test_bm25_picks_the_relevant_chunk(tmp_path, monkeypatch):
+    monkeypatch.setenv("AGENT_CACHE_DIR", str(tmp_path / "cache"))
+    path = _corpus(tmp_path)
+    index = ctx_index.get_index(path, chunk_tokens=64)
+    assert index.n > 50
+    (best, score), *_ = index.search("where does the daemon socket live?", k=3)
+    assert "XDG_RUNTIME_DIR" in index.chunk(best) and score > 0
+    assert index.search("zebra unicorn") == []
+
+    text, used, ids = index.select("daemon socket", budget=1000, k=4)
+    assert "XDG_RUNTIME_DIR" in text and used <= 1000 and ids == sorted(ids) and len(ids) <= 4
+    text, used, ids = index.select("daemon socket", budget=3)  # no chunk fits: the best one's head
+    assert text and used <= 3 and len(ids) == 1
+
+
+def test_select_counts_gaps_and_falls_back(tmp_path, monkeypatch):
+    monkeypatch.setenv("AGENT_CACHE_DIR", str(tmp_path / "cache"))
+    path = tmp_path / "spread.md"
+    path.write_text("".join("apple pie recipe\n" if i % 40 == 0 else f"filler line {i}\n"
+                            for i in range(400)), encoding="utf-8")
+    index = ctx_index.get_index(str(path), chunk_tokens=32)
+    text, used, ids = index.select("apple", budget=10 ** 6, k=6)
+    assert len(ids) == 6 and text.count(ctx_index.GAP) == 5
+    assert used == ctx_index.count_tokens(text, index.tokenizer)
+    for budget in range(used - 20, used):  # gaps count against the budget too
+        text, n, _ = index.select("apple", budget=budget, k=6)
+        assert n <= budget and n == ctx_index.count_tokens(text, index.tokenizer)
+
+    text, used, ids = index.select("zebra", budget=50)  # no term matches: the head instead
+    assert ids == [] and text.startswith("apple pie recipe\nfiller line 1\n") and 0 < used <= 50
+
+
+def test_long_lines_are_split_into_chunks(tmp_path, monkeypatch):
+    monkeypatch.setenv("AGENT_CACHE_DIR", str(tmp_path / "cache"))
+    path = tmp_path / "one-line.md"
+    body = " ".join(f"wörd{i}" for i in range(3000)) + " needle here " + " ".join(f"w{i}" for i in range(2000))
+    path.write_text(body, encoding="utf-8")
+    index = ctx_index.get_index(str(path), chunk_tokens=64)
+    assert index.n > 1 and max(index.chunk_tokens) <= 64
+    assert "".join(index.chunk(i) for i in range(index.n)) == body
+    text, used, ids = index.select("needle", budget=200)
+    assert "needle" in text and 0 < used <= 200 and len(ids) == 1
+
+
+def test_best_chunk_is_cut_rather_than_dropped(tmp_path, monkeypatch):
+    monkeypatch.setenv("AGENT_CACHE_DIR", str(tmp_path / "cache"))
+    path = tmp_path / "mixed.md"
+    path.write_text("a needle\n" + "needle " * 40 + "\n", encoding="utf-8")
+    index = ctx_index.get_index(str(path), chunk_tokens=64)
+    (best, _), *_ = index.search("needle")
+    text, used, ids = index.select("needle", budget=20)
+    assert ids == [best] and index.chunk(best).startswith(text) and 0 < used <= 20
+
+
+def test_index_is_cached_by_content(tmp_path, monkeypatch):
+    monkeypatch.setenv("AGENT_CACHE_DIR", str(tmp_path / "cache"))
+    path = _corpus(tmp_path)
+    first = ctx_index.get_index(path, chunk_tokens=64)
+    ctx_index._INDEXES.clear()
+    built = os.listdir(tmp_path / "cache" / "ctx")
+    again = ctx_index.get_index(path, chunk_tokens=64)
+    assert os.listdir(tmp_path / "cache" / "ctx") == built and again.n == first.n
+
+    _corpus(tmp_path, needle_at=0)  # new content, new index
+    moved = ctx_index.get_index(path, chunk_tokens=64)
+    assert list(ctx_index._INDEXES.values()) == [moved] and again._file.closed
+    (best, _), *_ = moved.search("daemon socket")
+    assert best == 0
+
+
+def test_cli_sends_only_relevant_chunks(tmp_path):
+    path = _corpus(tmp_path)
+    env = {**os.environ, "AGENT_CACHE_DIR": str(tmp_path / "cache"), "AGENT_CTX_CHUNK_TOKENS": "64"}
+    with StubServer(ttft=0, tok_per_s=0) as stub:
+        p = subprocess.run([sys.executable, "-m", "src.ui.cli", "--llm-only", "--json",
+                            "--base", stub.base, "--ctx-file", path, "--ctx-keep", "relevant",
+                            "--ctx-top-k", "2", "--max-tokens", "8", "which daemon socket?"],
+                           capture_output=True, text=True, env=env)
+    c = json.loads(p.stdout)["context"]
+    assert c["keep"] == "relevant" and 1 <= len(c["chunks"]) <= 2 < c["chunks_total"]
+    assert c["sent_tokens"] < c["file_tokens"] and c["truncated"]
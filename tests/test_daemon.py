@@ -0,0 +1,34 @@
+import os, threading
+
+from src.ui import daemon
+
+
+def test_client_round_trip(tmp_path):
+    path = str(tmp_path / "agent.sock")
+    server = daemon.make_server(path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        got = daemon.request(["--use-tools", "--json", "[[calc: 6*7]]"], path=path, timeout=5)
+        assert set(got.pop("routing")) >= {"decode_ms", "match_ms", "execute_ms", "total_ms"}
+        assert got == {"mode": "tools", "tool": "calculator", "passes": 1, "text": "42",
+                       "usage": {}, "rc": 0}
+        miss = daemon.request(["--use-tools", "--tool-only", "just chatting"], path=path, timeout=5)
+        assert miss["rc"] == 2 and miss["tool"] is None
+        again = daemon.request(["--use-tools", "--json", "[[calc: 6*7]]"], path=path, timeout=5)
+        assert again["text"] == "42"
+        calc = daemon.stats(path=path, timeout=5)["tool_cache"]["calculator"]
+        assert calc["hits"] >= 1 and calc["entries"] >= 1
+        assert daemon.stats(path=path, timeout=5)["tools"]["calculator"]["hits"] >= 1
+    finally:
+        server.shutdown()
+        server.server_close()
+        os.unlink(path)
+
+
+def test_client_without_daemon(tmp_path):
+    try:
+        daemon.request(["x"], path=str(tmp_path / "missing.sock"))
+    except daemon.DaemonUnavailable as e:
+        assert "--serve" in str(e)
+    else:
+        raise AssertionError("expected DaemonUnavailable")
@@ -0,0 +1,25 @@
+from agent.runtime import router
+from agent.runtime.envelope import parse_envelope
+
+
+def test_parse_json_envelope():
+    env = parse_envelope('{"tool":"stringy","args":{"op":"upper","text":"hi"}}')
+    assert env.tool == "stringy" and env.args == {"op": "upper", "text": "hi"}
+    assert env.payload["tool"] == "stringy"
+
+
+def test_parse_plain_text_and_dict_literal():
+    assert parse_envelope("just chatting").payload is None
+    assert parse_envelope("{'tool': 'echo', 'args': {'text': 'x'}}").args == {"text": "x"}
+
+
+def test_router_hands_decoded_payload_to_named_tool(monkeypatch):
+    tool = router.get_tools()["weather"]
+    seen = []
+    monkeypatch.setattr(tool, "execute", lambda p: seen.append(p) or "ok")
+    assert router.run_once_with_tools('{"tool":"weather","args":{"city":"Oslo"}}') == ("ok", "weather")
+    assert seen == [{"tool": "weather", "args": {"city": "Oslo"}}]
+
+
+def test_alias_routes_to_tool():
+    assert router.run_once_with_tools('{"tool":"string","args":{"op":"upper","text":"x"}}') == ("X", "stringy")
@@ -0,0 +1,27 @@
+import time
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from agent.runtime import llm_client  # noqa: E402
+
+
+def test_chat_many_ordered_and_bounded(fake_llm):
+    prompts = [f"p{i}" for i in range(20)]
+    t0 = time.perf_counter()
+    got = llm_client.chat_many(prompts, concurrency=5, base=fake_llm.base)
+    assert [text for text, _ in got] == [p[::-1] for p in prompts]
+    assert got[3][1] == {"completion_tokens": 2}
+    assert 1 < fake_llm.peak <= 5
+    # overlapped: serial would take at least 20 TTFTs, five at a time about a quarter of that
+    assert time.perf_counter() - t0 < 20 * fake_llm.ttft
+
+
+def test_chat_many_errors(fake_llm):
+    got = llm_client.chat_many(["a", "boom", "c"], concurrency=2, base=fake_llm.base,
+                               return_exceptions=True)
+    assert got[0][0] == "a" and got[2][0] == "c"
+    assert isinstance(got[1], Exception)
+    with pytest.raises(Exception, match="502"):
+        llm_client.chat_many(["a", "boom", "c"], concurrency=2, base=fake_llm.base)
@@ -0,0 +1,77 @@
+import json, os, subprocess, sys, time
+
+from agent.llm.cache import ResponseCache, get_cache
+from agent.runtime import llm_client
+
+
+def test_chat_serves_repeats_from_the_cache(fake_llm, tmp_path, monkeypatch):
+    monkeypatch.setenv("AGENT_LLM_CACHE_PATH", str(tmp_path / "llm.sqlite3"))
+    kw = dict(base=fake_llm.base, model="m-cache", temperature=0, seed=1, cache="rw")
+    assert llm_client.chat("abc", **kw) == ("cba", {"completion_tokens": 3, "cached": False})
+    assert llm_client.chat("abc", **kw) == ("cba", {"completion_tokens": 3, "cached": True})
+    assert len(fake_llm.bodies) == 1 and fake_llm.bodies[0]["seed"] == 1
+    llm_client.chat("abc", **{**kw, "seed": 2})  # different request, different key
+    assert len(fake_llm.bodies) == 2
+
+    # Read-only: hits are served, misses go to the server and are never stored.
+    assert llm_client.chat("abc", **{**kw, "cache": "ro"})[1]["cached"] is True
+    assert llm_client.chat("new", **{**kw, "cache": "ro"})[1]["cached"] is False
+    assert llm_client.chat("new", **{**kw, "cache": "ro"})[1]["cached"] is False
+    assert get_cache("rw").stats()["entries"] == 2
+    assert "cached" not in llm_client.chat("abc", **{**kw, "cache": "off"})[1]
+
+
+def test_cache_ttl_and_size_eviction(tmp_path):
+    ro = ResponseCache(str(tmp_path / "missing.sqlite3"), read_only=True)
+    assert ro.get("k") is None and not os.path.exists(ro.path)
+
+    c = ResponseCache(str(tmp_path / "c.sqlite3"), max_bytes=500, ttl=0.2)
+    for i in range(4):
+        c.put(f"k{i}", "x" * 100, {"i": i})
+    assert c.get("k0") == ("x" * 100, {"i": 0})
+    c.put("k4", "x" * 100, {"i": 4})  # over budget: least recently used (k1) goes first
+    assert c.get("k1") is None and c.get("k0") is not None and c.evictions == 1
+    time.sleep(0.25)
+    assert c.get("k4") is None and c.stats()["entries"] < 5
+
+
+def test_running_size_total_matches_the_rows(tmp_path):
+    import sqlite3
+    path = str(tmp_path / "c.sqlite3")
+    with sqlite3.connect(path) as db:  # a file from before the meta table
+        db.executescript("CREATE TABLE responses (key TEXT PRIMARY KEY, text TEXT NOT NULL, "
+                         "usage TEXT NOT NULL, size INTEGER NOT NULL, created REAL NOT NULL, "
+                         "accessed REAL NOT NULL);"
+                         "INSERT INTO responses VALUES ('old', 'x', '{}', 40, 0, 0);")
+    c = ResponseCache(path, max_bytes=600, ttl=0.2)
+    c.put("k0", "x" * 100, {})
+    c.put("k0", "y" * 150, {})  # replaced, not added twice
+    for i in range(1, 6):
+        c.put(f"k{i}", "x" * 100, {})
+    c.get("k1")
+    db = c._db()
+    total = lambda: db.execute("SELECT bytes FROM meta").fetchone()[0]
+    assert c.evictions > 0 and total() == c.stats()["bytes"] <= 600
+    time.sleep(0.25)
+    c.get("k5")  # expired: deleted on read
+    assert total() == c.stats()["bytes"]
+
+
+def test_cli_json_flags_cache_hits(fake_llm, tmp_path):
+    env = {**os.environ, "AGENT_LLM_CACHE_PATH": str(tmp_path / "llm.sqlite3")}
+    cmd = [sys.executable, "-m", "src.ui.cli", "--llm-only", "--json", "--cache", "rw",
+           "--base", fake_llm.base, "ping"]
+    first, second = (json.loads(subprocess.run(cmd, capture_output=True, text=True,
+                                               env=env).stdout) for _ in range(2))
+    assert first["text"] == second["text"] == "gnip"
+    assert (first["usage"]["cached"], second["usage"]["cached"]) == (False, True)
+    assert len(fake_llm.bodies) == 1
+
+
+def test_llm_cache_does_not_load_the_router():
+    code = ("import sys; import agent.llm.cache, agent.runtime.context; "
+            "print('agent.runtime.router' in sys.modules)")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                         env={**os.environ, "PYTHONPATH": os.path.join(os.path.dirname(os.path.dirname(
+                             os.path.abspath(__file__))), "src")}, check=True).stdout
+    assert out.strip() == "False"
@@ -0,0 +1,21 @@
+from agent.llm import provider
+from agent.runtime import llm_client
+
+
+def test_provider_reuses_one_pooled_connection(fake_llm):
+    p = provider.get_provider(fake_llm.base, "m-reuse", pool_size=2)
+    assert provider.get_provider(fake_llm.base + "/", "m-reuse") is p
+    assert provider.get_provider(fake_llm.base, "other") is not p
+    assert p.stats()["requests"] == 0  # nothing connects until used
+
+    assert p.preconnect() is True
+    for i in range(3):
+        assert llm_client.chat(f"hi{i}", base=fake_llm.base, model="m-reuse")[0] == f"{i}ih"
+    s = p.stats()
+    assert (s["requests"], s["connections"], s["reused"], s["pool_size"]) == (4, 1, 3, 2)
+    assert fake_llm.bodies[-1]["model"] == "m-reuse"
+    assert any(x["model"] == "m-reuse" for x in provider.stats())
+
+
+def test_preconnect_tolerates_a_dead_server():
+    assert provider.Provider("http://127.0.0.1:9/v1", "m").preconnect(timeout=1) is False
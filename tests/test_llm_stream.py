@@ -0,0 +1,25 @@
+import json, subprocess, sys
+
+from agent.runtime import llm_client
+
+
+def test_chat_stream_reports_ttft_and_inter_token_latency(fake_llm):
+    seen = []
+    text, usage, timing = llm_client.chat_stream("abcd", base=fake_llm.base, model="m-stream",
+                                                 on_token=seen.append)
+    assert (text, seen, usage) == ("dcba", list("dcba"), {"completion_tokens": 4})
+    assert fake_llm.bodies[0]["stream"] is True
+    assert timing["chunks"] == 4
+    assert 0 < timing["ttft_ms"] <= timing["total_ms"]
+    assert timing["itl_ms"] >= 5  # the fake server paces tokens 10 ms apart
+
+
+def test_cli_stream(fake_llm):
+    cmd = [sys.executable, "-m", "src.ui.cli", "--llm-only", "--stream", "--base", fake_llm.base]
+    p = subprocess.run([*cmd, "--json", "ping"], capture_output=True, text=True)
+    payload = json.loads(p.stdout)
+    assert payload["text"] == "gnip" and payload["usage"] == {"completion_tokens": 4}
+    assert set(payload["timing"]) == {"ttft_ms", "itl_ms", "total_ms", "chunks"}
+
+    p = subprocess.run([*cmd, "ping"], capture_output=True, text=True)
+    assert (p.returncode, p.stdout) == (0, "gnip\n")
@@ -0,0 +1,50 @@
+import json, urllib.request
+
+from agent.runtime import metrics, router
+
+
+def test_router_counts_outcomes_and_traces(monkeypatch, tmp_path):
+    def execute(text):
+        if "boom" in text:
+            raise RuntimeError("broken")
+        if "nope" in text:
+            raise ValueError("not mine")
+        return "ok"
+    tools = {"t": router.Tool("t", execute=execute, triggers=[(r"^t\b", 0)])}
+    monkeypatch.setattr(router, "_TOOLS_CACHE", tools)
+    monkeypatch.setattr(router, "_INDEX_CACHE", router.TriggerIndex(tools))
+    monkeypatch.setattr(metrics, "METRICS", metrics.Metrics())
+    sink = metrics.TraceSink(str(tmp_path / "trace.jsonl"))
+    monkeypatch.setattr(metrics, "TRACE", sink)
+
+    with metrics.phases() as ph:
+        for msg in ("t 1", "t 2", "t nope", "t boom", "chat"):
+            router.run_once_with_tools(msg)
+    assert set(ph.seconds) == {"decode", "match", "execute"}
+
+    snap = metrics.METRICS.snapshot()["t"]
+    assert (snap["attempts"], snap["hits"], snap["misses"], snap["exceptions"]) == (4, 2, 1, 1)
+    assert snap["p99_ms_le"] >= snap["p50_ms_le"] > 0
+
+    sink.flush()
+    events = [json.loads(line) for line in (tmp_path / "trace.jsonl").read_text().splitlines()]
+    assert [e["outcome"] for e in events if e["event"] == "tool"] == ["hit", "hit", "miss", "exception"]
+    assert [e["tool"] for e in events if e["event"] == "route"] == ["t", "t", None, None, None]
+
+
+def test_prometheus_endpoint(monkeypatch):
+    m = metrics.Metrics()
+    m.record("calculator", "hit", 0.00003)
+    m.record("calculator", "miss", 0.2)
+    monkeypatch.setattr(metrics, "METRICS", m)
+    server = metrics.serve_prometheus(0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        text = urllib.request.urlopen(url, timeout=5).read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert 'agent_tool_attempts_total{tool="calculator",outcome="hit"} 1' in text
+    assert 'agent_tool_latency_seconds_bucket{tool="calculator",le="5e-05"} 1' in text
+    assert 'agent_tool_latency_seconds_bucket{tool="calculator",le="+Inf"} 2' in text
+    assert 'agent_tool_latency_seconds_count{tool="calculator"} 2' in text
@@ -0,0 +1,75 @@
+import os, subprocess, sys, time
+
+import pytest
+
+from agent.runtime import sandbox
+
+
+def test_evaluate_output_forms():
+    assert sandbox.evaluate("2 ** 10") == "1024"
+    assert sandbox.evaluate("print('a', 1)\nlen('abc')") == "a 1\n3"
+    assert sandbox.evaluate("x = 1\ny = x + 1") == "{'x': 1, 'y': 2}"
+    with pytest.raises(ImportError):
+        sandbox.evaluate("import os")
+
+
+def test_pool_limits_and_replacement():
+    pool = sandbox.WorkerPool(size=2, cpu_s=1, mem_mb=128, timeout=10).start()
+    try:
+        assert pool.run("sum(range(10))") == "45"
+        assert pool.run("1/0") == "ERROR: ZeroDivisionError: division by zero"
+        assert pool.run("[0] * 10 ** 9") == "ERROR: memory limit exceeded"
+        assert pool.run("while True: pass") == "ERROR: CPU time limit exceeded (1s)"
+        t0 = time.monotonic()
+        assert pool.run("6 * 7") == "42"  # served by the surviving worker, no cold start
+        assert time.monotonic() - t0 < 0.5
+        assert pool.stats["killed"] == 1
+    finally:
+        pool.close()
+
+
+def test_limits_are_hard_limits():
+    # soft == hard, so code in the worker cannot raise them back (run in a child: limits stick)
+    code = ("import resource\n"
+            "from agent.runtime import sandbox\n"
+            "sandbox._set_limit(resource.RLIMIT_AS, 512 << 20)\n"
+            "sandbox._set_limit(resource.RLIMIT_CPU, 30)\n"
+            "print(*resource.getrlimit(resource.RLIMIT_AS), *resource.getrlimit(resource.RLIMIT_CPU))")
+    p = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                       env={**os.environ, "PYTHONPATH": "src"})
+    assert p.stdout.split() == [str(512 << 20)] * 2 + ["30", "30"], p.stderr
+
+
+def test_worker_retires_at_its_cpu_budget():
+    # no spare budget: every call could be the one to hit the hard RLIMIT_CPU
+    pool = sandbox.WorkerPool(size=1, cpu_s=1, cpu_calls=0, timeout=10).start()
+    try:
+        assert pool.run("1 + 1") == "2" and pool.run("2 + 2") == "4"
+        assert pool.stats["retired"] == 2 and pool.stats["killed"] == 0 and pool.stats["errors"] == 0
+    finally:
+        pool.close()
+
+
+def test_pool_failure_still_answers_py(monkeypatch):
+    from agent.runtime import router
+    def broken():
+        raise RuntimeError("python worker failed to start")
+    monkeypatch.setattr(sandbox, "get_pool", broken)
+    out, name = router.run_once_with_tools("[[py: 1+1]]")
+    assert name == "python_repl" and out == "ERROR: python unavailable: python worker failed to start"
+
+
+def test_wall_timeout_kills_worker():
+    pool = sandbox.WorkerPool(size=1, cpu_s=0, timeout=0.3).start()
+    try:
+        assert pool.run("while True: pass") == "ERROR: timed out after 0.3s"
+        assert pool.run("'back'") == "'back'"  # the replacement forked in the background
+        assert pool.stats["killed"] == 1 and pool.stats["spawned"] == 2
+    finally:
+        pool.close()
+
+
+def test_py_trigger_cli():
+    p = subprocess.run([sys.executable, "-m", "src.ui.cli", "--use-tools", "--tool-only",
+                        "[[py: sum(x * x for x in range(10))]]"], capture_output=True, text=True)
+    assert p.returncode == 0 and p.stdout.strip() == "285" and p.stderr == ""
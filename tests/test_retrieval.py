@@ -0,0 +1,100 @@
+import json, os, subprocess, sys
+
+import pytest
+
+
+def _docs(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "daemon.md").write_text("# Daemon\nThe warm daemon listens on a Unix socket.\n"
+                                    "Clients send one JSON request per line.\n", encoding="utf-8")
+    (docs / "calc.md").write_text("# Calculator\nSafe AST evaluation of arithmetic, "
+                                  "compiled to a postfix program.\n", encoding="utf-8")
+    return docs
+
+
+def test_incremental_index_and_batched_search(tmp_path, monkeypatch):
+    pytest.importorskip("faiss")
+    from agent.tools import retrieval
+    monkeypatch.setenv("AGENT_CACHE_DIR", str(tmp_path / "cache"))
+    docs = _docs(tmp_path)
+
+    store = retrieval.Store(str(docs)).refresh()
+    assert store.stats == {"added": 2, "removed": 0, "mmap": False}
+    daemon, calc = store.search(["unix socket daemon", "postfix arithmetic"], k=1)
+    assert daemon[0]["path"] == "daemon.md" and daemon[0]["line"] == 1
+    assert calc[0]["path"] == "calc.md"
+
+    reopened = retrieval.Store(str(docs)).refresh()  # unchanged: mmap'd, nothing re-embedded
+    assert reopened.stats == {"added": 0, "removed": 0, "mmap": True}
+
+    (docs / "calc.md").write_text("# Calculator\nNow with NumPy batches.\n", encoding="utf-8")
+    (docs / "daemon.md").unlink()
+    (docs / "clock.txt").write_text("strftime formats for the clock tool\n", encoding="utf-8")
+    updated = retrieval.Store(str(docs)).refresh()
+    assert updated.stats == {"added": 2, "removed": 2, "mmap": False}
+    assert updated.index.ntotal == 2
+    assert updated.search(["unix socket daemon"], k=3)[0] == []
+    assert updated.search(["numpy batches"], k=1)[0][0]["path"] == "calc.md"
+
+
+def test_edited_file_is_reindexed_before_reading_offsets(tmp_path, monkeypatch):
+    pytest.importorskip("faiss")
+    from agent.tools import retrieval
+    monkeypatch.setenv("AGENT_CACHE_DIR", str(tmp_path / "cache"))
+    docs = _docs(tmp_path)
+    store = retrieval.Store(str(docs)).refresh()
+    assert store.search(["unix socket daemon"], k=1)[0][0]["path"] == "daemon.md"
+    # edited within RESCAN_S: the old byte offsets must not be used
+    (docs / "daemon.md").write_text("Moved.\n\nThe warm daemon listens on a Unix socket!\n",
+                                    encoding="utf-8")
+    (hit,), = store.search(["unix socket daemon"], k=1)
+    assert hit["path"] == "daemon.md" and hit["text"].startswith("Moved.")
+    assert hit["text"].endswith("socket!\n") and store.stats["added"] == 3  # re-embedded
+
+
+def test_docs_dir_follows_the_request_cwd(tmp_path, monkeypatch):
+    from agent.runtime import paths
+    from agent.tools import retrieval
+    monkeypatch.delenv("AGENT_DOCS_DIR", raising=False)
+    token = paths.CWD.set(str(tmp_path))  # as the daemon does for a client request
+    try:
+        assert retrieval.docs_dir() == str(tmp_path / "docs")
+    finally:
+        paths.CWD.reset(token)
+    assert retrieval.docs_dir() == os.path.abspath("docs")
+
+
+def test_dir_must_stay_inside_the_docs_dir(tmp_path, monkeypatch):
+    from agent.tools import retrieval
+    docs = _docs(tmp_path)
+    (docs / "notes").mkdir()
+    (tmp_path / "secret").mkdir()
+    (docs / "escape").symlink_to(tmp_path / "secret")
+    monkeypatch.setenv("AGENT_DOCS_DIR", str(docs))
+    assert retrieval._subdir("notes") == os.path.realpath(docs / "notes")
+    for bad in ("/etc", "..", "notes/../../secret", "escape"):
+        with pytest.raises(ValueError, match="outside the docs dir"):
+            retrieval.execute(json.dumps({"tool": "retrieval", "args": {"query": "x", "dir": bad}}))
+
+
+def test_declines_without_faiss(tmp_path, monkeypatch):
+    from agent.tools import retrieval
+    monkeypatch.setitem(sys.modules, "faiss", None)  # import faiss -> ImportError
+    monkeypatch.setenv("AGENT_DOCS_DIR", str(_docs(tmp_path)))
+    monkeypatch.setenv("AGENT_CACHE_DIR", str(tmp_path / "cache"))
+    with pytest.raises(ValueError, match="faiss-cpu"):
+        retrieval.execute("[[search: unix socket]]")
+
+
+def test_search_trigger_and_json(tmp_path):
+    pytest.importorskip("faiss")
+    docs = _docs(tmp_path)
+    env = {**os.environ, "AGENT_DOCS_DIR": str(docs), "AGENT_CACHE_DIR": str(tmp_path / "cache")}
+    run = lambda msg: subprocess.run([sys.executable, "-m", "src.ui.cli", "--use-tools",
+                                      "--tool-only", msg], capture_output=True, text=True, env=env)
+    p = run("[[search: unix socket]]")
+    assert p.returncode == 0 and p.stdout.startswith("daemon.md:1 (")
+    p = run('{"tool":"retrieval","args":{"queries":["socket","postfix"],"k":1}}')
+    batch = json.loads(p.stdout)
+    assert [b["hits"][0]["path"] for b in batch] == ["daemon.md", "calc.md"]
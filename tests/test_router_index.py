@@ -0,0 +1,96 @@
+from agent.runtime import router
+
+
+def test_leftmost_trigger_wins():
+    # echo starts at 0, the nested stringy trigger only later
+    assert router.run_once_with_tools("echo: [[upper: hi]]") == ("[[upper: hi]]", "echo")
+
+
+def test_prefilter_rejects_plain_chat():
+    idx = router.get_index()
+    assert not idx.may_match("Tell me what this project does in one short sentence.")
+    assert list(idx.candidates("just chatting")) == idx.unindexed
+
+
+def test_declined_candidate_falls_through():
+    # calculator's selector fires on "(555)" but the tool rejects it → echo input
+    msg = "call me (555) 1234"
+    assert router.run_once_with_tools(msg) == (msg, None)
+
+
+def _fake_tools(monkeypatch, **fns):
+    calls = []
+    tools = {}
+    for name, (pattern, fn) in fns.items():
+        def execute(text, fn=fn, name=name):
+            calls.append(name)
+            return fn(text)
+        tools[name] = router.Tool(name, execute=execute, triggers=[(pattern, 0)])
+    monkeypatch.setattr(router, "_TOOLS_CACHE", tools)
+    monkeypatch.setattr(router, "_INDEX_CACHE", router.TriggerIndex(tools))
+    return calls
+
+
+def test_chain_stops_at_fixed_point(monkeypatch):
+    calls = _fake_tools(monkeypatch, same=(r"^same$", lambda t: t))
+    stats = {}
+    assert router.run_with_tools("same", max_chain=50, stats=stats) == ("same", "same", 50)
+    assert calls == ["same"]
+    assert stats == {"executed": 1, "skipped": 49, "memo_hits": 0, "stop": "fixed_point"}
+
+
+def test_chain_cycle_matches_full_run(monkeypatch):
+    flip = {"[[a]]": "[[b]]", "[[b]]": "[[a]]"}
+    calls = _fake_tools(monkeypatch, flip=(r"\[\[[ab]\]\]", flip.__getitem__))
+    for n in (2, 3, 49, 50):
+        stats = {}
+        out, name, used = router.run_with_tools("[[a]]", max_chain=n, stats=stats)
+        assert (out, name, used) == ("[[b]]" if n % 2 else "[[a]]", "flip", n)
+        assert stats["executed"] == min(n, 2) and stats["skipped"] == n - min(n, 2)
+    assert stats["stop"] == "cycle" and len(calls) == 4 * 2
+
+
+def test_chain_memoizes_long_cycles(monkeypatch):
+    period = router.CYCLE_WINDOW + 2
+    step = lambda t: f"n{(int(t[1:]) + 1) % period}"
+    calls = _fake_tools(monkeypatch, step=(r"^n\d+$", step))
+    stats = {}
+    assert router.run_with_tools("n0", max_chain=3 * period, stats=stats) == ("n0", "step", 3 * period)
+    assert len(calls) == period and stats["memo_hits"] == 2 * period
+    assert stats["skipped"] == 0 and stats["stop"] == "max_chain"
+
+
+def test_spans_run_concurrently_and_splice_in_place(monkeypatch):
+    import threading
+    # All three calls must be in flight at once to pass the barrier; run one
+    # after another, the first would time out and leave its span unspliced.
+    barrier = threading.Barrier(3, timeout=10)
+    def together(text):
+        barrier.wait()
+        return text.strip("[]").upper()
+    calls = _fake_tools(monkeypatch, together=(r"\[\[\w+\]\]", together))
+    out, names = router.splice_once_with_tools("[[a]] then [[b]], [[c]].")
+    assert (out, names) == ("A then B, C.", ["together"] * 3) and len(calls) == 3
+
+
+def test_spans_skip_selection_only_triggers():
+    # calculator's ROUTE_TRIGGERS would match "2+" etc.; only whole calls are spliced
+    msg = "[[calc: 2+3]] vs 4*5 and calc(6*7)"
+    assert router.get_index().spans(msg) == [(0, 13), (25, 34)]
+    assert router.splice_once_with_tools(msg) == ("5 vs 4*5 and 42", ["calculator", "calculator"])
+    assert router.run_spans_with_tools("What is 12/3 + 7*4?") == ("32", ["calculator"], 1)
+
+
+def test_spans_ignore_anchored_and_greedy_triggers():
+    # echo and the "slug: ..." line form only match whole messages; as spans they swallowed the rest
+    assert router.splice_once_with_tools("slug: Hello World and [[upper: y]]") == \
+        ("slug: Hello World and Y", ["stringy"])
+    assert router.run_spans_with_tools("[[echo: [[upper: hi]]]] and [[lower: X]]") == \
+        ("[[echo: [[upper: hi]]]] and x", ["stringy"], 1)
+
+
+def test_spans_do_not_nest_or_split_stray_brackets():
+    index = router.get_index()
+    assert index.spans("[[echo: [[upper: hi]]]] and [[lower: X]]") == [(28, 40)]
+    assert router.splice_once_with_tools("[[upper: hi]]] and [[lower: X]]") == \
+        ("[[upper: hi]]] and x", ["stringy"])
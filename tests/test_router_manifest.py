@@ -0,0 +1,48 @@
+import os
+
+from agent.runtime import router
+
+TOOL_SRC = '''
+TOOL_NAME = "shout"
+TRIGGERS = [r"\\[\\[\\s*shout\\s*:\\s*(?P<t>.+?)\\]\\]"]
+def execute(text):
+    import re
+    m = re.search(TRIGGERS[0], str(text))
+    if not m:
+        raise ValueError("no match")
+    return m.group("t").upper() + "{suffix}"
+'''
+
+
+def _setup(tmp_path, monkeypatch):
+    tools = tmp_path / "tools"
+    tools.mkdir()
+    (tools / "shout.py").write_text(TOOL_SRC.replace("{suffix}", "!"))
+    monkeypatch.setenv("AGENT_CACHE_DIR", str(tmp_path / "cache"))
+    imports = []
+    real = router._import_module_from_path
+    monkeypatch.setattr(router, "_import_module_from_path", lambda p: imports.append(p) or real(p))
+    return tools, imports
+
+
+def test_manifest_skips_imports_until_selected(tmp_path, monkeypatch):
+    tools, imports = _setup(tmp_path, monkeypatch)
+    router.discover_tools(str(tools))  # builds the manifest (one import)
+    assert len(imports) == 1 and os.path.exists(router.manifest_path(str(tools)))
+
+    reg = router.discover_tools(str(tools))
+    assert len(imports) == 1 and not reg["shout"].loaded
+    idx = router.TriggerIndex(reg)
+    tool = next(idx.candidates("[[shout: hi]]"))
+    assert tool.execute("[[shout: hi]]") == "HI!" and len(imports) == 2
+
+
+def test_manifest_rebuilds_changed_file(tmp_path, monkeypatch):
+    tools, imports = _setup(tmp_path, monkeypatch)
+    router.discover_tools(str(tools))
+    path = tools / "shout.py"
+    path.write_text(TOOL_SRC.replace("{suffix}", "!!!"))
+    os.utime(path, ns=(1, 1))  # force a different mtime even on coarse clocks
+    reg = router.discover_tools(str(tools))
+    assert len(imports) == 2 and reg["shout"].loaded
+    assert reg["shout"].execute("[[shout: a]]") == "A!!!"
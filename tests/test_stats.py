@@ -0,0 +1,13 @@
+from agent.runtime.stats import percentile, summarize
+
+
+def test_percentile_interpolates():
+    xs = [1.0, 2.0, 3.0, 4.0]
+    assert percentile(xs, 0) == 1.0 and percentile(xs, 100) == 4.0
+    assert percentile(xs, 50) == 2.5
+
+
+def test_summarize_ms_and_ops():
+    s = summarize([0.001] * 10)
+    assert s["count"] == 10 and round(s["p99_ms"], 6) == 1.0
+    assert round(s["ops_per_s"]) == 1000
@@ -0,0 +1,53 @@
+import json, subprocess, sys
+
+import requests
+
+from agent.llm.stub_server import StubServer, load_tape
+from agent.runtime import llm_client
+
+
+def test_stub_serves_models_and_paced_streams():
+    with StubServer(model="tiny", ttft=0.05, tok_per_s=100) as stub:
+        models = requests.get(f"{stub.base}/models", timeout=5).json()
+        assert [m["id"] for m in models["data"]] == ["tiny"]
+        text, usage = llm_client.chat("a b c", base=stub.base, model="tiny", max_tokens=4)
+        assert text == "a b c a" and usage["completion_tokens"] == 4
+        text, usage, timing = llm_client.chat_stream("a b c", base=stub.base, max_tokens=6)
+        assert text == "a b c a b c" and timing["chunks"] == 6
+        # sleeps give hard lower bounds; upper bounds only catch a broken timing model
+        assert 45 <= timing["ttft_ms"] < 50 * 20 and 8 <= timing["itl_ms"] < 10 * 20
+        assert requests.post(f"{stub.base}/nope", json={}, timeout=5).status_code == 404
+
+
+def test_stub_queues_past_max_concurrency():
+    with StubServer(ttft=0.05, tok_per_s=0, max_concurrency=2) as stub:
+        llm_client.chat_many(["x"] * 6, concurrency=6, base=stub.base, max_tokens=1)
+        assert (stub.peak, stub.served) == (2, 6)
+
+
+def test_record_then_replay_with_original_timing(tmp_path):
+    tape = str(tmp_path / "tape.jsonl")
+    with StubServer(ttft=0.12, tok_per_s=50) as real:
+        with StubServer(record=real.base, tape=tape) as recorder:
+            live = llm_client.chat_stream("one two", base=recorder.base, max_tokens=3)
+    assert len(load_tape(tape)) == 1
+
+    with StubServer(replay=tape, strict=True, ttft=0, tok_per_s=0) as replay:
+        text, usage, timing = llm_client.chat_stream("one two", base=replay.base, max_tokens=3)
+        assert (text, usage) == live[:2] and timing["ttft_ms"] >= 110
+        assert llm_client.chat("one two", base=replay.base, max_tokens=3)[0] == "one two one"
+        r = requests.post(f"{replay.base}/chat/completions", timeout=5,
+                          json={"messages": [{"role": "user", "content": "unseen"}]})
+        assert r.status_code == 404
+
+
+def test_load_generator_against_stub_is_deterministic(tmp_path):
+    # Perf smoke: the bench measures what the stub was told to do.
+    with StubServer(ttft=0.03, tok_per_s=200) as stub:
+        p = subprocess.run([sys.executable, "scripts/vllm_bench.py", "--base", stub.base,
+                            "--concurrency", "4", "--requests", "8", "--max-tokens", "16",
+                            "--warmup", "0", "--json"], capture_output=True, text=True)
+    assert p.returncode == 0, p.stderr
+    (level,) = json.loads(p.stdout)["levels"]
+    assert level["output_tokens"] == 8 * 16
+    assert 25 <= level["ttft_ms"]["p50"] < 30 * 20 and 4 <= level["tpot_ms"]["p50"] < 5 * 20
@@ -0,0 +1,81 @@
+import time
+
+from agent.runtime import router, tool_cache
+
+
+def test_lru_ttl_and_stats(monkeypatch):
+    cache = tool_cache.ResultCache(maxsize=2)
+    cache.put("calc", "1+1", "2", "pure")
+    cache.put("weather", "[[weather: Oslo]]", "sunny", 60)
+    assert cache.get("calc", "1+1") == "2"          # now most recently used
+    cache.put("calc", "2+2", "4", "pure")            # evicts the weather entry
+    assert cache.get("weather", "[[weather: Oslo]]") is tool_cache.MISS
+    now = time.time()
+    monkeypatch.setattr(tool_cache.time, "time", lambda: now + 10 ** 6)
+    assert cache.get("calc", "2+2") == "4"           # pure entries never expire
+    cache.put("weather", "[[weather: Oslo]]", "sunny", 60)
+    monkeypatch.setattr(tool_cache.time, "time", lambda: now + 2 * 10 ** 6)
+    assert cache.get("weather", "[[weather: Oslo]]") is tool_cache.MISS
+    assert cache.stats() == {
+        "calc": {"hits": 2, "misses": 0, "evictions": 1, "hit_rate": 1.0, "entries": 1},
+        "weather": {"hits": 0, "misses": 2, "evictions": 1, "hit_rate": 0.0, "entries": 0},
+    }
+
+
+def test_byte_bound_evicts_and_skips_oversized():
+    cache = tool_cache.ResultCache(maxsize=100, maxbytes=64)
+    cache.put("t", "a", "x" * 20, "pure")
+    cache.put("t", "b", "y" * 20, "pure")
+    cache.put("t", "c", "z" * 20, "pure")  # over 64 bytes in total: "a" goes
+    assert cache.get("t", "a") is tool_cache.MISS and cache.get("t", "c") == "z" * 20
+    assert cache.nbytes == 2 * 22
+    cache.put("t", "big", "w" * 100, "pure")  # larger than the whole cache: not kept
+    assert cache.get("t", "big") is tool_cache.MISS and len(cache) == 2
+
+
+def test_policy_validation():
+    assert [tool_cache.policy_of(v) for v in ("pure", "day", 30, 0, -1, True, "always", None)] == \
+        ["pure", "day", 30, None, None, None, None, None]
+
+
+def test_router_caches_only_declared_tools(monkeypatch):
+    cache = tool_cache.ResultCache(maxsize=16)
+    monkeypatch.setattr(tool_cache, "get_cache", lambda: cache)
+    calls = []
+    def make(name, policy):
+        def execute(text):
+            calls.append(name)
+            if "no" in text:
+                raise ValueError("declined")
+            return f"{name}:{len(calls)}"
+        return router.Tool(name, execute=execute, triggers=[(rf"^{name}\b", 0)], cache=policy)
+    tools = {"pure": make("pure", "pure"), "fresh": make("fresh", None)}
+    monkeypatch.setattr(router, "_TOOLS_CACHE", tools)
+    monkeypatch.setattr(router, "_INDEX_CACHE", router.TriggerIndex(tools))
+    assert router.run_once_with_tools("pure x") == router.run_once_with_tools("pure x")
+    assert router.run_once_with_tools("fresh x") != router.run_once_with_tools("fresh x")
+    for _ in range(2):  # a cached decline still falls through to the echo
+        assert router.run_once_with_tools("pure no") == ("pure no", None)
+    assert calls == ["pure", "fresh", "fresh", "pure"]
+    first, second = router._call(tools["pure"], "pure no", "pure no"), \
+        router._call(tools["pure"], "pure no", "pure no")
+    assert isinstance(first, ValueError) and str(first) == "declined" and first is not second
+    assert router.cache_stats()["pure"] == {"hits": 4, "misses": 2, "evictions": 0,
+                                           "hit_rate": round(4 / 6, 4), "entries": 2}
+
+
+def test_router_never_caches_failures(monkeypatch):
+    cache = tool_cache.ResultCache(maxsize=16)
+    monkeypatch.setattr(tool_cache, "get_cache", lambda: cache)
+    calls = []
+    def execute(text):
+        calls.append(text)
+        if len(calls) == 1:
+            raise RuntimeError("transient")
+        return "ok"
+    tools = {"p": router.Tool("p", execute=execute, triggers=[(r"^p\b", 0)], cache="pure")}
+    monkeypatch.setattr(router, "_TOOLS_CACHE", tools)
+    monkeypatch.setattr(router, "_INDEX_CACHE", router.TriggerIndex(tools))
+    assert router.run_once_with_tools("p x") == ("p x", None)  # the failure falls through
+    assert router.run_once_with_tools("p x") == ("ok", "p")    # and is retried, not replayed
+    assert router.run_once_with_tools("p x") == ("ok", "p") and len(calls) == 2
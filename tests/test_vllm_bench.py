@@ -0,0 +1,20 @@
+import json, subprocess, sys
+
+
+def test_load_generator_report(fake_llm, tmp_path):
+    out = tmp_path / "report.json"
+    p = subprocess.run([sys.executable, "scripts/vllm_bench.py", "--base", fake_llm.base,
+                        "--concurrency", "1,2", "--rate", "50", "--requests", "4", "--warmup", "0",
+                        "--slo-ttft-ms", "10000", "--slo-tpot-ms", "1", "--out", str(out)],
+                       capture_output=True, text=True)
+    assert p.returncode == 0, p.stderr
+    report = json.loads(out.read_text())
+    levels = {(lv["mode"], lv.get("concurrency", lv.get("rate"))): lv for lv in report["levels"]}
+    assert set(levels) == {("open", 50.0), ("closed", 1), ("closed", 2)}
+    for lv in levels.values():
+        assert lv["requests"] == 4 and lv["errors"] == 0 and lv["output_tokens"] > 0
+        assert lv["ttft_ms"]["p50"] <= lv["e2e_ms"]["p50"] and lv["tpot_ms"]["p99"] >= 5
+        assert lv["goodput_req_per_s"] == 0  # every request misses the 1 ms TPOT bound
+    # Wall-clock throughput: two workers finish the same work in about half the time
+    # (a ratio, with room for a loaded runner).
+    assert levels[("closed", 2)]["req_per_s"] > 1.2 * levels[("closed", 1)]["req_per_s"]